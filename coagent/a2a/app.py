@@ -37,6 +37,7 @@ except ImportError as exc:
 from coagent.agents.messages import ChatMessage
 from coagent.core import (
     Address,
+    DiscoveryCache,
     DiscoveryQuery,
     DiscoveryReply,
     RawMessage,
@@ -81,6 +82,10 @@ class FastA2A(Starlette):
         self.runtime: Runtime = runtime
         self.base_url: str = base_url
 
+        # Agent cards are listed frequently, so answer the discovery queries
+        # locally instead of fanning out to all nodes.
+        self.discovery_cache: DiscoveryCache = runtime.channel.discovery_cache
+
         # Setup routes for exposing Coagent agents as A2A agents.
         self.router.add_route("/agents", self.get_agent_card_list, methods=["GET"])
         self.router.add_route("/agents/{name}", self.run_agent, methods=["POST"])
@@ -124,18 +129,14 @@ class FastA2A(Starlette):
     async def _discover_agents(
         self, namespace: str, recursive: bool, inclusive: bool, detailed: bool
     ) -> list[AgentCard]:
-        result: RawMessage = await self.runtime.channel.publish(
-            Address(name="discovery"),
+        reply: DiscoveryReply = await self.discovery_cache.discover(
             DiscoveryQuery(
                 namespace=namespace,
                 recursive=recursive,
                 inclusive=inclusive,
                 detailed=detailed,
-            ).encode(),
-            request=True,
-            probe=False,
+            )
         )
-        reply: DiscoveryReply = DiscoveryReply.decode(result)
 
         cards = [self._schema_to_a2a_agent_card(schema) for schema in reply.agents]
         return cards
@@ -148,14 +148,12 @@ class Delegate:
     async def handle(self, msg: ChatHistory) -> AsyncIterator[ChatMessage]:
         addr = Address(name=self.agent_type, id=self.host_agent.address.id)
         result = await self.host_agent.channel.publish(addr, msg.encode(), stream=True)
-        full_content = ""
         async for chunk in result:
             resp = ChatMessage.decode(chunk)
             if not resp.sender:
                 # Set the sender to the current agent if not specified.
                 resp.sender = self.agent_type
             yield resp
-            full_content += resp.content
         # FIXME: no need to save message if user always provide the complete chat history.
         # msg.messages.append(ChatMessage(role="assistant", content=full_content))
 
@@ -225,8 +223,10 @@ class ChatAgent(BaseAgent):
         model: Model = default_model,
         memory: Memory | None = None,
         timeout: float = 300,
+        **kwargs: Any,
     ):
-        super().__init__(timeout=timeout)
+        # Other arguments (e.g. coalesce_window) are passed to BaseAgent.
+        super().__init__(timeout=timeout, **kwargs)
 
         self._name: str = name
         self._system: str = system
@@ -347,14 +347,14 @@ class ChatAgent(BaseAgent):
         history = ChatHistory(messages=existing + [msg])
 
         response = self._handle_history(history)
-        full_content = ""
+        contents: list[str] = []
         async for resp in response:
             yield resp
-            full_content += resp.content
+            contents.append(resp.content)
 
         await self.memory.add_items(
             msg,  # input item
-            ChatMessage(role="assistant", content=full_content),  # output item
+            ChatMessage(role="assistant", content="".join(contents)),  # output item
         )
 
     @handler
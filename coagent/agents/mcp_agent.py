@@ -30,8 +30,9 @@ class MCPAgent(ChatAgent):
         system: Prompt | str = "",
         tools: list[str] | None = None,
         model: Model = default_model,
+        **kwargs: Any,
     ) -> None:
-        super().__init__(system="", model=model)
+        super().__init__(system="", model=model, **kwargs)
 
         self._mcp_server_base_url: str = mcp_server_base_url
         self._mcp_server_headers: dict[str, Any] | None = mcp_server_headers
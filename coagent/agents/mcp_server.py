@@ -124,13 +124,21 @@ class NamedMCPServer(BaseModel):
 
 
 class MCPServer(BaseAgent):
-    """An agent that acts as an MCP client to connect to an MCP server."""
+    """An agent that acts as an MCP client to connect to an MCP server.
 
-    def __init__(self, timeout: int = float("inf")) -> None:
-        super().__init__(timeout=timeout)
+    Args:
+        timeout: The inactivity timeout of the agent.
+        max_concurrency: The maximum number of `ListTools` and `CallTool`
+            messages that can be handled concurrently.
+    """
+
+    def __init__(self, timeout: int = float("inf"), max_concurrency: int = 100) -> None:
+        super().__init__(timeout=timeout, max_concurrency=max_concurrency)
 
         self._client_session: ClientSession | None = None
         self._exit_stack: AsyncExitStack = AsyncExitStack()
+        # The lock for ensuring that only one connection is made at a time.
+        self._connect_lock: asyncio.Lock = asyncio.Lock()
 
         # The lock for protecting the following three cache-related variables.
         self._cache_lock: aiorwlock.RWLock = aiorwlock.RWLock()
@@ -138,78 +146,48 @@ class MCPServer(BaseAgent):
         self._cache_enabled: bool = False
         self._cache_invalidated: bool = False
 
-        # Ongoing tasks that need to be cancelled when the server is stopped.
-        self._pending_tasks: set[asyncio.Task] = set()
-
     async def stopped(self) -> None:
         await self._close_client_session()
 
-        if self._pending_tasks:
-            # Cancel all pending tasks.
-            for task in self._pending_tasks:
-                task.cancel()
-            self._pending_tasks.clear()
-
     @handler
     async def connect(self, msg: Connect, ctx: Context) -> None:
         """Connect to the server."""
-        if self._client_session:
-            return
-
-        if msg.transport == "sse":
-            ctx_manager: AbstractAsyncContextManager = sse_client(
-                **msg.params.normalize().model_dump()
-            )
-        else:  # "stdio":
-            ctx_manager: AbstractAsyncContextManager = stdio_client(msg.params)
+        async with self._connect_lock:
+            if self._client_session:
+                return
 
-        try:
-            transport = await self._exit_stack.enter_async_context(ctx_manager)
-            read, write = transport
-            session = await self._exit_stack.enter_async_context(
-                ClientSession(read, write)
-            )
-            await session.initialize()
+            if msg.transport == "sse":
+                ctx_manager: AbstractAsyncContextManager = sse_client(
+                    **msg.params.normalize().model_dump()
+                )
+            else:  # "stdio":
+                ctx_manager: AbstractAsyncContextManager = stdio_client(msg.params)
 
-            self._client_session = session
-            async with self._cache_lock.writer_lock:
-                self._cache_enabled = msg.enable_cache
-        except Exception as exc:
-            logger.error(f"Error initializing MCP server: {exc}")
-            await self._close_client_session()
-            raise
+            try:
+                transport = await self._exit_stack.enter_async_context(ctx_manager)
+                read, write = transport
+                session = await self._exit_stack.enter_async_context(
+                    ClientSession(read, write)
+                )
+                await session.initialize()
+
+                self._client_session = session
+                async with self._cache_lock.writer_lock:
+                    self._cache_enabled = msg.enable_cache
+            except Exception as exc:
+                logger.error(f"Error initializing MCP server: {exc}")
+                await self._close_client_session()
+                raise
 
     @handler
     async def invalidate_cache(self, msg: InvalidateCache, ctx: Context) -> None:
         async with self._cache_lock.writer_lock:
             self._cache_invalidated = True
 
-    @handler(deferred=True)
-    async def list_tools(self, msg: ListTools, ctx: Context) -> None:
-        if not self._client_session:
-            try:
-                if msg.connect:
-                    # Connect to the MCP server if not already connected.
-                    # Note that this operation must be performed in a sequential manner.
-                    await self.connect(msg.connect, ctx)
-                else:
-                    raise InternalError(
-                        "Server not initialized. Make sure to send the `Connect` message first."
-                    )
-            except Exception as exc:
-                await self.replier.raise_exc(msg, exc)
-
-        async def run(msg: ListTools, ctx: Context) -> None:
-            try:
-                list_tools_result = self._list_tools(msg, ctx)
-                await self.replier.send(msg, list_tools_result)
-            except Exception as exc:
-                await self.replier.raise_exc(msg, exc)
-
-        # Handle `ListTools` messages concurrently.
-        task = asyncio.create_task(run(msg, ctx))
-        self._pending_tasks.add(task)
-        task.add_done_callback(self._pending_tasks.discard)
+    @handler
+    async def list_tools(self, msg: ListTools, ctx: Context) -> ListToolsResult:
+        await self._ensure_connected(msg.connect, ctx)
+        return await self._list_tools(msg, ctx)
 
     async def _list_tools(self, msg: ListTools, ctx: Context) -> ListToolsResult:
         # Return the cached result if the cache is enabled and not invalidated.
@@ -229,37 +207,32 @@ class MCPServer(BaseAgent):
             self._list_tools_result_cache = ListToolsResult(**result.model_dump())
             return self._list_tools_result_cache
 
-    @handler(deferred=True)
-    async def call_tool(self, msg: CallTool, ctx: Context) -> None:
-        if not self._client_session:
-            try:
-                if msg.connect:
-                    # Connect to the MCP server if not already connected.
-                    # Note that this operation must be performed in a sequential manner.
-                    await self.connect(msg.connect, ctx)
-                else:
-                    raise InternalError(
-                        "Server not initialized. Make sure to send the `Connect` message first."
-                    )
-            except Exception as exc:
-                await self.replier.raise_exc(msg, exc)
-
-        async def run(msg: ListTools, ctx: Context) -> None:
-            try:
-                call_tool_result = await self._call_tool(msg, ctx)
-                await self.replier.send(msg, call_tool_result)
-            except Exception as exc:
-                await self.replier.raise_exc(msg, exc)
-
-        # Handle `CallTool` messages concurrently.
-        task = asyncio.create_task(run(msg, ctx))
-        self._pending_tasks.add(task)
-        task.add_done_callback(self._pending_tasks.discard)
+    @handler
+    async def call_tool(self, msg: CallTool, ctx: Context) -> CallToolResult:
+        await self._ensure_connected(msg.connect, ctx)
+        return await self._call_tool(msg, ctx)
 
     async def _call_tool(self, msg: CallTool, ctx: Context) -> CallToolResult:
         result = await self._client_session.call_tool(msg.name, arguments=msg.arguments)
         return CallToolResult(**result.model_dump())
 
+    async def _ensure_connected(self, msg: Connect | None, ctx: Context) -> None:
+        """Connect to the MCP server if not already connected."""
+        if self._client_session:
+            return
+
+        # Wait for the connection in progress (if any) to be established,
+        # since messages may be handled concurrently with the `Connect` message.
+        async with self._connect_lock:
+            if self._client_session:
+                return
+
+        if not msg:
+            raise InternalError(
+                "Server not initialized. Make sure to send the `Connect` message first."
+            )
+        await self.connect(msg, ctx)
+
     async def _close_client_session(self) -> None:
         """Cleanup the client session to server."""
         try:
@@ -3,6 +3,7 @@ from __future__ import annotations
 from typing import Any, Type
 
 from coagent.core import logger, Message
+from coagent.core.messages import Accumulator
 from pydantic import BaseModel, Field, field_validator, field_serializer
 
 
@@ -30,6 +31,9 @@ class ChatMessage(Message):
         self.reasoning_content += other.reasoning_content
         return self
 
+    def accumulator(self) -> ChatMessageAccumulator:
+        return ChatMessageAccumulator(self)
+
     @property
     def has_content(self) -> bool:
         return bool(self.content or self.reasoning_content)
@@ -41,6 +45,41 @@ class ChatMessage(Message):
         return super().model_dump(include={"role", "content"})
 
 
+class ChatMessageAccumulator(Accumulator):
+    """An accumulator that joins the contents of chat messages only once at
+    the end, instead of concatenating them one by one in quadratic time.
+    """
+
+    def __init__(self, msg: ChatMessage):
+        super().__init__(msg)
+        self._contents: list[str] = [msg.content]
+        self._reasoning_contents: list[str] = [msg.reasoning_content]
+
+    def add(self, msg: ChatMessage) -> None:
+        if not isinstance(msg, ChatMessage):
+            raise TypeError(f"Can not concatenate ChatMessage with {type(msg)}")
+        self._contents.append(msg.content)
+        self._reasoning_contents.append(msg.reasoning_content)
+
+    def can_add(self, msg: ChatMessage) -> bool:
+        # Do not merge messages of different roles, types or senders.
+        first = self._result
+        return isinstance(msg, ChatMessage) and (
+            msg.role == first.role
+            and msg.type == first.type
+            and msg.sender == first.sender
+            and msg.to_user == first.to_user
+        )
+
+    def result(self) -> ChatMessage:
+        return self._result.model_copy(
+            update={
+                "content": "".join(self._contents),
+                "reasoning_content": "".join(self._reasoning_contents),
+            }
+        )
+
+
 class ChatHistory(Message):
     messages: list[ChatMessage]
 
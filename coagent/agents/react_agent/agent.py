@@ -51,6 +51,10 @@ class ReActAgent(BaseAgent):
         tools: A list of tools that the agent can use.
         model: The model to use for generating responses.
         timeout: The timeout for the agent.
+        stream_queue_size: The maximum number of buffered stream events per run.
+            If the buffer is full, the agent loop will wait for the consumer.
+            Defaults to 0, which means there is no limit.
+        **kwargs: Other arguments for `BaseAgent` (e.g. coalesce_window).
     """
 
     def __init__(
@@ -61,14 +65,17 @@ class ReActAgent(BaseAgent):
         model: Model = default_model,
         model_settings: ModelSettings | None = None,
         timeout: float = 300,
+        stream_queue_size: int = 0,
+        **kwargs: Any,
     ):
-        super().__init__(timeout=timeout)
+        super().__init__(timeout=timeout, **kwargs)
 
         self._name: str = name
         self._system: str = system
         self._tools: list[Callable] = tools or []
         self._model: Model = model
         self._model_settings: ModelSettings = model_settings or ModelSettings()
+        self._stream_queue_size: int = stream_queue_size
 
     @property
     def name(self) -> str:
@@ -104,7 +111,7 @@ class ReActAgent(BaseAgent):
         ]
         data = msg.extensions
 
-        loop = AgentLoop(self)
+        loop = AgentLoop(self, queue_size=self._stream_queue_size)
         result = loop.run(input=input, data=data)
 
         try:
@@ -154,10 +161,11 @@ class StreamResult:
 
 
 class AgentLoop:
-    def __init__(self, agent: ReActAgent):
+    def __init__(self, agent: ReActAgent, queue_size: int = 0):
         self.agent: ReActAgent = agent
-        self._queue: asyncio.Queue[StreamEvent | QueueCompleteSentinel] = (
-            asyncio.Queue()
+        # The event queue. If it's full, the loop will wait for the consumer.
+        self._queue: asyncio.Queue[StreamEvent | QueueCompleteSentinel] = asyncio.Queue(
+            queue_size
         )
 
     def run(
@@ -193,7 +201,7 @@ class AgentLoop:
                 if isinstance(item, ToolCallItem):
                     has_tool_call = True
 
-                    self._queue.put_nowait(item)
+                    await self._queue.put(item)
                     history.append(
                         # ResponseFunctionToolCall => ResponseFunctionToolCallParam
                         ResponseFunctionToolCallParam(**item.raw_item.model_dump())
@@ -201,18 +209,18 @@ class AgentLoop:
 
                     output = await self.handle_function_call(ctx, item.raw_item)
                     if output:
-                        self._queue.put_nowait(output)
+                        await self._queue.put(output)
                         history.append(output.raw_item)
 
                 elif isinstance(item, MessageOutputItem):
-                    self._queue.put_nowait(item)
+                    await self._queue.put(item)
 
             # The response does not include any tool calls, so we can break out of the loop.
             if not has_tool_call:
                 break
 
         # Signal that the stream is complete.
-        self._queue.put_nowait(QueueCompleteSentinel())
+        await self._queue.put(QueueCompleteSentinel())
 
     async def handle_stream(
         self, response: AsyncIterator[ChatCompletionChunk]
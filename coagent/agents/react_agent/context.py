@@ -74,7 +74,11 @@ class RunContext(Generic[TData]):
             type="tool_call_progress_item",
         )
         if self.queue:
-            self.queue.put_nowait(event)
+            try:
+                self.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # Progress events are informational, so just drop it.
+                pass
 
 
 @dataclass
@@ -1,4 +1,4 @@
-from typing import AsyncIterator, Callable, Type
+from typing import Any, AsyncIterator, Callable, Type
 
 from coagent.core import Context, GenericMessage, handler, Message
 from jinja2 import Template
@@ -18,8 +18,9 @@ class StructuredAgent(ChatAgent):
         messages: list[ChatMessage] | None = None,
         tools: list[Callable] | None = None,
         model: Model = default_model,
+        **kwargs: Any,
     ):
-        super().__init__(system=system, tools=tools, model=model)
+        super().__init__(system=system, tools=tools, model=model, **kwargs)
         self._input_type: Type[Message] = input_type
         self._output_type: Type[BaseModel] | Type[str] = output_type
 
@@ -1,5 +1,5 @@
 import re
-from typing import AsyncIterator
+from typing import Any, AsyncIterator
 
 from coagent.core import (
     Address,
@@ -11,7 +11,6 @@ from coagent.core import (
     handler,
     logger,
     Message,
-    RawMessage,
 )
 from coagent.core.discovery import (
     AgentsRegistered,
@@ -41,6 +40,7 @@ class Triage(BaseAgent):
         dynamic_agents: A list of queries to dynamically discover agents to delegate to.
         model: The model to use for generating responses.
         timeout: The timeout for the agent.
+        **kwargs: Other arguments for `BaseAgent` (e.g. coalesce_window).
     """
 
     def __init__(
@@ -52,8 +52,9 @@ class Triage(BaseAgent):
         static_agents: list[str] | None = None,
         dynamic_agents: list[DiscoveryQuery] | None = None,
         timeout: float = 300,
+        **kwargs: Any,
     ):
-        super().__init__(timeout=timeout)
+        super().__init__(timeout=timeout, **kwargs)
 
         self._name: str = name
         self._system: str = system
@@ -174,13 +175,9 @@ class Triage(BaseAgent):
         # To make the newly-created triage agent immediately available,
         # we must retrieve its static and dynamic sub-agents once in advance.
         batch_query = DiscoveryBatchQuery(queries=all_queries)
-        result: RawMessage = await self.channel.publish(
-            Address(name="discovery"),
-            batch_query.encode(),
-            request=True,
-            probe=False,
+        batch_reply: DiscoveryBatchReply = (
+            await self.channel.discovery_cache.batch_discover(batch_query)
         )
-        batch_reply: DiscoveryBatchReply = DiscoveryBatchReply.decode(result)
 
         self._sub_agents = {
             agent.name: agent for reply in batch_reply.replies for agent in reply.agents
@@ -224,14 +221,14 @@ class Triage(BaseAgent):
         history = ChatHistory(messages=existing + [msg])
 
         response = self._handle_history(history, ctx)
-        full_content = ""
+        contents: list[str] = []
         async for resp in response:
             yield resp
-            full_content += resp.content
+            contents.append(resp.content)
 
         await self.memory.add_items(
             msg,  # input item
-            ChatMessage(role="assistant", content=full_content),  # output item
+            ChatMessage(role="assistant", content="".join(contents)),  # output item
         )
 
     async def _handle_history(
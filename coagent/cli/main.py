@@ -6,6 +6,7 @@ import uuid
 import jq
 
 from coagent.core import Address, RawMessage, init_logger
+from coagent.core.compression import decompress_content
 from coagent.core.exceptions import BaseError
 from coagent.runtimes import NATSRuntime, HTTPRuntime
 
@@ -26,7 +27,7 @@ def print_msg(msg: RawMessage | None, oneline: bool, filter: str) -> None:
 
     output = msg.encode()
 
-    content = output.get("content")
+    content = decompress_content(msg)
     if content:
         # To make jq happy, we need to convert JSON bytes to Python dict.
         output["content"] = json.loads(content)
@@ -7,6 +7,7 @@ from .agent import (
 from .discovery import (
     DiscoveryBatchQuery,
     DiscoveryBatchReply,
+    DiscoveryCache,
     DiscoveryQuery,
     DiscoveryReply,
 )
@@ -1,15 +1,33 @@
 from __future__ import annotations
 
 import asyncio
+import dataclasses
 import inspect
 import time
-from typing import Any, AsyncIterator, Awaitable, Callable, Type, get_type_hints, cast
+from types import MappingProxyType
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Mapping,
+    Type,
+    get_type_hints,
+    cast,
+)
 
 from pydantic import BaseModel, ValidationError
 
-from .exceptions import MessageDecodeError, InternalError, StreamError
+from .codecs import APPLICATION_JSON
+from .exceptions import (
+    MessageDecodeError,
+    InternalError,
+    OverloadedError,
+    StreamError,
+)
 from .logger import logger
 from .messages import (
+    Accumulator,
     Cancel,
     ControlMessage,
     Empty,
@@ -19,16 +37,19 @@ from .messages import (
     Stopped,
     SetReplyInfo,
     StopIteration,
+    coalesce,
 )
 from .types import (
     Address,
     Agent,
     Channel,
+    OverflowPolicy,
     RawMessage,
     Reply,
     State,
     Subscription,
 )
+from .util import BoundedQueue
 
 
 class Context:
@@ -39,7 +60,11 @@ def get_type_name(typ: Type[Any]) -> str:
     return f"{typ.__module__}.{typ.__qualname__}"
 
 
-def handler(func: Callable | None = None, deferred: bool = False) -> Callable:
+def handler(
+    func: Callable | None = None,
+    deferred: bool = False,
+    max_concurrency: int | None = None,
+) -> Callable:
     """Decorator to mark the given function as a message handler.
 
     This decorator is typically used on methods of an agent class, and the method must have 3 arguments:
@@ -57,8 +82,17 @@ def handler(func: Callable | None = None, deferred: bool = False) -> Callable:
             Example scenarios:
             - Message handlers of orchestration agents who delegate the reply handling to other agents.
             - Message handlers that process blocking tasks in a separate coroutine and send replies there.
+        max_concurrency: The maximum number of concurrent invocations of the decorated message handler.
+
+            If not specified, the handler shares the agent-level limit (see
+            `max_concurrency` of `BaseAgent`). If specified, the handler will
+            be invoked concurrently up to the given limit, regardless of the
+            agent-level limit.
     """
 
+    if max_concurrency is not None and max_concurrency < 1:
+        raise ValueError("max_concurrency must be at least 1")
+
     def decorator(func: Callable) -> Callable:
         hints = get_type_hints(func)
         return_type = hints.pop("return", None)  # Ignore the return type.
@@ -87,6 +121,7 @@ def handler(func: Callable | None = None, deferred: bool = False) -> Callable:
         func.target_message_type = msg_type
         func.return_type = get_return_type(return_type)
         func.is_reply_deferred = deferred
+        func.max_concurrency = max_concurrency
         return func
 
     if func is None:
@@ -115,13 +150,42 @@ class Operation(BaseModel):
     reply: dict
 
 
+@dataclasses.dataclass(frozen=True)
+class HandlerTable:
+    """HandlerTable holds the read-only handler information of an agent class."""
+
+    handlers: Mapping[Type, Handler]
+    """Message handlers keyed by the message types they handle."""
+
+    message_types: Mapping[str, Type[Message]]
+    """Message types keyed by their names."""
+
+    concurrency_limits: tuple[tuple[Handler, int], ...]
+    """Handlers that specify their own concurrency limits."""
+
+
 class Replier:
-    """Replier is a helper used to handle message replies for the associated agent."""
+    """Replier is a helper used to handle message replies for the associated agent.
 
-    def __init__(self, agent: BaseAgent):
+    Args:
+        agent (BaseAgent): The associated agent.
+        coalesce_window (float, optional): The time window (in seconds) within
+            which consecutive mergeable messages are coalesced into one before
+            being sent in streaming mode (see `coalesce()`). Defaults to 0,
+            which means no coalescing.
+        coalesce_size (int, optional): The maximum number of messages to
+            coalesce into one. Defaults to 0, which means no limit.
+    """
+
+    def __init__(
+        self, agent: BaseAgent, coalesce_window: float = 0, coalesce_size: int = 0
+    ):
         # The associated agent.
         self._agent: BaseAgent = agent
 
+        self._coalesce_window: float = coalesce_window
+        self._coalesce_size: int = coalesce_size
+
         self._reply: Reply | None = None
         self._reply_lock: asyncio.Lock = asyncio.Lock()
 
@@ -142,7 +206,22 @@ class Replier:
 
         async def pub(msg: Message) -> None:
             if dst:
-                await self._agent.channel.publish(dst.address, msg.encode())
+                channel = self._agent.channel
+                content_type = dst.content_type or APPLICATION_JSON
+                try:
+                    raw = msg.encode(
+                        content_type=content_type, lazy=channel.direct_dispatch
+                    )
+                except Exception as exc:
+                    if content_type == APPLICATION_JSON:
+                        raise
+                    # E.g. the codec package is missing, fall back to JSON so
+                    # that the reply (typically an error) is not lost.
+                    logger.warning(
+                        f"Failed to encode reply as {content_type}, using JSON: {exc}"
+                    )
+                    raw = msg.encode(lazy=channel.direct_dispatch)
+                await channel.publish(dst.address, raw)
 
         async def pub_exc(exc: BaseException) -> None:
             err = InternalError.from_exception(exc)
@@ -151,6 +230,10 @@ class Replier:
         if dst and dst.stream:  # Streaming mode
             try:
                 if is_async_iterator(result):
+                    if self._coalesce_window > 0:
+                        result = coalesce(
+                            result, self._coalesce_window, self._coalesce_size
+                        )
                     async for msg in result:
                         await pub(msg)
                 elif inspect.isawaitable(result):
@@ -169,16 +252,16 @@ class Replier:
         else:  # None, Deferred, or non-streaming
             try:
                 if is_async_iterator(result):
-                    accumulated: RawMessage | None = None
+                    accumulator: Accumulator | None = None
                     async for msg in result:
-                        if not accumulated:
-                            accumulated = msg
+                        if accumulator is None:
+                            accumulator = msg.accumulator()
                         else:
                             try:
-                                accumulated += msg
+                                accumulator.add(msg)
                             except TypeError:
                                 await pub_exc(StreamError("Streaming mode is required"))
-                    await pub(accumulated)
+                    await pub(accumulator.result() if accumulator else None)
                 elif inspect.isawaitable(result):
                     msg = await result or Empty()
                     await pub(msg)
@@ -233,9 +316,49 @@ class BaseAgent(Agent):
             If the agent is not receiving any messages within this duration, it
             will be transitioned to the IDLE state. Once in the IDLE state, the
             agent will be deleted (recycled) by its corresponding factory agent.
+        max_concurrency (int, optional): The maximum number of DATA messages
+            that can be handled concurrently. Defaults to 1, which means DATA
+            messages are handled one by one in the order they are received.
+
+            Note that a message handler can specify its own limit by using
+            `@handler(max_concurrency=N)`.
+        ordered (bool, optional): Whether to handle DATA messages in order per
+            reply address when they are handled concurrently. Defaults to False.
+
+            If enabled, messages whose replies are sent to the same address
+            will be handled one after another, while messages whose replies
+            are sent to different addresses can still be handled concurrently.
+        queue_size (int, optional): The maximum number of pending DATA messages.
+            Defaults to 0, which means there is no limit.
+        overflow_policy (OverflowPolicy, optional): The policy to apply when
+            the pending queue is full. Defaults to `OverflowPolicy.BLOCK`.
+
+            - `BLOCK`: Wait until a free slot is available. CONTROL and lifecycle
+              messages are still received in the meantime.
+            - `REJECT`: Reject the new message and reply with an `OverloadedError`.
+            - `DROP_OLDEST`: Drop the oldest pending message and reply to it
+              with an `OverloadedError`.
+        coalesce_window (float, optional): The time window (in seconds) within
+            which consecutive mergeable messages (e.g. token deltas of a chat
+            stream) are coalesced into one before being sent in streaming mode.
+            Defaults to 0, which means every message is sent as is.
+        coalesce_size (int, optional): The maximum number of messages to
+            coalesce into one. Defaults to 0, which means no limit.
     """
 
-    def __init__(self, timeout: float = 300):
+    def __init__(
+        self,
+        timeout: float = 300,
+        max_concurrency: int = 1,
+        ordered: bool = False,
+        queue_size: int = 0,
+        overflow_policy: OverflowPolicy = OverflowPolicy.BLOCK,
+        coalesce_window: float = 0,
+        coalesce_size: int = 0,
+    ):
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+
         # The following attributes will be set by the runtime after agent creation.
         self.channel: Channel | None = None
         self.address: Address | None = None
@@ -245,34 +368,42 @@ class BaseAgent(Agent):
 
         # The task for handling DATA messages.
         self._handle_data_task: asyncio.Task | None = None
-        self._pending_queue: asyncio.Queue[Message] = asyncio.Queue()
+        self._pending_queue: BoundedQueue[Message] = BoundedQueue(
+            queue_size, overflow_policy
+        )
+        # The task for putting a DATA message into the full pending queue
+        # (only used by the BLOCK policy).
+        self._blocked_put_task: asyncio.Task | None = None
+
+        self._max_concurrency: int = max_concurrency
+        self._ordered: bool = ordered
+        # The semaphore for limiting the number of DATA messages being handled
+        # concurrently by handlers that do not specify their own limits.
+        self._concurrency_sem: asyncio.Semaphore = asyncio.Semaphore(max_concurrency)
+        # The tasks for handling DATA messages concurrently.
+        self._data_tasks: set[asyncio.Task] = set()
+        # The last task for each reply address (only used in ordered mode).
+        self._ordered_tasks: dict[Address | None, asyncio.Task] = {}
+        # The semaphore for limiting the number of DATA messages waiting for
+        # their predecessors (only used in ordered mode), which hold no slots
+        # of the concurrency limit while waiting.
+        self._backlog_sem: asyncio.Semaphore = asyncio.Semaphore(max_concurrency)
 
         self._timeout: float = timeout
+        # Note that no lock is needed to protect `self._last_msg_received_at`,
+        # since it's only read and written synchronously within the event loop.
         self._last_msg_received_at: float = time.time()
 
-        # A lock to protect the access to `self._last_msg_received_at`, which
-        # will be written to when receiving messages and read from when getting
-        # the state of this agent.
-        #
-        # Note that it's possible to avoid using locks if the factory agent
-        # gets the state of this agent through sending query messages, but
-        # this would result in a lot of messages.
-        self._last_msg_received_at_lock: asyncio.Lock = asyncio.Lock()
-
-        self.replier = Replier(self)
-
-        handlers, message_types = self.__collect_handlers()
-        # A list of handlers that are registered to handle messages.
-        self._handlers: dict[Type, Handler] = handlers
-        # A list of message types associated with this agent.
-        self._message_types: dict[str, Type[Message]] = {
-            "Cancel": Cancel,
-            "Started": Started,
-            "Stopped": Stopped,
-            "SetReplyInfo": SetReplyInfo,
-            "ProbeAgent": ProbeAgent,
-            "Empty": Empty,
-            **message_types,
+        self.replier = Replier(self, coalesce_window, coalesce_size)
+
+        table = self._get_handler_table()
+        # A read-only mapping of handlers that are registered to handle messages.
+        self._handlers: Mapping[Type, Handler] = table.handlers
+        # A read-only mapping of message types associated with this agent.
+        self._message_types: Mapping[str, Type[Message]] = table.message_types
+        # Semaphores for handlers that specify their own concurrency limits.
+        self._handler_sems: dict[Handler, asyncio.Semaphore] = {
+            h: asyncio.Semaphore(limit) for h, limit in table.concurrency_limits
         }
 
     @property
@@ -282,6 +413,11 @@ class BaseAgent(Agent):
         else:
             return self.address.name
 
+    @property
+    def queue_depth(self) -> int:
+        """The number of pending DATA messages."""
+        return self._pending_queue.qsize()
+
     def init(
         self, channel: Channel, address: Address, factory_address: Address | None = None
     ) -> None:
@@ -289,11 +425,12 @@ class BaseAgent(Agent):
         self.address = address
         self.factory_address = factory_address
 
-    async def get_state(self) -> State:
-        async with self._last_msg_received_at_lock:
-            elapsed = time.time() - self._last_msg_received_at
+    @property
+    def expires_at(self) -> float:
+        return self._last_msg_received_at + self._timeout
 
-        if elapsed >= self._timeout:
+    async def get_state(self) -> State:
+        if time.time() >= self.expires_at:
             return State.IDLE
         return State.RUNNING
 
@@ -303,8 +440,11 @@ class BaseAgent(Agent):
         # Subscribe the agent to its own address.
         self._sub = await self._create_subscription()
 
-        # Send a `Started` message to the current agent.
-        await self.channel.publish(self.address, Started().encode(), probe=False)
+        # Notify the current agent that it's started. Note that the `Started`
+        # message is put into the pending queue directly, which ensures that it
+        # will be handled before any DATA message, including the ones delivered
+        # directly to `self.receive()` by the factory.
+        self._pending_queue.put_pinned(Started())
 
         if not self._handle_data_task:
             self._handle_data_task = asyncio.create_task(self._handle_data())
@@ -326,6 +466,13 @@ class BaseAgent(Agent):
         if self._handle_data_task:
             self._handle_data_task.cancel()
 
+        if self._blocked_put_task:
+            self._blocked_put_task.cancel()
+
+        # Cancel all the ongoing DATA message handlers.
+        for task in self._data_tasks:
+            task.cancel()
+
     async def delete(self) -> None:
         """Request to delete the current agent."""
         from .factory import DeleteAgent
@@ -344,10 +491,24 @@ class BaseAgent(Agent):
 
     async def receive(self, raw: RawMessage) -> None:
         name: str = f"{self.__class__.__name__} {self.id}"
-        logger.debug(f"[{name}] Received a message: {raw.model_dump()}")
-
-        async with self._last_msg_received_at_lock:
-            self._last_msg_received_at = time.time()
+        # Show the typed message instead if it's handed over directly, to
+        # avoid serializing it just for logging.
+        logger.opt(lazy=True).debug(
+            "[{}] Received a message: {}",
+            lambda: name,
+            lambda: raw.message if raw.message is not None else raw.model_dump(),
+        )
+
+        self._last_msg_received_at = time.time()
+
+        content_type = raw.header.content_type
+        if (
+            raw.reply
+            and not raw.reply.content_type
+            and content_type != APPLICATION_JSON
+        ):
+            # Reply in the same format as the request, unless specified otherwise.
+            raw.reply = raw.reply.model_copy(update={"content_type": content_type})
 
         msg_type_name = raw.header.type
         msg_type = self._message_types.get(msg_type_name)
@@ -372,8 +533,46 @@ class BaseAgent(Agent):
 
         if isinstance(msg, ControlMessage):
             await self._handle_control(msg)
+        elif isinstance(msg, (Started, Stopped, SetReplyInfo)):
+            # Lifecycle messages must never be rejected or dropped, so they
+            # are pinned in the pending queue (regardless of its size).
+            self._pending_queue.put_pinned(msg)
         else:
-            await self._pending_queue.put(msg)
+            await self._enqueue_data(msg)
+
+    async def _enqueue_data(self, msg: Message) -> None:
+        """Put the DATA message into the pending queue, and notify the sender
+        of the rejected or dropped message if the queue is full.
+        """
+        if self._blocked_put_task:
+            # Keep the order of DATA messages, and hold up the channel until
+            # the previous message is put into the queue.
+            task, self._blocked_put_task = self._blocked_put_task, None
+            await task
+
+        if (
+            self._pending_queue.policy == OverflowPolicy.BLOCK
+            and self._pending_queue.full()
+        ):
+            # Wait for free space in the background, so that the following
+            # CONTROL and lifecycle messages are not stuck behind this message.
+            self._blocked_put_task = asyncio.create_task(self._pending_queue.put(msg))
+            return
+
+        try:
+            dropped = await self._pending_queue.put(msg)
+        except OverloadedError as exc:
+            dropped = msg
+            err = exc
+        else:
+            if dropped is None:
+                return
+            err = OverloadedError("Message dropped since the agent is overloaded")
+
+        name: str = f"{self.__class__.__name__} {self.id}"
+        sent = await self.replier.send(dropped, err.encode_message())
+        if not sent:
+            logger.warning(f"[{name}] Discarded a message: {err}")
 
     async def _handle_control(self, msg: ControlMessage) -> None:
         """Handle CONTROL messages."""
@@ -412,7 +611,68 @@ class BaseAgent(Agent):
                     pass
 
                 case _:
-                    await self._handle_data_custom(msg, Context())
+                    if self._max_concurrency == 1 and not self._handler_sems:
+                        await self._handle_data_custom(msg, Context())
+                    else:
+                        await self._dispatch_data_custom(msg, Context())
+
+    async def _dispatch_data_custom(self, msg: Message, ctx: Context) -> None:
+        """Handle user-defined DATA messages concurrently.
+
+        This method returns as soon as the message is scheduled to be handled
+        in a separate task, or blocks if the concurrency limit is reached.
+        """
+        h: Handler = self.__get_handler(msg)
+        sem = self._handler_sems.get(h, self._concurrency_sem)
+
+        prev_task: asyncio.Task | None = None
+        key: Address | None = None
+        if self._ordered:
+            dst = await self.replier.get_destination() or msg.reply
+            key = dst.address if dst else None
+            prev_task = self._ordered_tasks.get(key)
+
+        if prev_task:
+            # Take a slot only after the predecessor is done, so as not to
+            # block the messages with other reply addresses.
+            await self._backlog_sem.acquire()
+        else:
+            await sem.acquire()
+
+        task = asyncio.create_task(self._run_data_custom(msg, ctx, sem, prev_task))
+        self._data_tasks.add(task)
+        task.add_done_callback(self._data_tasks.discard)
+
+        if self._ordered:
+            self._ordered_tasks[key] = task
+
+            def discard(t: asyncio.Task) -> None:
+                if self._ordered_tasks.get(key) is t:
+                    del self._ordered_tasks[key]
+
+            task.add_done_callback(discard)
+
+    async def _run_data_custom(
+        self,
+        msg: Message,
+        ctx: Context,
+        sem: asyncio.Semaphore,
+        prev_task: asyncio.Task | None = None,
+    ) -> None:
+        if prev_task:
+            try:
+                # Wait for the previous message with the same reply address.
+                await asyncio.wait([prev_task])
+                await sem.acquire()
+            finally:
+                self._backlog_sem.release()
+
+        try:
+            await self._handle_data_custom(msg, ctx)
+        except Exception as exc:
+            logger.exception(f"[{self.__class__.__name__} {self.id}] {exc}")
+        finally:
+            sem.release()
 
     async def _handle_data_custom(self, msg: Message, ctx: Context) -> None:
         """Handle user-defined DATA messages."""
@@ -437,9 +697,30 @@ class BaseAgent(Agent):
         return h
 
     @classmethod
-    def __collect_handlers(cls) -> tuple[dict[Type, Handler], dict[str, Type[Message]]]:
+    def _get_handler_table(cls) -> HandlerTable:
+        """Get the handler table of this agent class.
+
+        The table is built on first use and then cached on the class itself,
+        so that it's shared by all instances of the same class.
+        """
+        # Use `cls.__dict__` to avoid inheriting the table from the superclass.
+        table = cls.__dict__.get("_handler_table")
+        if table is None:
+            table = cls.__build_handler_table()
+            cls._handler_table = table
+        return table
+
+    @classmethod
+    def __build_handler_table(cls) -> HandlerTable:
         handlers: dict[Type, Handler] = {}
-        message_types: dict[str, Type[Message]] = {}
+        message_types: dict[str, Type[Message]] = {
+            "Cancel": Cancel,
+            "Started": Started,
+            "Stopped": Stopped,
+            "SetReplyInfo": SetReplyInfo,
+            "ProbeAgent": ProbeAgent,
+            "Empty": Empty,
+        }
         for attr in dir(cls):
             if callable(getattr(cls, attr, None)):
                 h = getattr(cls, attr)
@@ -450,11 +731,21 @@ class BaseAgent(Agent):
                     )
                     if h.return_type:
                         message_types[h.return_type.__name__] = h.return_type
-        return handlers, message_types
+
+        concurrency_limits = tuple(
+            (h, h.max_concurrency)
+            for h in handlers.values()
+            if getattr(h, "max_concurrency", None)
+        )
+        return HandlerTable(
+            handlers=MappingProxyType(handlers),
+            message_types=MappingProxyType(message_types),
+            concurrency_limits=concurrency_limits,
+        )
 
     @classmethod
     def collect_operations(cls) -> list[Operation]:
-        handlers: dict[Type, Handler] = cls.__collect_handlers()[0]
+        handlers: Mapping[Type, Handler] = cls._get_handler_table().handlers
         operations = []
         for h in handlers.values():
             operations.append(
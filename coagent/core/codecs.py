@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+import abc
+from typing import Any, Type
+
+from pydantic import BaseModel
+
+
+APPLICATION_JSON = "application/json"
+APPLICATION_MSGPACK = "application/msgpack"
+
+
+class Codec(abc.ABC):
+    """Codec converts the content of messages to and from bytes in a specific
+    format, which is identified by the content type of the message header.
+
+    Note that the header fields (i.e. `reply` and `extensions`) of a message
+    are carried in the header of the raw message, so they are never encoded
+    into the content.
+    """
+
+    content_type: str = ""
+    """The content type handled by this codec."""
+
+    binary: bool = False
+    """Whether the encoded content is binary (i.e. not valid UTF-8 text)."""
+
+    @abc.abstractmethod
+    def encode(self, msg: BaseModel, exclude: Any, exclude_defaults: bool) -> bytes:
+        """Encode the fields of the given message into the content."""
+        pass
+
+    @abc.abstractmethod
+    def decode(self, msg_type: Type[BaseModel], content: bytes) -> BaseModel:
+        """Decode the content into a message of the given type.
+
+        Any error raised is reported as a `ValidationError` by `Message.decode()`.
+        """
+        pass
+
+
+class JSONCodec(Codec):
+    content_type = APPLICATION_JSON
+
+    def encode(self, msg: BaseModel, exclude: Any, exclude_defaults: bool) -> bytes:
+        # Use the (per-class) core serializer directly, which produces bytes
+        # without the str round trip of `model_dump_json()`.
+        content = msg.__pydantic_serializer__.to_json(
+            msg,
+            exclude=exclude,
+            exclude_defaults=exclude_defaults,
+            by_alias=True,
+        )
+        if content == b"{}":
+            content = b""
+        return content
+
+    def decode(self, msg_type: Type[BaseModel], content: bytes) -> BaseModel:
+        # Validate the content bytes directly, without an intermediate dict.
+        return msg_type.model_validate_json(content or b"{}")
+
+
+class MsgpackCodec(Codec):
+    """A codec for MessagePack, which requires the `msgpack` package.
+
+    The fields are converted to JSON-compatible values before packing, so
+    any message that can be encoded as JSON can also be encoded as MessagePack.
+    """
+
+    content_type = APPLICATION_MSGPACK
+    binary = True
+
+    def encode(self, msg: BaseModel, exclude: Any, exclude_defaults: bool) -> bytes:
+        import msgpack
+
+        data = msg.__pydantic_serializer__.to_python(
+            msg,
+            mode="json",
+            exclude=exclude,
+            exclude_defaults=exclude_defaults,
+            by_alias=True,
+        )
+        return msgpack.packb(data) if data else b""
+
+    def decode(self, msg_type: Type[BaseModel], content: bytes) -> BaseModel:
+        import msgpack
+
+        data = msgpack.unpackb(content) if content else {}
+        return msg_type.model_validate(data)
+
+
+# Mapping from content type to codec.
+_codecs: dict[str, Codec] = {}
+
+
+def register_codec(codec: Codec) -> None:
+    """Register a codec for its content type, replacing any existing one."""
+    _codecs[codec.content_type] = codec
+
+
+def get_codec(content_type: str) -> Codec | None:
+    """Get the codec for the given content type, if any."""
+    return _codecs.get(content_type)
+
+
+def is_binary(content_type: str) -> bool:
+    """Whether the content of the given type is binary.
+
+    Unknown content types are considered to be text, for compatibility.
+    """
+    codec = _codecs.get(content_type)
+    return codec is not None and codec.binary
+
+
+register_codec(JSONCodec())
+register_codec(MsgpackCodec())
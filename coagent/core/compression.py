@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import zlib
+
+from .types import RawMessage
+
+
+ZLIB = "zlib"
+ZSTD = "zstd"
+
+# The supported content encodings.
+encodings = (ZLIB, ZSTD)
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    """Compress the data with the given content encoding."""
+    match encoding:
+        case "zlib":
+            return zlib.compress(data)
+        case "zstd":
+            # This requires the `zstandard` package.
+            import zstandard
+
+            return zstandard.ZstdCompressor().compress(data)
+        case _:
+            raise ValueError(f"Unsupported content encoding: {encoding}")
+
+
+def decompress(data: bytes, encoding: str) -> bytes:
+    """Decompress the data with the given content encoding."""
+    match encoding:
+        case "":
+            return data
+        case "zlib":
+            return zlib.decompress(data)
+        case "zstd":
+            import zstandard
+
+            return zstandard.ZstdDecompressor().decompress(data)
+        case _:
+            raise ValueError(f"Unsupported content encoding: {encoding}")
+
+
+def compress_message(raw: RawMessage, encoding: str, threshold: int) -> RawMessage:
+    """Compress the content of the given raw message, if its size reaches the
+    threshold and it's not compressed yet.
+
+    A new raw message is returned if compressed, since the original one might
+    be shared with others. Otherwise, the original one is returned as is.
+    """
+    if not encoding or raw.header.content_encoding:
+        return raw
+
+    content = raw.content
+    if len(content) < threshold:
+        return raw
+
+    compressed = compress(content, encoding)
+    if len(compressed) >= len(content):
+        # Not worth it.
+        return raw
+
+    return RawMessage(
+        header=raw.header.model_copy(update={"content_encoding": encoding}),
+        reply=raw.reply,
+        content=compressed,
+    )
+
+
+def decompress_content(raw: RawMessage) -> bytes:
+    """Return the decompressed content of the given raw message."""
+    return decompress(raw.content, raw.header.content_encoding)
@@ -1,19 +1,23 @@
 from __future__ import annotations
 
 import asyncio
+import time
+import uuid
 
 from pydantic import BaseModel, Field
 
 from .agent import BaseAgent, Context, handler, Operation
 from .exceptions import AgentTypeNotFoundError
+from .logger import logger
 from .messages import Message
 from .types import (
     Address,
     AgentSpec,
+    Channel,
     RawMessage,
     Subscription,
 )
-from .util import Trie
+from .util import NamespaceIndex
 
 
 SEPARATOR = "."
@@ -55,13 +59,13 @@ class DiscoveryQuery(Message):
             # name is empty.
             return False
 
-        if not name.startswith(self.namespace):
-            # name is not under the namespace.
-            return False
-
         if name == self.namespace:
             return self.inclusive
 
+        if self.namespace and not name.startswith(self.namespace + SEPARATOR):
+            # name is not under the namespace.
+            return False
+
         name_level = len(name.split(SEPARATOR))
         namespace_level = len(self.namespace.split(SEPARATOR)) if self.namespace else 0
         if name_level == namespace_level + 1:
@@ -70,6 +74,20 @@ class DiscoveryQuery(Message):
         # grandchild or great-grandchild, etc.
         return self.recursive
 
+    def covers(self, other: DiscoveryQuery) -> bool:
+        """Check if all names matching the other query also match this query."""
+        if other.namespace == self.namespace:
+            return (self.inclusive or not other.inclusive) and (
+                self.recursive or not other.recursive
+            )
+
+        if not self.namespace or other.namespace.startswith(self.namespace + SEPARATOR):
+            # The namespace of the other query is a sub-namespace, whose
+            # children are grandchildren (or deeper) of this namespace.
+            return self.recursive
+
+        return False
+
 
 class DiscoveryReply(Message):
     """A reply message to a discover message."""
@@ -87,6 +105,13 @@ class DiscoveryBatchReply(Message):
     """A reply message to a batch discovering message."""
 
     replies: list[DiscoveryReply]
+    server_id: str = Field(
+        default="", description="The ID of the discovery server that replied."
+    )
+    server_agents: dict[str, list[str]] = Field(
+        default_factory=dict,
+        description="The names of the agents found by each discovery server that replied (only set by the discovery aggregator).",
+    )
 
 
 class SubscribeToAgentUpdates(Message):
@@ -114,12 +139,18 @@ class AgentsRegistered(Message):
     """A message to notify that one or more agents have been registered."""
 
     agents: list[Schema] = Field(description="A list of agent schemas.")
+    server_id: str = Field(
+        default="", description="The ID of the discovery server that sent it."
+    )
 
 
 class AgentsDeregistered(Message):
     """A message to notify that one or more agents have been deregistered."""
 
     agents: list[Schema] = Field(description="A list of agent schemas.")
+    server_id: str = Field(
+        default="", description="The ID of the discovery server that sent it."
+    )
 
 
 class Discovery(BaseAgent):
@@ -181,33 +212,44 @@ class Discovery(BaseAgent):
             queries=[msg],
         )
         batch_reply = await self.batch_discover(batch_query, ctx)
-        return batch_reply.results[0]
+        return batch_reply.replies[0]
 
     @handler
     async def batch_discover(
         self, msg: DiscoveryBatchQuery, ctx: Context
     ) -> DiscoveryBatchReply:
         """Batch discover agents across multiple namespaces in a distributed manner."""
-        lock: asyncio.Lock = asyncio.Lock()
         batch_agents: list[dict[str, Schema]] = [{} for _ in range(len(msg.queries))]
+        server_agents: dict[str, list[str]] = {}
+
+        # The discovery servers known to be alive, each of which is expected
+        # to reply to the query.
+        expected: set[str] = set(self._server.members)
+        received: set[str] = set()
+        all_received: asyncio.Event = asyncio.Event()
 
         # TODO: Use QueueSubscriptionIterator to simplify this.
         async def receive(raw: RawMessage) -> None:
             # Gather
             batch_reply = DiscoveryBatchReply.decode(raw)
-            if not any(bool(r.agents) for r in batch_reply.replies):
-                return
-
-            await lock.acquire()
-            try:
-                for i, reply in enumerate(batch_reply.replies):
-                    for agent in reply.agents:
-                        batch_agents[i][agent.name] = agent
-            finally:
-                lock.release()
-
-        inbox = await self.channel.new_reply_topic()
-        sub = await self.channel.subscribe(addr=Address(name=inbox), handler=receive)
+            for i, reply in enumerate(batch_reply.replies):
+                for agent in reply.agents:
+                    batch_agents[i][agent.name] = agent
+
+            if batch_reply.server_id:
+                server_agents[batch_reply.server_id] = [
+                    agent.name
+                    for reply in batch_reply.replies
+                    for agent in reply.agents
+                ]
+                received.add(batch_reply.server_id)
+                # The server might be unknown so far (e.g. it was considered
+                # gone due to a slow reply), so add it back.
+                self._server.add_member(batch_reply.server_id)
+            if expected <= received:
+                all_received.set()
+
+        inbox, sub = await self.channel.subscribe_reply(receive)
 
         try:
             # Scatter
@@ -220,8 +262,13 @@ class Discovery(BaseAgent):
             )
 
             # Wait for all discovery servers to respond or timed out.
-            # FIXME: How to get the original timeout specified by the publisher?
-            await asyncio.sleep(0.45)  # Smaller than the default timeout (0.5s).
+            try:
+                await asyncio.wait_for(all_received.wait(), self._get_deadline(msg))
+            except asyncio.TimeoutError:
+                # Consider the servers that failed to respond in time as gone,
+                # to avoid waiting for them over and over again.
+                for server_id in expected - received:
+                    self._server.discard_member(server_id)
 
         finally:
             await sub.unsubscribe()
@@ -230,7 +277,18 @@ class Discovery(BaseAgent):
             for agents in batch_agents:
                 sorted_agents = sorted(agents.values())
                 replies.append(DiscoveryReply(agents=sorted_agents))
-            return DiscoveryBatchReply(replies=replies)
+            return DiscoveryBatchReply(replies=replies, server_agents=server_agents)
+
+    @staticmethod
+    def _get_deadline(msg: Message) -> float:
+        """Return how long (in seconds) to wait for the discovery servers.
+
+        The deadline is taken from the timeout of the original request, with
+        some headroom for sending the aggregated reply back to the requester.
+        """
+        if msg.reply and msg.reply.timeout:
+            return msg.reply.timeout * 0.9
+        return 0.45  # Smaller than the default timeout (0.5s).
 
     @handler
     async def subscribe_to_agent_updates(
@@ -256,30 +314,138 @@ class Discovery(BaseAgent):
 
 
 class _SynchronizeQuery(Message):
-    """An internal message to synchronize agent-subscriptions from other discovery servers."""
+    """An internal message to synchronize agent-subscriptions from other discovery servers.
+
+    It also serves as the announcement of a newly-started discovery server.
+    """
+
+    server_id: str = Field(description="The ID of the discovery server.")
 
 
 class _SynchronizeReply(Message):
     """An internal reply message to a synchronize message."""
 
+    server_id: str = Field(description="The ID of the discovery server.")
     subscriptions: dict[str, list[DiscoveryQuery]] = Field(
         description="Agent subscriptions."
     )
 
 
+class _LeaveQuery(Message):
+    """An internal message to announce that a discovery server is stopping."""
+
+    server_id: str = Field(description="The ID of the discovery server.")
+
+
+class _SubscriptionIndex:
+    """An index of agent-subscriptions by the namespaces of their queries.
+
+    An agent type can only be matched by queries whose namespace is one of
+    its ancestors (or itself). Therefore, finding the subscribers interested
+    in an agent type only visits the queries in those O(depth) namespaces,
+    instead of all the queries of all the subscribers.
+    """
+
+    def __init__(self):
+        self._subscriptions: dict[Address, list[DiscoveryQuery]] = {}
+        # Mapping from namespace to the subscribers (and their queries) on it.
+        self._by_namespace: dict[str, dict[Address, list[DiscoveryQuery]]] = {}
+
+    def __len__(self) -> int:
+        return len(self._subscriptions)
+
+    def items(self):
+        return self._subscriptions.items()
+
+    def add(self, addr: Address, queries: list[DiscoveryQuery]) -> None:
+        self.remove(addr)
+
+        self._subscriptions[addr] = queries
+        for query in queries:
+            subscribers = self._by_namespace.setdefault(query.namespace, {})
+            subscribers.setdefault(addr, []).append(query)
+
+    def remove(self, addr: Address) -> None:
+        queries = self._subscriptions.pop(addr, None)
+        if not queries:
+            return
+
+        for namespace in {query.namespace for query in queries}:
+            subscribers = self._by_namespace[namespace]
+            subscribers.pop(addr, None)
+            if not subscribers:
+                del self._by_namespace[namespace]
+
+    def match(self, name: str) -> list[Address]:
+        """Return the addresses of the subscribers that are interested in
+        the given agent type.
+        """
+        if not name:
+            return []
+
+        parts = name.split(SEPARATOR)
+        matched: dict[Address, None] = {}  # An ordered set.
+
+        for level in range(len(parts) + 1):
+            namespace = SEPARATOR.join(parts[:level])
+            subscribers = self._by_namespace.get(namespace)
+            if not subscribers:
+                continue
+
+            # How many levels the agent type is below the namespace.
+            distance = len(parts) - level
+            for addr, queries in subscribers.items():
+                if addr in matched:
+                    continue
+                for query in queries:
+                    if distance == 0:
+                        ok = query.inclusive
+                    else:
+                        ok = distance == 1 or query.recursive
+                    if ok:
+                        matched[addr] = None
+                        break
+
+        return list(matched)
+
+
 class DiscoveryServer(BaseAgent):
     """A discovery server.
 
     When receiving a discovery query from the discovery aggregator, it will
     search locally for agents under the given namespace and return them to
     the discovery aggregator.
+
+    Discovery servers announce themselves to each other on startup and
+    shutdown, so that each of them knows all the alive members, and the
+    discovery aggregator can tell how many replies to expect.
     """
 
     def __init__(self):
         super().__init__()
 
-        self._agent_schemas: Trie = Trie(separator=SEPARATOR)
-        self._agent_subscriptions: dict[Address, list[DiscoveryQuery]] = {}
+        self._agent_schemas: NamespaceIndex = NamespaceIndex(separator=SEPARATOR)
+        self._agent_subscriptions: _SubscriptionIndex = _SubscriptionIndex()
+
+        self._server_id: str = uuid.uuid4().hex
+        # The IDs of all known discovery servers, including the current one.
+        self._members: set[str] = {self._server_id}
+
+    @property
+    def server_id(self) -> str:
+        return self._server_id
+
+    @property
+    def members(self) -> frozenset[str]:
+        """The IDs of all known discovery servers."""
+        return frozenset(self._members)
+
+    def add_member(self, server_id: str) -> None:
+        self._members.add(server_id)
+
+    def discard_member(self, server_id: str) -> None:
+        if server_id != self._server_id:
+            self._members.discard(server_id)
 
     async def start(self) -> None:
         """Since discovery server is a special agent, we need to start it in a different way."""
@@ -292,18 +458,18 @@ class DiscoveryServer(BaseAgent):
         async def receive(raw: RawMessage) -> None:
             # Gather
             reply = _SynchronizeReply.decode(raw)
+            self.add_member(reply.server_id)
             for topic, queries in reply.subscriptions.items():
                 addr = Address.from_topic(topic)
-                self._agent_subscriptions[addr] = queries
+                self._agent_subscriptions.add(addr, queries)
 
-        inbox = await self.channel.new_reply_topic()
-        sub = await self.channel.subscribe(addr=Address(name=inbox), handler=receive)
+        inbox, sub = await self.channel.subscribe_reply(receive)
 
         try:
             # Scatter
             await self.channel.publish(
                 self.address,
-                _SynchronizeQuery().encode(),
+                _SynchronizeQuery(server_id=self._server_id).encode(),
                 request=True,
                 reply=inbox,
                 probe=False,
@@ -314,6 +480,17 @@ class DiscoveryServer(BaseAgent):
         finally:
             await sub.unsubscribe()
 
+    async def stop(self) -> None:
+        """Since discovery server is a special agent, we need to stop it in a different way."""
+        # Notify other discovery servers that the current one is leaving.
+        await self.channel.publish(
+            self.address,
+            _LeaveQuery(server_id=self._server_id).encode(),
+            probe=False,
+        )
+
+        await super().stop()
+
     async def register(self, spec: AgentSpec) -> None:
         if spec.name == self.address.name:
             raise ValueError(f"Agent type '{self.address.name}' is reserved")
@@ -325,13 +502,14 @@ class DiscoveryServer(BaseAgent):
         schema = Schema(name=spec.name, description=description, operations=operations)
         self._agent_schemas[spec.name] = schema
 
-        # Notify all subscribers about the registration of the new agent.
-        for addr, queries in self._agent_subscriptions.items():
-            if any(query.matches(spec.name) for query in queries):
-                msg = AgentsRegistered(
-                    agents=[Schema(name=schema.name, description=schema.description)]
-                )
-                await self.channel.publish(addr, msg.encode())
+        # Notify the interested subscribers about the registration of the new agent.
+        subscribers = self._agent_subscriptions.match(spec.name)
+        if subscribers:
+            msg = AgentsRegistered(
+                agents=[Schema(name=schema.name, description=schema.description)],
+                server_id=self._server_id,
+            )
+            await self._notify(dict.fromkeys(subscribers, msg))
 
     async def deregister(self, *names: str) -> None:
         candidate_names = []
@@ -345,32 +523,55 @@ class DiscoveryServer(BaseAgent):
             candidate_names = self._agent_schemas.keys()
             self._agent_schemas.clear()
 
-        # Notify all subscribers about the deregistration of the involved agents.
-        for addr, queries in self._agent_subscriptions.items():
-            matched_names = [
-                name
-                for name in candidate_names
-                if any(query.matches(name) for query in queries)
-            ]
-            if matched_names:
-                msg = AgentsDeregistered(
-                    agents=[Schema(name=name) for name in matched_names]
+        # Notify the interested subscribers about the deregistration of the
+        # involved agents, with one message per subscriber.
+        matched_names: dict[Address, list[str]] = {}
+        for name in candidate_names:
+            for addr in self._agent_subscriptions.match(name):
+                matched_names.setdefault(addr, []).append(name)
+
+        await self._notify(
+            {
+                addr: AgentsDeregistered(
+                    agents=[Schema(name=name) for name in names],
+                    server_id=self._server_id,
                 )
-                try:
-                    await self.channel.publish(addr, msg.encode())
-                except AgentTypeNotFoundError:
-                    # The subscribing agent itself has been deregistered.
-                    # Just ignore it.
-                    pass
+                for addr, names in matched_names.items()
+            }
+        )
+
+    async def _notify(self, messages: dict[Address, Message]) -> None:
+        """Send the notifications to the subscribers concurrently."""
+
+        async def send(addr: Address, msg: Message) -> None:
+            try:
+                await self.channel.publish(addr, msg.encode())
+            except AgentTypeNotFoundError:
+                # The subscribing agent itself has been deregistered.
+                # Just ignore it.
+                pass
+            except Exception as exc:
+                logger.warning(
+                    f"[{self.__class__.__name__} {self.id}] Failed to notify {addr.topic}: {exc}"
+                )
+
+        await asyncio.gather(*(send(addr, msg) for addr, msg in messages.items()))
 
     @handler
     async def synchronize(
         self, msg: _SynchronizeQuery, ctx: Context
     ) -> _SynchronizeReply:
+        # A new discovery server has joined.
+        self.add_member(msg.server_id)
+
         subscriptions = {
             addr.topic: queries for addr, queries in self._agent_subscriptions.items()
         }
-        return _SynchronizeReply(subscriptions=subscriptions)
+        return _SynchronizeReply(server_id=self._server_id, subscriptions=subscriptions)
+
+    @handler
+    async def leave(self, msg: _LeaveQuery, ctx: Context) -> None:
+        self.discard_member(msg.server_id)
 
     @handler
     async def batch_search(
@@ -380,7 +581,7 @@ class DiscoveryServer(BaseAgent):
         for query in msg.queries:
             result = await self._search(query, ctx)
             replies.append(result)
-        return DiscoveryBatchReply(replies=replies)
+        return DiscoveryBatchReply(replies=replies, server_id=self._server_id)
 
     async def _search(self, msg: DiscoveryQuery, ctx: Context) -> DiscoveryReply:
         """
@@ -436,11 +637,7 @@ class DiscoveryServer(BaseAgent):
             b.z.0
         """
         if msg.recursive:
-            try:
-                namespace = msg.namespace or Trie.EMPTY
-                schemas = self._agent_schemas.values(namespace)
-            except KeyError:
-                schemas = []
+            schemas = self._agent_schemas.values(msg.namespace)
         else:
             schemas = self._agent_schemas.direct_values(msg.namespace)
 
@@ -466,10 +663,262 @@ class DiscoveryServer(BaseAgent):
     async def subscribe_to_agent_updates(
         self, msg: SubscribeToAgentUpdates, ctx: Context
     ) -> None:
-        self._agent_subscriptions[msg.sender] = msg.queries
+        self._agent_subscriptions.add(msg.sender, msg.queries)
 
     @handler
     async def unsubscribe_from_agent_updates(
         self, msg: UnsubscribeFromAgentUpdates, ctx: Context
     ) -> None:
-        self._agent_subscriptions.pop(msg.sender, None)
+        self._agent_subscriptions.remove(msg.sender)
+
+
+class DiscoveryCache:
+    """A client-side cache of agent schemas, which answers discovery queries
+    locally instead of scattering them to all discovery servers.
+
+    Upon the first query, the cache subscribes to updates on the agents that
+    match `queries`, and loads the existing ones. After that, it's kept
+    up-to-date by `AgentsRegistered` and `AgentsDeregistered` notifications.
+
+    Since a crashed node never sends the deregistration notifications, the
+    cache also reloads the agents from all discovery servers every `ttl / 2`
+    seconds, and expires the agents of the servers that have not answered
+    for `ttl` seconds.
+
+    Queries not covered by the cache fall back to the discovery agent. So are
+    detailed queries, since the notifications carry no operations.
+
+    Args:
+        channel (Channel): The channel to communicate through.
+        queries (list[DiscoveryQuery], optional): The queries for agents to
+            cache. Defaults to all agents.
+        ttl (float, optional): How long (in seconds) to keep the agents of
+            a discovery server since it answered last. Defaults to 60.
+            If set to 0, the agents never expire.
+    """
+
+    def __init__(
+        self,
+        channel: Channel,
+        queries: list[DiscoveryQuery] | None = None,
+        ttl: float = 60,
+    ):
+        self._channel: Channel = channel
+        self._queries: list[DiscoveryQuery] = queries or [
+            DiscoveryQuery(namespace="", recursive=True, inclusive=True)
+        ]
+        self._ttl: float = ttl
+
+        self._address: Address = Address(name="discovery_cache", id=uuid.uuid4().hex)
+        self._discovery_address: Address = Address(name="discovery")
+
+        self._schemas: dict[str, Schema] = {}
+        # The names of the agents found by each discovery server, and the
+        # time when each server answered last.
+        self._server_agents: dict[str, set[str]] = {}
+        self._server_seen_at: dict[str, float] = {}
+        # Updates received while loading the existing agents.
+        self._pending: list[RawMessage] | None = None
+        self._sub: Subscription | None = None
+        self._refresh_task: asyncio.Task | None = None
+        self._lock: asyncio.Lock = asyncio.Lock()
+
+    @property
+    def started(self) -> bool:
+        return self._sub is not None
+
+    async def start(self) -> None:
+        """Start keeping the cache up-to-date. It's safe to call it repeatedly."""
+        async with self._lock:
+            if self._sub:
+                return
+
+            self._sub = await self._channel.subscribe(
+                self._address, handler=self._receive
+            )
+            try:
+                # Wait for the subscription to be in place before loading,
+                # so that no update in between will be missed.
+                msg = SubscribeToAgentUpdates(
+                    sender=self._address, queries=self._queries
+                )
+                await self._channel.publish(
+                    self._discovery_address, msg.encode(), request=True, probe=False
+                )
+
+                # Load the existing agents.
+                await self._load()
+            except BaseException:
+                await self._sub.unsubscribe()
+                self._sub = None
+                self._clear()
+                raise
+
+            if self._ttl > 0:
+                self._refresh_task = asyncio.create_task(self._refresh())
+
+    async def stop(self) -> None:
+        async with self._lock:
+            if not self._sub:
+                return
+
+            if self._refresh_task:
+                self._refresh_task.cancel()
+                await asyncio.wait([self._refresh_task])
+                self._refresh_task = None
+
+            msg = UnsubscribeFromAgentUpdates(sender=self._address)
+            await self._channel.publish(
+                self._discovery_address, msg.encode(), probe=False
+            )
+
+            await self._sub.unsubscribe()
+            self._sub = None
+            self._clear()
+
+    async def discover(
+        self, msg: DiscoveryQuery, timeout: float = 0.5
+    ) -> DiscoveryReply:
+        """Discover agents in a given namespace."""
+        batch_reply = await self.batch_discover(
+            DiscoveryBatchQuery(queries=[msg]), timeout=timeout
+        )
+        return batch_reply.replies[0]
+
+    async def batch_discover(
+        self, msg: DiscoveryBatchQuery, timeout: float = 0.5
+    ) -> DiscoveryBatchReply:
+        """Batch discover agents across multiple namespaces.
+
+        Args:
+            msg (DiscoveryBatchQuery): The batch query.
+            timeout (float, optional): The timeout for querying the discovery
+                agent, if any query is not covered by the cache. Defaults to 0.5.
+        """
+        await self.start()
+
+        replies: list[DiscoveryReply | None] = []
+        misses: list[DiscoveryQuery] = []
+        for query in msg.queries:
+            if self._covers(query):
+                replies.append(self._search(query))
+            else:
+                replies.append(None)
+                misses.append(query)
+
+        if misses:
+            batch_reply = await self._request(
+                DiscoveryBatchQuery(queries=misses), timeout=timeout
+            )
+            remote_replies = iter(batch_reply.replies)
+            replies = [r if r is not None else next(remote_replies) for r in replies]
+
+        return DiscoveryBatchReply(replies=replies)
+
+    def _covers(self, query: DiscoveryQuery) -> bool:
+        if query.detailed:
+            return False
+        return any(q.covers(query) for q in self._queries)
+
+    def _search(self, query: DiscoveryQuery) -> DiscoveryReply:
+        agents = [
+            Schema(name=schema.name, description=schema.description)
+            for schema in sorted(self._schemas.values())
+            if query.matches(schema.name)
+        ]
+        return DiscoveryReply(agents=agents)
+
+    async def _request(
+        self, msg: DiscoveryBatchQuery, timeout: float = 0.5
+    ) -> DiscoveryBatchReply:
+        result: RawMessage = await self._channel.publish(
+            self._discovery_address,
+            msg.encode(),
+            request=True,
+            timeout=timeout,
+            probe=False,
+        )
+        return DiscoveryBatchReply.decode(result)
+
+    async def _load(self) -> None:
+        """Load the existing agents from all discovery servers."""
+        self._pending = []
+        try:
+            batch_reply = await self._request(
+                DiscoveryBatchQuery(queries=self._queries)
+            )
+
+            # The agents found by a server replace the old ones, while the
+            # servers that did not answer keep theirs until they expire.
+            now = time.monotonic()
+            for server_id, names in batch_reply.server_agents.items():
+                self._server_agents[server_id] = set(names)
+                self._server_seen_at[server_id] = now
+            for reply in batch_reply.replies:
+                for agent in reply.agents:
+                    self._schemas[agent.name] = agent
+            self._drop_orphans()
+        finally:
+            # Apply the updates received during loading, which are newer.
+            pending, self._pending = self._pending, None
+            for raw in pending:
+                self._apply(raw)
+
+    async def _refresh(self) -> None:
+        """Reload the agents periodically, and expire the ones of the
+        discovery servers that stopped answering (e.g. due to a crash).
+        """
+        while True:
+            await asyncio.sleep(self._ttl / 2)
+            try:
+                await self._load()
+            except Exception as exc:
+                logger.warning(f"[DiscoveryCache] Failed to reload agents: {exc}")
+            self._expire()
+
+    def _expire(self) -> None:
+        deadline = time.monotonic() - self._ttl
+        for server_id, seen_at in list(self._server_seen_at.items()):
+            if seen_at < deadline:
+                del self._server_seen_at[server_id]
+                self._server_agents.pop(server_id, None)
+        self._drop_orphans()
+
+    def _drop_orphans(self) -> None:
+        """Remove the agents that are no longer found by any discovery server."""
+        alive: set[str] = set().union(*self._server_agents.values())
+        for name in list(self._schemas):
+            if name not in alive:
+                del self._schemas[name]
+
+    def _clear(self) -> None:
+        self._schemas.clear()
+        self._server_agents.clear()
+        self._server_seen_at.clear()
+        self._pending = None
+
+    async def _receive(self, raw: RawMessage) -> None:
+        if self._pending is not None:
+            self._pending.append(raw)
+        else:
+            self._apply(raw)
+
+    def _apply(self, raw: RawMessage) -> None:
+        if raw.header.type == AgentsRegistered.__name__:
+            msg = AgentsRegistered.decode(raw)
+            names = self._seen(msg.server_id)
+            for agent in msg.agents:
+                names.add(agent.name)
+                self._schemas[agent.name] = agent
+        elif raw.header.type == AgentsDeregistered.__name__:
+            msg = AgentsDeregistered.decode(raw)
+            names = self._seen(msg.server_id)
+            for agent in msg.agents:
+                names.discard(agent.name)
+            self._drop_orphans()
+        # Ignore other messages (e.g. probes).
+
+    def _seen(self, server_id: str) -> set[str]:
+        """Mark the discovery server as alive, and return its agent names."""
+        self._server_seen_at[server_id] = time.monotonic()
+        return self._server_agents.setdefault(server_id, set())
@@ -101,5 +101,13 @@ class DeadlineExceededError(BaseError):
     """Raised when a context deadline is exceeded."""
 
 
+class OverloadedError(BaseError):
+    """Raised when the receiver is overloaded and can not accept more messages."""
+
+
+# An alias of `OverloadedError`.
+Overloaded = OverloadedError
+
+
 class StreamError(BaseError):
     """Raised when the sender requests a non-streaming result but the receiver sends a stream."""
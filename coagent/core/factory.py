@@ -1,22 +1,42 @@
 import asyncio
+import heapq
+import itertools
+import math
+import time
 import uuid
 
+from pydantic import Field, SerializeAsAny
+
 from .agent import BaseAgent, Context, handler
 from .logger import logger
-from .messages import Message
+from .messages import Empty, Message
 from .types import (
     Address,
     Agent,
     AgentSpec,
-    State,
+    RawMessage,
     Subscription,
 )
 
 
 class CreateAgent(Message):
-    """A message to create an agent associated with a session ID."""
+    """A message to create an agent associated with a session ID.
+
+    If `raw` is given, the factory will create the agent if it does not exist,
+    and then deliver `raw` to the agent directly. This saves the round-trip of
+    waiting for the agent to be created before sending the first message.
+
+    In this case, the replies from the agent will be sent to `raw.reply` if
+    it's set, and the factory will acknowledge the creation by replying to
+    this message. Otherwise, the replies will be sent to the reply address of
+    this message, and the factory will not acknowledge the creation.
+    """
 
     session_id: str
+    # Serialize as any, in case that `raw` is a `LazyRawMessage`.
+    raw: SerializeAsAny[RawMessage] | None = Field(
+        default=None, description="The first message to deliver to the agent."
+    )
 
 
 class DeleteAgent(Message):
@@ -40,6 +60,16 @@ class Factory(BaseAgent):
         self._agents: dict[Address, Agent] = {}
         self._lock: asyncio.Lock = asyncio.Lock()
 
+        # A min-heap of (expires_at, seq, address, agent), which serves as
+        # an index of agents ordered by the time they become IDLE.
+        #
+        # Since an agent's expiry time is extended whenever it receives a
+        # message, the entries may be outdated. They are lazily rechecked (and
+        # re-pushed if necessary) when they are popped from the heap. Therefore,
+        # each recycle only needs to visit the agents that have expired.
+        self._expiry_heap: list[tuple[float, int, Address, Agent]] = []
+        self._expiry_seq: itertools.count = itertools.count()
+
         # Instance subscription for the current factory agent.
         #
         # Note that there are two types of subscriptions:
@@ -90,6 +120,7 @@ class Factory(BaseAgent):
         for agent in self._agents.values():
             await agent.stop()
         self._agents.clear()
+        self._expiry_heap.clear()
 
         # Cancel the recycle loop.
         if self._recycle_task:
@@ -103,45 +134,91 @@ class Factory(BaseAgent):
     async def _recycle(self) -> None:
         """The recycle loop for deleting idle agents."""
         while True:
-            # Recycle every 20 seconds.
-            # TODO: Make the recycle interval configurable.
-            await asyncio.sleep(20)
-
-            total_num: int = 0
-            idle_agents: list[Address] = []
-
-            async with self._lock:
-                for addr, agent in self._agents.items():
-                    total_num += 1
-                    state = await agent.get_state()
-                    if state == State.IDLE:
-                        idle_agents.append(addr)
-
-            idle_num = len(idle_agents)
-            if not idle_num:
+            # Wake up when the earliest agent expires, or at least every
+            # `recycle_interval` seconds.
+            delay = self._spec.recycle_interval
+            if self._expiry_heap:
+                delay = min(delay, max(0, self._expiry_heap[0][0] - time.time()))
+            await asyncio.sleep(delay)
+
+            deleted_agents = self._pop_expired_agents()
+            if not deleted_agents:
                 continue
 
-            running_num = total_num - idle_num
             logger.debug(
-                f"[Factory {self.id}] Recycling agents: {running_num} running, {idle_num} idle"
+                f"[Factory {self.id}] Recycling agents: {len(self._agents)} running, {len(deleted_agents)} idle"
             )
 
-            deleted_agents: list[Agent] = []
-            async with self._lock:
-                for addr in idle_agents:
-                    agent = self._agents.pop(addr, None)
-                    if agent:
-                        deleted_agents.append(agent)
-
             for agent in deleted_agents:
                 await agent.stop()
 
-    @handler
+    def _push_expiry(self, addr: Address, agent: Agent) -> None:
+        expires_at = agent.expires_at
+        if expires_at == math.inf:
+            # The agent never expires.
+            return
+        entry = (expires_at, next(self._expiry_seq), addr, agent)
+        heapq.heappush(self._expiry_heap, entry)
+
+    def _pop_expired_agents(self) -> list[Agent]:
+        """Remove all expired agents and return them.
+
+        Note that this method is synchronous, so there's no need to acquire
+        `self._lock` since no other coroutines can run in the meantime.
+        """
+        now = time.time()
+        expired: list[Agent] = []
+
+        while self._expiry_heap and self._expiry_heap[0][0] <= now:
+            _, _, addr, agent = heapq.heappop(self._expiry_heap)
+            if self._agents.get(addr) is not agent:
+                # The agent has already been deleted.
+                continue
+
+            if agent.expires_at > now:
+                # The agent has received messages since the entry was pushed.
+                self._push_expiry(addr, agent)
+                continue
+
+            del self._agents[addr]
+            expired.append(agent)
+
+        return expired
+
+    @handler(deferred=True)
     async def create_agent(self, msg: CreateAgent, ctx: Context) -> None:
+        try:
+            agent = await self._get_or_create_agent(msg.session_id)
+        except Exception as exc:
+            await self.replier.raise_exc(msg, exc)
+            if msg.raw and msg.raw.reply:
+                await self.replier.raise_exc(msg.raw, exc)
+            return
+
+        if msg.raw is None:
+            # Acknowledge the creation.
+            await self.replier.send(msg, Empty())
+            return
+
+        raw = msg.raw
+        ack = bool(raw.reply)
+        if not ack:
+            # The agent will reply to the sender of the CreateAgent message.
+            raw.reply = msg.reply
+
+        # Deliver the first message to the agent directly.
+        await agent.receive(raw)
+
+        if ack:
+            # Acknowledge the creation and the delivery.
+            await self.replier.send(msg, Empty())
+
+    async def _get_or_create_agent(self, session_id: str) -> Agent:
         async with self._lock:
-            addr = Address(name=self.address.name, id=msg.session_id)
-            if addr in self._agents:
-                return
+            addr = Address(name=self.address.name, id=session_id)
+            agent = self._agents.get(addr)
+            if agent:
+                return agent
 
             # Create an agent with the given channel, address and factory address.
             agent = await self._spec.constructor(
@@ -150,6 +227,9 @@ class Factory(BaseAgent):
             self._agents[addr] = agent
 
             await agent.start()
+            self._push_expiry(addr, agent)
+
+            return agent
 
     @handler
     async def delete_agent(self, msg: DeleteAgent, ctx: Context) -> None:
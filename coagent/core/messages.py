@@ -1,9 +1,17 @@
 from __future__ import annotations
 
-import json
+import asyncio
+from typing import AsyncIterator
+
 from pydantic import BaseModel, ConfigDict, Field, ValidationError
 
-from .types import MessageHeader, RawMessage, Reply
+from .codecs import Codec, get_codec
+from .compression import decompress_content
+from .types import LazyRawMessage, MessageHeader, RawMessage, Reply
+
+
+# The fields carried in the header of a raw message, rather than in its content.
+_header_fields = frozenset({"reply", "extensions"})
 
 
 class Message(BaseModel):
@@ -23,45 +31,241 @@ class Message(BaseModel):
         """
         return NotImplemented
 
+    def accumulator(self) -> Accumulator:
+        """Return an accumulator starting with this message, which aggregates
+        multiple streaming messages into one message.
+
+        The default accumulator folds the messages with `+` (see `__add__()`).
+        Subclasses whose concatenation costs linear time per message (e.g.
+        joining strings) should return a buffer-based accumulator instead.
+        """
+        return Accumulator(self)
+
     def encode(
-        self, content_type: str = "application/json", exclude_defaults: bool = True
+        self,
+        content_type: str = "application/json",
+        exclude_defaults: bool = True,
+        lazy: bool = False,
     ) -> RawMessage:
-        if not content_type == "application/json":
-            raise ValidationError.from_exception_data("Invalid content type", [])
+        """Encode the message into a raw message.
+
+        Args:
+            content_type (str, optional): The content type, which selects the codec
+                (see `coagent.core.codecs`). Defaults to "application/json".
+            exclude_defaults (bool, optional): Whether to exclude fields with default values. Defaults to True.
+            lazy (bool, optional): Whether to defer the serialization until the
+                content is needed. The message itself is carried along, so that
+                an in-process receiver can use a shallow copy of it. Note that the
+                nested objects of the message must not be modified after being
+                encoded lazily. Defaults to False.
+        """
+        codec = _get_codec(content_type)
 
-        content = self.model_dump_json(
-            exclude={"reply", "extensions"},
-            exclude_defaults=exclude_defaults,
-            by_alias=True,
-        )
-        if content == "{}":
-            content = ""
-
-        return RawMessage(
-            header=MessageHeader(
-                type=self.__class__.__name__,
-                content_type=content_type,
-                extensions=self.extensions,
-            ),
-            content=content.encode("utf-8"),
+        header = MessageHeader(
+            type=self.__class__.__name__,
+            content_type=content_type,
+            extensions=self.extensions,
         )
+        if lazy:
+            return LazyRawMessage.from_message(
+                header,
+                self,
+                lambda: codec.encode(self, _header_fields, exclude_defaults),
+            )
+        content = codec.encode(self, _header_fields, exclude_defaults)
+        return RawMessage(header=header, content=content)
 
     @classmethod
     def decode(cls, raw: RawMessage) -> Message:
         if raw.header.type != cls.__name__:
             raise ValidationError.from_exception_data("Invalid message type", [])
 
-        if not raw.header.content_type == "application/json":
-            raise ValidationError.from_exception_data("Invalid content type", [])
+        codec = _get_codec(raw.header.content_type)
+
+        msg = raw.message
+        if type(msg) is cls:
+            # The message is handed over directly, so skip the deserialization.
+            # Always make a shallow copy, since the message is shared with the
+            # sender (and possibly other receivers).
+            return msg.model_copy(
+                update={"reply": raw.reply, "extensions": raw.header.extensions}
+            )
 
-        data = {"reply": raw.reply, "extensions": raw.header.extensions}
-        if raw.content:
+        content = raw.content
+        if raw.header.content_encoding:
+            # Decompress the content lazily, i.e. only when it's decoded.
             try:
-                data.update(json.loads(raw.content.decode("utf-8")))
-            except json.JSONDecodeError as exc:
+                content = decompress_content(raw)
+            except Exception as exc:
                 raise ValidationError.from_exception_data(str(exc), [])
+        try:
+            msg = codec.decode(cls, content)
+        except ValidationError:
+            raise
+        except Exception as exc:
+            # E.g. a missing codec package or malformed content, which must be
+            # reported as a decode error instead of breaking the receiver.
+            raise ValidationError.from_exception_data(str(exc), [])
+
+        # The header fields are not part of the content, so set them afterwards
+        # (without validation, like `model_construct()` does).
+        if raw.reply is not None or raw.header.extensions:
+            msg.__dict__.update(reply=raw.reply, extensions=raw.header.extensions)
+            msg.__pydantic_fields_set__.update(_header_fields)
+        return msg
+
+
+class Accumulator:
+    """Accumulator aggregates multiple streaming messages into one message.
+
+    Args:
+        msg (Message): The first message.
+    """
+
+    def __init__(self, msg: Message):
+        self._result: Message = msg
+
+    def add(self, msg: Message) -> None:
+        """Add the next message.
+
+        Raises:
+            TypeError: If the messages can not be concatenated.
+        """
+        self._result += msg
+
+    def result(self) -> Message:
+        """Return the aggregated message."""
+        return self._result
+
+    @property
+    def mergeable(self) -> bool:
+        """Whether any message can be merged into the aggregated one when
+        coalescing a stream (see `coalesce()`).
+
+        By default, only messages that opt in, by supporting concatenation
+        (see `Message.__add__()`) or by having their own accumulators, are
+        mergeable. Others are never held back for merging.
+        """
+        return (
+            type(self) is not Accumulator
+            or type(self._result).__add__ is not Message.__add__
+        )
+
+    def can_add(self, msg: Message) -> bool:
+        """Check if the next message can be merged into the aggregated one when
+        coalescing a stream (see `coalesce()`).
+
+        By default, only mergeable messages of the same type can be merged.
+        """
+        return self.mergeable and type(msg) is type(self._result)
+
+
+async def coalesce(
+    msgs: AsyncIterator[Message], window: float, max_size: int = 0
+) -> AsyncIterator[Message]:
+    """Merge consecutive mergeable messages of a stream, which reduces the
+    number of messages to send.
+
+    A message is merged into the pending one if its accumulator accepts it
+    (see `Accumulator.can_add()` and `Accumulator.add()`). Otherwise, the
+    pending message is yielded first. Messages that are not mergeable at all
+    (see `Accumulator.mergeable`) are yielded without delay.
+
+    Args:
+        msgs (AsyncIterator[Message]): The messages to coalesce.
+        window (float): The maximum time (in seconds) that a message can be held
+            back for merging, counted from its arrival.
+        max_size (int, optional): The maximum number of messages to merge into
+            one. Defaults to 0, which means no limit.
+    """
+    loop = asyncio.get_running_loop()
+
+    # The source is driven by one dedicated task, since stepping it from
+    # different tasks breaks its cancel scopes (e.g. `asyncio.timeout()`).
+    # Each item is a message, or (None, None) at the end, or (None, error).
+    queue: asyncio.Queue[tuple[Message | None, Exception | None]] = asyncio.Queue(
+        maxsize=1
+    )
 
-        return cls.model_validate(data)
+    async def pump() -> None:
+        it = aiter(msgs)
+        try:
+            async for msg in it:
+                await queue.put((msg, None))
+            await queue.put((None, None))
+        except Exception as exc:
+            await queue.put((None, exc))
+        finally:
+            if hasattr(it, "aclose"):
+                await it.aclose()
+
+    pump_task = asyncio.create_task(pump())
+
+    accumulator: Accumulator | None = None
+    size: int = 0
+    deadline: float = 0
+
+    try:
+        while True:
+            if accumulator is None:
+                # Nothing is held back, just wait for the next message.
+                msg, exc = await queue.get()
+            else:
+                timeout = max(0.0, deadline - loop.time())
+                try:
+                    msg, exc = await asyncio.wait_for(queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    # The window is closed.
+                    yield accumulator.result()
+                    accumulator = None
+                    continue
+
+            if exc is not None:
+                raise exc
+            if msg is None:
+                break
+
+            if accumulator is not None:
+                if accumulator.can_add(msg):
+                    try:
+                        accumulator.add(msg)
+                    except TypeError:
+                        pass
+                    else:
+                        size += 1
+                        if max_size and size >= max_size:
+                            yield accumulator.result()
+                            accumulator = None
+                        continue
+                yield accumulator.result()
+
+            accumulator = msg.accumulator()
+            if not accumulator.mergeable:
+                # Send it at once, since there's nothing to wait for.
+                yield accumulator.result()
+                accumulator = None
+                continue
+            size = 1
+            deadline = loop.time() + window
+    except Exception:
+        # Send out the pending message before the error.
+        if accumulator is not None:
+            yield accumulator.result()
+        raise
+    finally:
+        # Stop the pump, which closes the source.
+        pump_task.cancel()
+        await asyncio.wait([pump_task])
+
+    if accumulator is not None:
+        yield accumulator.result()
+
+
+def _get_codec(content_type: str) -> Codec:
+    codec = get_codec(content_type)
+    if codec is None:
+        raise ValidationError.from_exception_data("Invalid content type", [])
+    return codec
 
 
 class ControlMessage(Message):
@@ -96,7 +300,10 @@ class GenericMessage(Message):
     raw: RawMessage = Field(..., description="The raw message.")
 
     def encode(
-        self, content_type: str = "application/json", exclude_defaults: bool = True
+        self,
+        content_type: str = "application/json",
+        exclude_defaults: bool = True,
+        lazy: bool = False,
     ) -> RawMessage:
         return self.raw
 
@@ -1,22 +1,24 @@
 import abc
 import asyncio
 from typing import AsyncIterator, Awaitable, Callable
+import uuid
 
 import pydantic
 
 from .discovery import Discovery
-from .exceptions import BaseError
-from .messages import Cancel, Error, StopIteration
+from .exceptions import BaseError, DeadlineExceededError
+from .messages import Cancel, Empty, Error, StopIteration
 from .factory import Factory
 from .types import (
     AgentSpec,
     Channel,
+    OverflowPolicy,
     Runtime,
     Address,
     RawMessage,
     Subscription,
 )
-from .util import wait_for_shutdown
+from .util import BoundedQueue, wait_for_shutdown
 
 
 class BaseRuntime(Runtime):
@@ -34,6 +36,7 @@ class BaseRuntime(Runtime):
         await self._discovery.start()
 
     async def stop(self) -> None:
+        await self._channel.discovery_cache.stop()
         await self._discovery.stop()
         await self.deregister()
         await self._channel.close()
@@ -86,9 +89,12 @@ class BaseChannel(Channel):
         reply: str = "",
         timeout: float = 0.5,
         probe: bool = True,
+        idle_timeout: float | None = None,
     ) -> AsyncIterator[RawMessage] | RawMessage | None:
         if stream:
-            return self._publish_stream(addr, msg, probe=probe)
+            return self._publish_stream(
+                addr, msg, probe=probe, idle_timeout=idle_timeout
+            )
         else:
             return await self._publish(
                 addr,
@@ -118,6 +124,7 @@ class BaseChannel(Channel):
         addr: Address,
         msg: RawMessage,
         probe: bool = True,
+        idle_timeout: float | None = None,
     ) -> AsyncIterator[RawMessage]:
         """Publish a message and wait for multiple reply messages.
 
@@ -125,13 +132,15 @@ class BaseChannel(Channel):
             addr (Address): The address of the agent.
             msg (RawMessage): The raw message to send.
             probe (bool, optional): Whether to probe the agent before sending the message. Defaults to True.
+            idle_timeout (float, optional): The maximum time to wait for each message. Defaults to None.
 
         This is a default implementation that leverages the channel's own subscribe and _publish methods.
         """
-        queue: QueueSubscriptionIterator = QueueSubscriptionIterator()
+        queue: QueueSubscriptionIterator = QueueSubscriptionIterator(
+            idle_timeout=idle_timeout
+        )
 
-        inbox = await self.new_reply_topic()
-        sub = await self.subscribe(addr=Address(name=inbox), handler=queue.receive)
+        inbox, sub = await self.subscribe_reply(queue.receive)
 
         await self._publish(
             addr,
@@ -143,12 +152,9 @@ class BaseChannel(Channel):
         )
 
         try:
+            # Note that the queue raises the error carried by an Error message.
             async for msg in queue:
-                try:
-                    err = Error.decode(msg)
-                    raise BaseError.decode_message(err)
-                except pydantic.ValidationError:
-                    yield msg
+                yield msg
         finally:
             await sub.unsubscribe()
 
@@ -159,28 +165,142 @@ class BaseChannel(Channel):
         await self.publish(addr, Cancel().encode(), probe=False)
 
 
+class ReplyInbox:
+    """A reply inbox shared by all the requests over a channel.
+
+    The channel holds one long-lived subscription to all topics under `prefix`,
+    and each request gets its own reply topic `<prefix>.<correlation ID>`.
+    The replies are then demultiplexed to the handlers by the correlation ID.
+
+    Since the correlation ID is carried by the reply topic, any replier that
+    simply sends replies to the given address will work as expected.
+
+    Note that handlers should return quickly, since a slow handler may delay
+    the replies to other requests.
+    """
+
+    def __init__(self, prefix: str):
+        self.prefix: str = prefix
+        self._handlers: dict[str, Callable[[RawMessage], Awaitable[None]]] = {}
+
+    def __len__(self) -> int:
+        return len(self._handlers)
+
+    def owns(self, topic: str) -> bool:
+        """Check if the given reply topic belongs to this inbox."""
+        return topic.startswith(f"{self.prefix}.")
+
+    def subscribe(
+        self, handler: Callable[[RawMessage], Awaitable[None]]
+    ) -> tuple[str, Subscription]:
+        correlation_id = uuid.uuid4().hex
+        self._handlers[correlation_id] = handler
+        topic = f"{self.prefix}.{correlation_id}"
+        return topic, ReplyInboxSubscription(self, correlation_id)
+
+    def unsubscribe(self, correlation_id: str) -> None:
+        self._handlers.pop(correlation_id, None)
+
+    async def dispatch(self, topic: str, raw: RawMessage) -> None:
+        """Dispatch the reply received on the given topic to its handler."""
+        correlation_id = topic[len(self.prefix) + 1 :]
+        handler = self._handlers.get(correlation_id)
+        if handler:
+            await handler(raw)
+        # Otherwise, the requester has gone, just drop the reply.
+
+
+class ReplyInboxSubscription(Subscription):
+    """A subscription to a reply topic of a `ReplyInbox`."""
+
+    def __init__(self, inbox: ReplyInbox, correlation_id: str):
+        self._inbox: ReplyInbox = inbox
+        self._correlation_id: str = correlation_id
+
+    async def unsubscribe(self, limit: int = 0) -> None:
+        self._inbox.unsubscribe(self._correlation_id)
+
+
+_empty_type = Empty.__name__
+_error_type = Error.__name__
+_stop_iteration_type = StopIteration.__name__
+
+
+def raise_if_error(raw: RawMessage) -> None:
+    """Raise the error carried by the given message, if it's an Error message.
+
+    The message is classified by its header type, so that normal messages
+    cost no decoding at all.
+    """
+    if raw.header.type != _error_type:
+        return
+    try:
+        err = Error.decode(raw)
+    except pydantic.ValidationError:
+        # Malformed, so treat it as a normal message.
+        return
+    raise BaseError.decode_message(err)
+
+
+def check_reply(raw: RawMessage) -> RawMessage | None:
+    """Check the reply to a request.
+
+    Returns None if the reply is an Empty message, raises the carried error if
+    it's an Error message, or returns the reply as is otherwise.
+    """
+    if raw.header.type == _empty_type:
+        return None
+    raise_if_error(raw)
+    return raw
+
+
 class QueueSubscriptionIterator:
-    """A Queue-based async iterator that receives messages from a subscription and yields them."""
+    """A Queue-based async iterator that receives messages from a subscription and yields them.
+
+    Args:
+        maxsize (int, optional): The maximum number of buffered messages.
+            Defaults to 0, which means there is no limit.
+        policy (OverflowPolicy, optional): The policy to apply when the buffer
+            is full. Defaults to `OverflowPolicy.BLOCK`.
+        idle_timeout (float, optional): The maximum time to wait for the next
+            message, after which `DeadlineExceededError` will be raised.
+            Defaults to None, which means there is no limit.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 0,
+        policy: OverflowPolicy = OverflowPolicy.BLOCK,
+        idle_timeout: float | None = None,
+    ):
+        self.queue: BoundedQueue[RawMessage] = BoundedQueue(maxsize, policy)
+        self.idle_timeout: float | None = idle_timeout
 
-    def __init__(self):
-        self.queue: asyncio.Queue[RawMessage] = asyncio.Queue()
+    @property
+    def depth(self) -> int:
+        """The number of buffered messages."""
+        return self.queue.qsize()
 
     async def receive(self, raw: RawMessage) -> None:
         await self.queue.put(raw)
 
     async def __anext__(self) -> RawMessage:
-        msg = await self.queue.get()
+        if self.idle_timeout is None:
+            msg = await self.queue.get()
+        else:
+            try:
+                msg = await asyncio.wait_for(self.queue.get(), self.idle_timeout)
+            except asyncio.TimeoutError:
+                raise DeadlineExceededError(
+                    f"No message received within {self.idle_timeout} seconds"
+                )
         self.queue.task_done()
-        try:
-            # If it's a StopIteration message, end the iteration.
-            StopIteration.decode(msg)
+
+        if msg.header.type == _stop_iteration_type:
+            # End of the iteration.
             raise StopAsyncIteration
-        except pydantic.ValidationError:
-            try:
-                err = Error.decode(msg)
-                raise BaseError.decode_message(err)
-            except pydantic.ValidationError:
-                return msg
+        raise_if_error(msg)
+        return msg
 
     def __aiter__(self):
         return self
@@ -204,6 +324,7 @@ class NopChannel(Channel):
         reply: str = "",
         timeout: float = 0.5,
         probe: bool = True,
+        idle_timeout: float | None = None,
     ) -> AsyncIterator[RawMessage] | RawMessage | None:
         pass
 
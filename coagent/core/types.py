@@ -1,12 +1,31 @@
 from __future__ import annotations
 
 import abc
+import base64
 import dataclasses
 import enum
-from typing import Any, AsyncIterator, Awaitable, Callable, Type
+import functools
+import math
+from typing import Any, AsyncIterator, Awaitable, Callable, Type, TYPE_CHECKING
 import uuid
+import weakref
+
+from pydantic import (
+    BaseModel,
+    Field,
+    GetCoreSchemaHandler,
+    TypeAdapter,
+    ValidationInfo,
+    field_serializer,
+    field_validator,
+    model_serializer,
+)
+from pydantic_core import core_schema
+
+from .codecs import is_binary
 
-from pydantic import BaseModel, Field
+if TYPE_CHECKING:
+    from .discovery import DiscoveryCache
 
 
 # Mapping from singleton agent type to coagent topic.
@@ -24,41 +43,87 @@ coagent_reply_topic_prefix = (
 )
 
 
-class Address(BaseModel):
-    name: str = Field(description="Agent type")
-    id: str = Field(default="", description="Session ID")
+class Address:
+    """The address of an agent.
 
-    def __hash__(self):
-        return hash(self.topic)
+    Addresses are immutable, and the topic is computed once on creation, since
+    addresses are hashed and compared constantly (e.g. as dict keys) along
+    the routing paths.
 
-    def __eq__(self, other: Address | None):
-        if other is None:
-            return False
-        return self.topic == other.topic
+    Args:
+        name (str): Agent type.
+        id (str, optional): Session ID. Defaults to "".
+    """
 
-    @property
-    def is_reply(self) -> bool:
-        return self.name.startswith(coagent_reply_topic_prefix)
+    __slots__ = ("name", "id", "topic", "is_reply", "_hash", "__weakref__")
 
-    @property
-    def topic(self) -> str:
+    # Interned addresses keyed by topic, see `from_topic()`.
+    _interned: weakref.WeakValueDictionary[str, Address] = weakref.WeakValueDictionary()
+
+    def __init__(self, name: str, id: str = "") -> None:
+        is_reply = name.startswith(coagent_reply_topic_prefix)
+        topic = self._make_topic(name, id, is_reply)
+
+        setattr_ = object.__setattr__
+        setattr_(self, "name", name)
+        setattr_(self, "id", id)
+        setattr_(self, "topic", topic)
+        setattr_(self, "is_reply", is_reply)
+        setattr_(self, "_hash", hash(topic))
+
+    @staticmethod
+    def _make_topic(name: str, id: str, is_reply: bool) -> str:
         # For a singleton agent.
-        _topic = agent_types_to_topics.get(self.name)
+        _topic = agent_types_to_topics.get(name)
         if _topic:
             return _topic
 
-        if self.is_reply:
-            return self.name
+        if is_reply:
+            return name
 
-        if self.id:
+        if id:
             # Normal agent.
-            return f"{coagent_agent_topic_prefix}{self.name}.{self.id}"
+            return f"{coagent_agent_topic_prefix}{name}.{id}"
         else:
             # Factory agent.
-            return f"{coagent_factory_topic_prefix}{self.name}"
+            return f"{coagent_factory_topic_prefix}{name}"
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError(f"{self.__class__.__name__} is immutable")
+
+    def __delattr__(self, name: str) -> None:
+        raise AttributeError(f"{self.__class__.__name__} is immutable")
+
+    def __reduce__(self):
+        return self.__class__, (self.name, self.id)
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(name={self.name!r}, id={self.id!r})"
+
+    def __hash__(self):
+        return self._hash
+
+    def __eq__(self, other: Address | None):
+        if self is other:
+            return True
+        if not isinstance(other, Address):
+            return False
+        return self.topic == other.topic
 
     @classmethod
     def from_topic(cls, topic: str) -> Address:
+        """Get the address of the given topic.
+
+        The addresses are interned, i.e. the same instance is returned for
+        the same topic as long as it's still referenced somewhere.
+        """
+        addr = cls._interned.get(topic)
+        if addr is None:
+            addr = cls._interned[topic] = cls._parse_topic(topic)
+        return addr
+
+    @classmethod
+    def _parse_topic(cls, topic: str) -> Address:
         # For a singleton agent.
         agent_type = topics_to_agent_types.get(topic)
         if agent_type:
@@ -81,11 +146,53 @@ class Address(BaseModel):
             return cls(name=words[0], id=words[1])
 
     def encode(self, mode: str = "python") -> dict:
-        return self.model_dump(mode=mode)
+        return {"name": self.name, "id": self.id}
 
     @classmethod
     def decode(cls, data: dict) -> Address:
-        return cls.model_validate(data)
+        return _address_adapter().validate_python(data)
+
+    # For backwards compatibility with the former pydantic model.
+    model_dump = encode
+    model_validate = decode
+
+    @classmethod
+    def __get_pydantic_core_schema__(
+        cls, source: Any, handler: GetCoreSchemaHandler
+    ) -> core_schema.CoreSchema:
+        # On the wire, an address is represented as {"name": ..., "id": ...}.
+        from_dict = core_schema.no_info_after_validator_function(
+            lambda data: cls(**data),
+            core_schema.typed_dict_schema(
+                {
+                    "name": core_schema.typed_dict_field(
+                        core_schema.str_schema(),
+                        metadata={"pydantic_js_updates": {"description": "Agent type"}},
+                    ),
+                    "id": core_schema.typed_dict_field(
+                        core_schema.with_default_schema(
+                            core_schema.str_schema(), default=""
+                        ),
+                        required=False,
+                        metadata={"pydantic_js_updates": {"description": "Session ID"}},
+                    ),
+                }
+            ),
+        )
+        return core_schema.json_or_python_schema(
+            json_schema=from_dict,
+            python_schema=core_schema.union_schema(
+                [core_schema.is_instance_schema(cls), from_dict]
+            ),
+            serialization=core_schema.plain_serializer_function_ser_schema(
+                lambda addr: {"name": addr.name, "id": addr.id}
+            ),
+        )
+
+
+@functools.cache
+def _address_adapter() -> TypeAdapter[Address]:
+    return TypeAdapter(Address)
 
 
 class Reply(BaseModel):
@@ -93,6 +200,14 @@ class Reply(BaseModel):
     stream: bool = Field(
         False, description="Whether the sender requests a streaming result."
     )
+    timeout: float | None = Field(
+        default=None,
+        description="How long (in seconds) the sender will wait for the reply, if known.",
+    )
+    content_type: str | None = Field(
+        default=None,
+        description="The content type of the reply. Defaults to None, which means the content type of the request.",
+    )
 
 
 class MessageHeader(BaseModel):
@@ -100,6 +215,10 @@ class MessageHeader(BaseModel):
     content_type: str = Field(
         default="application/json", description="Message content type."
     )
+    content_encoding: str = Field(
+        default="",
+        description='Message content encoding (e.g. "zlib"). Defaults to "", which means no compression.',
+    )
     extensions: dict = Field(default_factory=dict, description="Extension fields.")
 
 
@@ -122,6 +241,80 @@ class RawMessage(BaseModel):
     def decode_json(cls, json_data: str | bytes) -> RawMessage:
         return cls.model_validate_json(json_data)
 
+    @field_serializer("content", when_used="json")
+    def _serialize_content(self, content: bytes) -> str:
+        # Binary content can not be represented as a JSON string directly.
+        header = self.header
+        if header.content_encoding or is_binary(header.content_type):
+            return base64.b64encode(content).decode("ascii")
+        return content.decode("utf-8")
+
+    @field_validator("content", mode="before")
+    @classmethod
+    def _validate_content(cls, value: Any, info: ValidationInfo) -> Any:
+        if isinstance(value, str):
+            header = info.data.get("header")
+            if header is not None and (
+                header.content_encoding or is_binary(header.content_type)
+            ):
+                return base64.b64decode(value)
+        return value
+
+    @property
+    def message(self) -> Any | None:
+        """The typed message carried along for direct dispatch, if any."""
+        return None
+
+
+class LazyRawMessage(RawMessage):
+    """A raw message whose content is encoded from the typed message lazily,
+    i.e. only when the content is accessed or the raw message is serialized.
+
+    The typed message is carried along, so that an in-process receiver can
+    use it directly and the serialization is skipped altogether.
+    """
+
+    # Use slots instead of private attributes for faster access.
+    __slots__ = ("_message", "_encode")
+
+    @classmethod
+    def from_message(
+        cls, header: MessageHeader, message: Any, encode: Callable[[], bytes]
+    ) -> LazyRawMessage:
+        raw = cls(header=header)
+        # Remove the default content, so that accessing it will fall back
+        # to `__getattr__()`, which encodes the content on demand.
+        del raw.__dict__["content"]
+        object.__setattr__(raw, "_message", message)
+        object.__setattr__(raw, "_encode", encode)
+        return raw
+
+    @property
+    def message(self) -> Any | None:
+        return self._message
+
+    def __copy__(self) -> LazyRawMessage:
+        raw = super().__copy__()
+        object.__setattr__(raw, "_message", self._message)
+        object.__setattr__(raw, "_encode", self._encode)
+        return raw
+
+    def __getattr__(self, name: str) -> Any:
+        if name == "content":
+            return self._materialize()
+        return super().__getattr__(name)
+
+    def _materialize(self) -> bytes:
+        content = self.__dict__.get("content")
+        if content is None:
+            content = self.__dict__["content"] = self._encode()
+        return content
+
+    @model_serializer(mode="wrap")
+    def _serialize(self, handler):
+        self._materialize()
+        return handler(self)
+
 
 class Constructor:
     def __init__(self, typ: Type, *args: Any, **kwargs: Any) -> None:
@@ -158,6 +351,19 @@ class State(str, enum.Enum):
     STOPPED = "stopped"
 
 
+class OverflowPolicy(str, enum.Enum):
+    """The policy to apply when putting an item into a full queue."""
+
+    BLOCK = "block"
+    """Wait until a free slot is available, which pushes back on the publisher."""
+
+    REJECT = "reject"
+    """Reject the new item by raising an `OverloadedError`."""
+
+    DROP_OLDEST = "drop_oldest"
+    """Drop the oldest item in the queue to make room for the new item."""
+
+
 class Agent(abc.ABC):
     @property
     @abc.abstractmethod
@@ -177,6 +383,15 @@ class Agent(abc.ABC):
         """Get the current state of the agent."""
         pass
 
+    @property
+    def expires_at(self) -> float:
+        """The time (in seconds since the epoch) when the agent becomes IDLE,
+        if it receives no more messages.
+
+        Defaults to infinity, which means the agent never becomes IDLE.
+        """
+        return math.inf
+
     @abc.abstractmethod
     async def start(self) -> None:
         """Start the current agent."""
@@ -216,6 +431,22 @@ class Subscription(abc.ABC):
 
 
 class Channel(abc.ABC):
+    # Whether the messages can be handed over to the receivers directly,
+    # without serialization. This is only possible if all the receivers
+    # live in the same process. See `Message.encode()` for details.
+    direct_dispatch: bool = False
+
+    _discovery_cache: DiscoveryCache | None = None
+
+    @property
+    def discovery_cache(self) -> DiscoveryCache:
+        """The discovery cache shared by all users of this channel."""
+        if self._discovery_cache is None:
+            from .discovery import DiscoveryCache
+
+            self._discovery_cache = DiscoveryCache(self)
+        return self._discovery_cache
+
     @abc.abstractmethod
     async def connect(self) -> None:
         pass
@@ -234,6 +465,7 @@ class Channel(abc.ABC):
         reply: str = "",
         timeout: float = 0.5,
         probe: bool = True,
+        idle_timeout: float | None = None,
     ) -> AsyncIterator[RawMessage] | RawMessage | None:
         """Publish a message to the given address.
 
@@ -245,6 +477,7 @@ class Channel(abc.ABC):
             reply (str, optional): If `request` is True, then this will be the subject to reply to. Defaults to "".
             timeout (float, optional): If `request` is True, then this will be the timeout for the response. Defaults to 0.5.
             probe (bool, optional): Whether to probe the agent before sending the message. Defaults to True.
+            idle_timeout (float, optional): If `stream` is True, then this will be the maximum time to wait for each message in the stream. Defaults to None, which means there is no limit.
         """
         pass
 
@@ -261,6 +494,21 @@ class Channel(abc.ABC):
     async def new_reply_topic(self) -> str:
         pass
 
+    async def subscribe_reply(
+        self, handler: Callable[[RawMessage], Awaitable[None]]
+    ) -> tuple[str, Subscription]:
+        """Create a new reply topic and subscribe to it.
+
+        Channels that can multiplex all replies over one long-lived subscription
+        should override this to avoid subscribing and unsubscribing per request.
+
+        Returns:
+            tuple[str, Subscription]: The reply topic and the subscription.
+        """
+        topic = await self.new_reply_topic()
+        sub = await self.subscribe(Address(name=topic), handler=handler)
+        return topic, sub
+
     @abc.abstractmethod
     async def cancel(self, addr: Address) -> None:
         """Cancel the agent with the given address."""
@@ -274,6 +522,8 @@ class AgentSpec:
     name: str
     constructor: Constructor
     description: str = ""
+    recycle_interval: float = 20
+    """The maximum interval (in seconds) between two checks for deleting IDLE agents."""
 
     __runtime: Runtime | None = dataclasses.field(default=None, init=False)
 
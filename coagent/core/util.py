@@ -1,11 +1,16 @@
+from __future__ import annotations
+
 import asyncio
+import collections
 import os
 import signal
 from typing import Any, get_type_hints
 
 import pygtrie
 
+from .exceptions import OverloadedError
 from .logger import logger
+from .types import OverflowPolicy
 
 
 class Trie(pygtrie.StringTrie):
@@ -42,6 +47,142 @@ class Trie(pygtrie.StringTrie):
         return values
 
 
+class NamespaceIndex:
+    """An index of items keyed by namespaces, such as agent types.
+
+    A key is split by the separator into levels, and each node holds its
+    direct children in a dict. Therefore, accessing the direct children of
+    a namespace only costs O(depth + children), and iterating a subtree only
+    visits the nodes within it, regardless of the total number of items.
+
+    Note that the children are kept in insertion order.
+    """
+
+    class _Node:
+        __slots__ = ("key", "value", "has_value", "children")
+
+        def __init__(self, key: str) -> None:
+            self.key: str = key
+            self.value: Any = None
+            self.has_value: bool = False
+            self.children: dict[str, NamespaceIndex._Node] = {}
+
+    def __init__(self, separator: str = ".") -> None:
+        self._separator: str = separator
+        self._root: NamespaceIndex._Node = self._Node("")
+        # A flat mapping for O(1) lookup by key.
+        self._items: dict[str, Any] = {}
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._items
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __getitem__(self, key: str) -> Any:
+        return self._items[key]
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        node = self._root
+        if key:
+            for part in key.split(self._separator):
+                child = node.children.get(part)
+                if child is None:
+                    sub_key = f"{node.key}{self._separator}{part}" if node.key else part
+                    child = node.children[part] = self._Node(sub_key)
+                node = child
+
+        node.value = value
+        node.has_value = True
+        self._items[key] = value
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self._items.get(key, default)
+
+    def pop(self, key: str, *default: Any) -> Any:
+        if key not in self._items:
+            if default:
+                return default[0]
+            raise KeyError(key)
+
+        # Walk down to the node, and remember the path for pruning.
+        path: list[tuple[NamespaceIndex._Node, str]] = []
+        node = self._root
+        if key:
+            for part in key.split(self._separator):
+                path.append((node, part))
+                node = node.children[part]
+
+        node.value = None
+        node.has_value = False
+
+        # Prune the nodes that hold neither a value nor any children.
+        for parent, part in reversed(path):
+            child = parent.children[part]
+            if child.has_value or child.children:
+                break
+            del parent.children[part]
+
+        return self._items.pop(key)
+
+    def clear(self) -> None:
+        self._root = self._Node("")
+        self._items.clear()
+
+    def _find(self, prefix: str) -> NamespaceIndex._Node | None:
+        node = self._root
+        if prefix:
+            for part in prefix.split(self._separator):
+                node = node.children.get(part)
+                if node is None:
+                    return None
+        return node
+
+    def items(self, prefix: str = "") -> list[tuple[str, Any]]:
+        """Return all items under the given prefix (inclusive), in depth-first order."""
+        node = self._find(prefix)
+        if node is None:
+            return []
+
+        items: list[tuple[str, Any]] = []
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            if node.has_value:
+                items.append((node.key, node.value))
+            stack.extend(reversed(node.children.values()))
+        return items
+
+    def keys(self, prefix: str = "") -> list[str]:
+        return [key for key, _ in self.items(prefix)]
+
+    def values(self, prefix: str = "") -> list[Any]:
+        return [value for _, value in self.items(prefix)]
+
+    def direct_items(self, prefix: str) -> list[tuple[str, Any]]:
+        """Return the item of the given prefix and the items directly under it."""
+        node = self._find(prefix)
+        if node is None:
+            return []
+
+        items: list[tuple[str, Any]] = []
+        if node.has_value:
+            items.append((node.key, node.value))
+        for child in node.children.values():
+            if child.has_value:
+                items.append((child.key, child.value))
+        return items
+
+    def direct_keys(self, prefix: str) -> list[str]:
+        return [key for key, _ in self.direct_items(prefix)]
+
+    def direct_values(self, prefix: str) -> list[Any]:
+        return [value for _, value in self.direct_items(prefix)]
+
+
 def get_func_args(func) -> set[str]:
     if hasattr(func, "__mcp_tool_args__"):
         return set(func.__mcp_tool_args__)
@@ -65,6 +206,102 @@ async def clear_queue(queue: asyncio.Queue) -> None:
             break
 
 
+class BoundedQueue(asyncio.Queue):
+    """A queue that applies an overflow policy when it is full.
+
+    Args:
+        maxsize (int, optional): The maximum number of items in the queue.
+            Defaults to 0, which means the queue size is infinite.
+        policy (OverflowPolicy, optional): The policy to apply when putting
+            an item into a full queue. Defaults to `OverflowPolicy.BLOCK`.
+
+    Note that `put()` and `put_nowait()` return the dropped item, if any,
+    so that the caller can notify its sender.
+
+    Items put by `put_pinned()` keep their order among the other items, but
+    do not count towards `maxsize` and are never dropped.
+    """
+
+    def __init__(self, maxsize: int = 0, policy: OverflowPolicy = OverflowPolicy.BLOCK):
+        super().__init__(maxsize)
+        self.policy: OverflowPolicy = policy
+
+        # Statistics for observing the queue pressure.
+        self.rejected_count: int = 0
+        self.dropped_count: int = 0
+
+    def _init(self, maxsize: int) -> None:
+        # Each item is stored along with whether it's pinned.
+        self._queue: collections.deque[tuple[bool, Any]] = collections.deque()
+        self._unpinned: int = 0
+        self._pinning: bool = False
+
+    def _put(self, item: Any) -> None:
+        self._queue.append((self._pinning, item))
+        if not self._pinning:
+            self._unpinned += 1
+
+    def _get(self) -> Any:
+        pinned, item = self._queue.popleft()
+        if not pinned:
+            self._unpinned -= 1
+        return item
+
+    def full(self) -> bool:
+        if self._pinning or self.maxsize <= 0:
+            return False
+        return self._unpinned >= self.maxsize
+
+    async def put(self, item: Any, policy: OverflowPolicy | None = None) -> Any | None:
+        """Put an item into the queue.
+
+        If `policy` is given, it will override the queue's policy.
+        """
+        policy = policy or self.policy
+        if policy == OverflowPolicy.BLOCK:
+            await super().put(item)
+            return None
+        return self.put_nowait(item, policy)
+
+    def put_nowait(self, item: Any, policy: OverflowPolicy | None = None) -> Any | None:
+        if not self.full():
+            super().put_nowait(item)
+            return None
+
+        match policy or self.policy:
+            case OverflowPolicy.REJECT:
+                self.rejected_count += 1
+                raise OverloadedError(f"Queue is full (maxsize={self.maxsize})")
+            case OverflowPolicy.DROP_OLDEST:
+                # Drop the oldest item that is not pinned. There must be one,
+                # since only unpinned items make the queue full.
+                index, dropped = next(
+                    (i, queued)
+                    for i, (pinned, queued) in enumerate(self._queue)
+                    if not pinned
+                )
+                del self._queue[index]
+                self._unpinned -= 1
+                self.task_done()
+                self.dropped_count += 1
+                super().put_nowait(item)
+                return dropped
+            case _:
+                # Raise asyncio.QueueFull as usual.
+                return super().put_nowait(item)
+
+    def put_pinned(self, item: Any) -> None:
+        """Put an item regardless of the queue size and policy.
+
+        The item does not count towards `maxsize`, and will never be dropped.
+        """
+        self._pinning = True
+        try:
+            super().put_nowait(item)
+        finally:
+            self._pinning = False
+
+
 async def wait_for_shutdown(timeout: float | None = None) -> None:
     shutdown_event = asyncio.Event()
 
@@ -1,12 +1,11 @@
-import asyncio
-
 from coagent.core.messages import (
     Message,
     GenericMessage,
 )
-from coagent.core.types import Address, RawMessage
+from coagent.core.types import Address, OverflowPolicy, RawMessage
 from coagent.core.agent import BaseAgent, Context, handler
-from coagent.core.util import clear_queue
+from coagent.core.exceptions import OverloadedError
+from coagent.core.util import BoundedQueue, clear_queue
 
 
 class AgentCreated(Message):
@@ -34,12 +33,23 @@ class AgentStopped(Message):
 
 
 class RemoteAgent(BaseAgent):
-    """An agent that operates remotely."""
-
-    def __init__(self):
+    """An agent that operates remotely.
+
+    Args:
+        queue_size (int, optional): The maximum number of messages buffered
+            for the remote client. Defaults to 0, which means there is no limit.
+        overflow_policy (OverflowPolicy, optional): The policy to apply when
+            the buffer is full. Defaults to `OverflowPolicy.BLOCK`.
+    """
+
+    def __init__(
+        self,
+        queue_size: int = 0,
+        overflow_policy: OverflowPolicy = OverflowPolicy.BLOCK,
+    ):
         super().__init__()
 
-        self.queue: asyncio.Queue[RawMessage] = asyncio.Queue()
+        self.queue: BoundedQueue[RawMessage] = BoundedQueue(queue_size, overflow_policy)
 
     async def stop(self) -> None:
         await super().stop()
@@ -48,16 +58,23 @@ class RemoteAgent(BaseAgent):
     async def started(self) -> None:
         """This handler is called after the agent is started."""
         msg = AgentStarted(addr=self.address)
-        await self.queue.put(msg.encode())
+        await self.queue.put(msg.encode(), policy=OverflowPolicy.BLOCK)
 
     async def stopped(self) -> None:
         """This handler is called after the agent is stopped."""
         msg = AgentStopped(addr=self.address)
-        await self.queue.put(msg.encode())
+        await self.queue.put(msg.encode(), policy=OverflowPolicy.BLOCK)
 
     async def _handle_data_custom(self, msg: Message, ctx: Context) -> None:
         """Override the default handler to put the message into the queue."""
-        await self.queue.put(msg.encode())
+        try:
+            dropped = await self.queue.put(msg.encode())
+        except OverloadedError as exc:
+            await self.replier.send(msg, exc.encode_message())
+        else:
+            if dropped is not None:
+                err = OverloadedError("Message dropped since the client is too slow")
+                await self.replier.send(dropped, err.encode_message())
 
     @handler
     async def handle(self, msg: GenericMessage, ctx: Context) -> None:
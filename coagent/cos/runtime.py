@@ -1,5 +1,5 @@
 import asyncio
-from typing import AsyncIterator, Type
+from typing import Any, AsyncIterator, Type
 
 from starlette.requests import Request
 from starlette.responses import Response, JSONResponse
@@ -9,13 +9,14 @@ from coagent.core import (
     Address,
     AgentSpec,
     Constructor,
+    DiscoveryCache,
     DiscoveryQuery,
     DiscoveryReply,
     RawMessage,
     logger,
 )
 from coagent.core.exceptions import BaseError
-from coagent.core.types import Runtime
+from coagent.core.types import OverflowPolicy, Runtime
 from coagent.core.util import clear_queue
 
 from coagent.cos.agent import RemoteAgent, AgentCreated
@@ -25,9 +26,14 @@ class _CosConstructor(Constructor):
     """A constructor for creating CoS agents."""
 
     def __init__(
-        self, typ: Type, queue: asyncio.Queue, registry: dict[Address, RemoteAgent]
+        self,
+        typ: Type,
+        queue: asyncio.Queue,
+        registry: dict[Address, RemoteAgent],
+        *args: Any,
+        **kwargs: Any,
     ) -> None:
-        super().__init__(typ)
+        super().__init__(typ, *args, **kwargs)
         self.queue = queue
         self.registry = registry
 
@@ -41,10 +47,30 @@ class _CosConstructor(Constructor):
 
 
 class CosRuntime:
-    def __init__(self, runtime: Runtime):
+    """A runtime that serves remote agents over HTTP.
+
+    Args:
+        runtime (Runtime): The underlying runtime.
+        queue_size (int, optional): The maximum number of messages buffered
+            for each remote agent. Defaults to 0, which means there is no limit.
+        overflow_policy (OverflowPolicy, optional): The policy to apply when
+            the buffer of a remote agent is full. Defaults to `OverflowPolicy.BLOCK`.
+    """
+
+    def __init__(
+        self,
+        runtime: Runtime,
+        queue_size: int = 0,
+        overflow_policy: OverflowPolicy = OverflowPolicy.BLOCK,
+    ):
         self._runtime: Runtime = runtime
         self._agents: dict[Address, RemoteAgent] = {}
 
+        self._queue_size: int = queue_size
+        self._overflow_policy: OverflowPolicy = overflow_policy
+
+        self._discovery_cache: DiscoveryCache = runtime.channel.discovery_cache
+
     async def start(self):
         await self._runtime.start()
 
@@ -57,18 +83,14 @@ class CosRuntime:
         inclusive: bool = request.query_params.get("inclusive", "") == "true"
         detailed: bool = request.query_params.get("detailed", "") == "true"
 
-        result: RawMessage = await self._runtime.channel.publish(
-            Address(name="discovery"),
+        reply: DiscoveryReply = await self._discovery_cache.discover(
             DiscoveryQuery(
                 namespace=namespace,
                 recursive=recursive,
                 inclusive=inclusive,
                 detailed=detailed,
-            ).encode(),
-            request=True,
-            probe=False,
+            )
         )
-        reply: DiscoveryReply = DiscoveryReply.decode(result)
 
         return JSONResponse(reply.model_dump(mode="json"))
 
@@ -79,9 +101,14 @@ class CosRuntime:
 
         queue: asyncio.Queue[RawMessage] = asyncio.Queue()
 
-        spec = AgentSpec(
-            name, _CosConstructor(RemoteAgent, queue, self._agents), description
+        constructor = _CosConstructor(
+            RemoteAgent,
+            queue,
+            self._agents,
+            queue_size=self._queue_size,
+            overflow_policy=self._overflow_policy,
         )
+        spec = AgentSpec(name, constructor, description)
         await self._runtime.register(spec)
 
         async def event_stream() -> AsyncIterator[str]:
@@ -1,7 +1,11 @@
 from __future__ import annotations
 
 import asyncio
+import collections
+import itertools
+import random
 from typing import AsyncIterator, Awaitable, Callable
+import uuid
 
 import httpx
 from httpx_sse import aconnect_sse
@@ -17,12 +21,10 @@ from coagent.core import (
     StopIteration,
     Subscription,
 )
+from coagent.core.compression import compress_message, encodings
 from coagent.core.exceptions import BaseError
 
 
-http2_client = httpx.AsyncClient(http2=True)
-
-
 class HTTPRuntime(BaseRuntime):
     """An HTTP-based runtime."""
 
@@ -45,24 +47,106 @@ class HTTPChannel(BaseChannel):
 
     _publish: POST /publish
     _publish_stream: POST /publish stream=True
+    _publish (batched): POST /publish-batch
     subscribe: POST /subscribe
     new_reply_topic: POST /reply-topics
+
+    See `coagent.runtimes.http_server` for the server side.
     """
 
-    def __init__(self, server: str, auth: str = ""):
+    def __init__(
+        self,
+        server: str,
+        auth: str = "",
+        compression: str = "",
+        compression_threshold: int = 1024,
+        http2: bool = True,
+        limits: httpx.Limits | None = None,
+        batch_window: float = 0,
+        batch_size: int = 100,
+    ):
         """
         Args:
             server (str): The server address.
             auth (str, optional): The authentication credential. Defaults to "".
+            compression (str, optional): The content encoding (i.e. "zlib" or "zstd")
+                used to compress the messages to publish. Defaults to "", which
+                means no compression.
+            compression_threshold (int, optional): The minimum size (in bytes)
+                of the content to be compressed. Defaults to 1024.
+            http2 (bool, optional): Whether to enable HTTP/2, which multiplexes
+                concurrent requests over one connection. Defaults to True.
+            limits (httpx.Limits, optional): The limits of the connection pool
+                (e.g. max connections and keep-alive) for requests. Defaults to
+                None, which means the default limits of httpx. Note that the
+                long-lived SSE streams (i.e. subscriptions and streaming
+                publishes) use a separate pool without limits, since each of
+                them holds a connection (or an HTTP/2 stream) until closed.
+            batch_window (float, optional): The time window (in seconds) within
+                which the publishes that expect no reply are coalesced into one
+                POST /publish-batch request. Defaults to 0, which means no batching.
+            batch_size (int, optional): The maximum number of messages in one
+                batch. Defaults to 100.
         """
+        if compression and compression not in encodings:
+            raise ValueError(f"Unsupported compression: {compression}")
+
         self._server: str = server
         self._auth: str = auth
+        self._compression: str = compression
+        self._compression_threshold: int = compression_threshold
+
+        self._http2: bool = http2
+        self._limits: httpx.Limits | None = limits
+        # The connection pool shared by all requests.
+        self._client: httpx.AsyncClient | None = None
+        # The unbounded connection pool shared by all SSE streams.
+        self._stream_client: httpx.AsyncClient | None = None
+
+        self._batch_window: float = batch_window
+        self._batch_size: int = batch_size
+        # The pending publishes and the futures waiting for their results.
+        self._batch: list[tuple[dict, asyncio.Future[None]]] = []
+        self._batch_timer: asyncio.TimerHandle | None = None
+        self._batch_tasks: set[asyncio.Task] = set()
+        # Batches are sent one at a time to keep the order of the messages.
+        self._batch_lock: asyncio.Lock = asyncio.Lock()
 
     async def connect(self) -> None:
-        pass
+        if self._client is None:
+            kwargs = dict(limits=self._limits) if self._limits else {}
+            self._client = httpx.AsyncClient(http2=self._http2, **kwargs)
+        if self._stream_client is None:
+            self._stream_client = httpx.AsyncClient(
+                http2=self._http2, limits=httpx.Limits(max_connections=None)
+            )
 
     async def close(self) -> None:
-        pass
+        # Send the pending publishes before closing the client.
+        self._flush_batch()
+        if self._batch_tasks:
+            await asyncio.wait(self._batch_tasks)
+
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        if self._stream_client is not None:
+            await self._stream_client.aclose()
+            self._stream_client = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """The HTTP client created in `connect()`."""
+        if self._client is None:
+            raise RuntimeError("HTTPChannel is not connected")
+        return self._client
+
+    @property
+    def stream_client(self) -> httpx.AsyncClient:
+        """The HTTP client for SSE streams created in `connect()`."""
+        if self._stream_client is None:
+            raise RuntimeError("HTTPChannel is not connected")
+        return self._stream_client
 
     async def _publish(
         self,
@@ -74,6 +158,15 @@ class HTTPChannel(BaseChannel):
         timeout: float = 5.0,
         probe: bool = True,
     ) -> RawMessage | None:
+        msg = compress_message(msg, self._compression, self._compression_threshold)
+        if self._batch_window > 0 and not (stream or request or reply):
+            item = dict(
+                addr=addr.encode(mode="json"),
+                msg=msg.encode(mode="json"),
+                probe=probe,
+            )
+            return await self._publish_batched(item)
+
         data = dict(
             addr=addr.encode(mode="json"),
             msg=msg.encode(mode="json"),
@@ -85,7 +178,7 @@ class HTTPChannel(BaseChannel):
         )
         headers = {"Authorization": self._auth} if self._auth else None
 
-        resp = await http2_client.post(
+        resp = await self.client.post(
             f"{self._server}/publish", json=data, headers=headers, timeout=timeout
         )
 
@@ -95,16 +188,71 @@ class HTTPChannel(BaseChannel):
         if resp.is_error:
             raise_http_error(resp, resp.text)
 
+    async def _publish_batched(self, item: dict) -> None:
+        future = asyncio.get_running_loop().create_future()
+        self._batch.append((item, future))
+
+        if len(self._batch) >= self._batch_size:
+            self._flush_batch()
+        elif self._batch_timer is None:
+            self._batch_timer = asyncio.get_running_loop().call_later(
+                self._batch_window, self._flush_batch
+            )
+
+        await future
+
+    def _flush_batch(self) -> None:
+        if self._batch_timer is not None:
+            self._batch_timer.cancel()
+            self._batch_timer = None
+
+        batch, self._batch = self._batch, []
+        if batch:
+            task = asyncio.create_task(self._send_batch(batch))
+            self._batch_tasks.add(task)
+            task.add_done_callback(self._batch_tasks.discard)
+
+    async def _send_batch(self, batch: list[tuple[dict, asyncio.Future[None]]]):
+        data = dict(items=[item for item, _ in batch])
+        headers = {"Authorization": self._auth} if self._auth else None
+
+        try:
+            async with self._batch_lock:
+                resp = await self.client.post(
+                    f"{self._server}/publish-batch", json=data, headers=headers
+                )
+            if resp.is_error:
+                raise_http_error(resp, resp.text)
+            results: list[dict | None] = resp.json()["results"]
+            if len(results) != len(batch):
+                raise ValueError(f"Expected {len(batch)} results, got {len(results)}")
+        except Exception as exc:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+
+        for (_, future), error in zip(batch, results, strict=True):
+            if future.done():
+                # The publisher has been cancelled.
+                continue
+            if error:
+                future.set_exception(BaseError.decode(error))
+            else:
+                future.set_result(None)
+
     async def _publish_stream(
         self,
         addr: Address,
         msg: RawMessage,
         probe: bool = True,
+        idle_timeout: float | None = None,
     ) -> AsyncIterator[RawMessage]:
         """
         Note that we do not use the default implementation from BaseChannel,
         because multiple HTTP calls will result in poor performance.
         """
+        msg = compress_message(msg, self._compression, self._compression_threshold)
         data = dict(
             addr=addr.encode(mode="json"),
             msg=msg.encode(mode="json"),
@@ -114,9 +262,15 @@ class HTTPChannel(BaseChannel):
         )
         headers = {"Authorization": self._auth} if self._auth else None
 
-        queue: QueueSubscriptionIterator = QueueSubscriptionIterator()
+        queue: QueueSubscriptionIterator = QueueSubscriptionIterator(
+            idle_timeout=idle_timeout
+        )
         sub: HTTPChannelSubscription = HTTPChannelSubscription(
-            f"{self._server}/publish", data, headers, queue.receive
+            self.stream_client,
+            f"{self._server}/publish",
+            data,
+            headers,
+            queue.receive,
         )
         await sub.subscribe()
 
@@ -139,7 +293,7 @@ class HTTPChannel(BaseChannel):
         headers = {"Authorization": self._auth} if self._auth else None
 
         sub = HTTPChannelSubscription(
-            f"{self._server}/subscribe", data, headers, handler
+            self.stream_client, f"{self._server}/subscribe", data, headers, handler
         )
         await sub.subscribe()
         return sub
@@ -148,29 +302,41 @@ class HTTPChannel(BaseChannel):
         data = dict()
         headers = {"Authorization": self._auth} if self._auth else None
 
-        async with httpx.AsyncClient() as client:
-            resp = await client.post(
-                f"{self._server}/reply-topics", json=data, headers=headers
-            )
-            result = resp.json()
-            return result["reply_topic"]
+        resp = await self.client.post(
+            f"{self._server}/reply-topics", json=data, headers=headers
+        )
+        result = resp.json()
+        return result["reply_topic"]
 
 
 class HTTPChannelSubscription(Subscription):
-    """A subscription created when subscribing to an HTTP-based channel."""
+    """A subscription created when subscribing to an HTTP-based channel.
+
+    On connection errors, the subscription reconnects with jittered exponential
+    backoff, and resumes from the last received event (if the server tags the
+    events with IDs) by sending the `Last-Event-ID` header.
+    """
 
     def __init__(
         self,
+        client: httpx.AsyncClient,
         url: str,
         data: dict,
         headers: dict | None,
         handler: Callable[[RawMessage], Awaitable[None]],
+        backoff_base: float = 0.1,
+        backoff_max: float = 10,
     ):
+        self._client: httpx.AsyncClient = client
         self._url: str = url
         self._data: dict = data
         self._headers: dict | None = headers
         self._handler: Callable[[RawMessage], Awaitable[None]] = handler
 
+        self._backoff_base: float = backoff_base
+        self._backoff_max: float = backoff_max
+        self._last_event_id: str = ""
+
         self._task: asyncio.Task = asyncio.create_task(self._poll())
         self._subscribe_event: asyncio.Event = asyncio.Event()
         self._exit_event: asyncio.Event = asyncio.Event()
@@ -188,54 +354,74 @@ class HTTPChannelSubscription(Subscription):
         except asyncio.CancelledError:
             pass
 
+    def _backoff(self, attempt: int) -> float:
+        """Return the delay before the given reconnect attempt (full jitter)."""
+        delay = min(self._backoff_max, self._backoff_base * 2**attempt)
+        return random.uniform(0, delay)
+
     async def _poll(self) -> None:
+        attempt = 0
         while True:
-            async with httpx.AsyncClient(timeout=None) as client:
-                try:
-                    async with aconnect_sse(
-                        client,
-                        "POST",
-                        self._url,
-                        json=self._data,
-                        headers=self._headers or {},
-                    ) as event_source:
-                        if not self._subscribe_event.is_set():
-                            # Notify that the subscription is created.
-                            self._subscribe_event.set()
-
-                        async for sse in event_source.aiter_sse():
-                            data_str = sse.data
-
-                            # There's no standard way to send errors in SSE (https://developer.mozilla.org/en-US/docs/Web/API/Server-sent_events/Using_server-sent_events).
-                            # Here we assume that if the event is "error", an error has occurred on the server side.
-                            #
-                            # For error handling on the SSE server side, see `publish_multi()`
-                            # in examples/ping-pong/http_runtime_server.py
-                            if sse.event == "error":
-                                raise_http_error(event_source.response, data_str)
-
-                            raw: RawMessage = RawMessage.model_validate_json(data_str)
-                            await self._handler(raw)
-
-                        # End of the stream, send an extra StopIteration message.
-                        await self._handler(StopIteration().encode())
-                        # Exit the loop.
-                        self._exit_event.set()
-                        break
-                # except (BaseError, httpx.HTTPStatusError) as exc:
-                except BaseError as exc:
-                    # Send the error as a message.
-                    await self._handler(exc.encode_message().encode())
-                    break
-                except asyncio.CancelledError:
-                    # User cancelled, close the client and exit.
-                    await client.aclose()
-                    # TODO: We use break here since using raise doesn't work as expected.
+            try:
+                headers = dict(self._headers or {})
+                if self._last_event_id:
+                    headers["Last-Event-ID"] = self._last_event_id
+
+                # Long-lived streams must not time out.
+                async with aconnect_sse(
+                    self._client,
+                    "POST",
+                    self._url,
+                    json=self._data,
+                    headers=headers,
+                    timeout=None,
+                ) as event_source:
+                    if not self._subscribe_event.is_set():
+                        # Notify that the subscription is created.
+                        self._subscribe_event.set()
+                    attempt = 0
+
+                    async for sse in event_source.aiter_sse():
+                        data_str = sse.data
+
+                        # There's no standard way to send errors in SSE (https://developer.mozilla.org/en-US/docs/Web/API/Server-sent_events/Using_server-sent_events).
+                        # Here we assume that if the event is "error", an error has occurred on the server side.
+                        #
+                        # For error handling on the SSE server side, see `publish()`
+                        # in coagent/runtimes/http_server.py
+                        if sse.event == "error":
+                            raise_http_error(event_source.response, data_str)
+
+                        raw: RawMessage = RawMessage.model_validate_json(data_str)
+                        await self._handler(raw)
+                        if sse.id:
+                            self._last_event_id = sse.id
+
+                    # End of the stream, send an extra StopIteration message.
+                    await self._handler(StopIteration().encode())
+                    # Exit the loop.
+                    self._exit_event.set()
                     break
-                except Exception as exc:
-                    # Other errors, reconnect in 3 seconds
-                    logger.exception(f"Error occurred: {type(exc)}, {exc}")
-                    await asyncio.sleep(3)
+            # except (BaseError, httpx.HTTPStatusError) as exc:
+            except BaseError as exc:
+                # Send the error as a message.
+                await self._handler(exc.encode_message().encode())
+                break
+            except asyncio.CancelledError:
+                # User cancelled, exit. The stream has been closed on exiting
+                # the context, while the shared client is kept open.
+                #
+                # TODO: We use break here since using raise doesn't work as expected.
+                break
+            except Exception as exc:
+                # Other errors, reconnect with backoff. The jitter spreads out
+                # the reconnects of all subscriptions after a server restart.
+                delay = self._backoff(attempt)
+                attempt += 1
+                logger.exception(
+                    f"Error occurred: {type(exc)}, {exc}, reconnecting in {delay:.2f}s"
+                )
+                await asyncio.sleep(delay)
 
         self._exit_event.set()
 
@@ -254,16 +440,53 @@ class HTTPChannelBackend:
     This helper backend is typically used in conjunction with Starlette or
     FastAPI on the server side.
 
-    See examples/ping-pong/http_runtime_server.py for a reference server implementation.
+    See `coagent.runtimes.http_server` for a ready-to-use Starlette application.
+
+    Args:
+        channel (Channel): The underlying channel.
+        compression (str, optional): The content encoding (i.e. "zlib" or "zstd")
+            used to compress the messages sent back to clients. Defaults to "",
+            which means no compression.
+        compression_threshold (int, optional): The minimum size (in bytes) of
+            the content to be compressed. Defaults to 1024.
+        replay_size (int, optional): The number of recently received messages
+            kept per subscription, which are replayed to a resuming client.
+            Defaults to 100.
+        resume_timeout (float, optional): How long (in seconds) a subscription
+            is kept alive after its client disconnects, waiting for the client
+            to resume. Defaults to 10.
+
+            Note that subscriptions in a queue group are not kept alive, since
+            the messages delivered to a member without any client would be lost
+            for the whole group.
     """
 
-    def __init__(self, channel: Channel):
+    def __init__(
+        self,
+        channel: Channel,
+        compression: str = "",
+        compression_threshold: int = 1024,
+        replay_size: int = 100,
+        resume_timeout: float = 10,
+    ):
+        if compression and compression not in encodings:
+            raise ValueError(f"Unsupported compression: {compression}")
+
         self._channel: Channel = channel
+        self._compression: str = compression
+        self._compression_threshold: int = compression_threshold
+
+        self._replay_size: int = replay_size
+        self._resume_timeout: float = resume_timeout
+        # Mapping from subscription ID to the resumable subscription.
+        self._resumables: dict[str, ResumableSubscription] = {}
 
     async def start(self):
         await self._channel.connect()
 
     async def stop(self):
+        for resumable in list(self._resumables.values()):
+            await self._expire(resumable)
         await self._channel.close()
 
     async def publish(
@@ -276,7 +499,7 @@ class HTTPChannelBackend:
         timeout: float = 5.0,
         probe: bool = True,
     ) -> AsyncIterator[RawMessage] | RawMessage | None:
-        return await self._channel.publish(
+        result = await self._channel.publish(
             addr,
             msg,
             stream=stream,
@@ -285,6 +508,35 @@ class HTTPChannelBackend:
             timeout=timeout,
             probe=probe,
         )
+        if stream:
+            return self._compress_stream(result)
+        if result is not None:
+            return self._compress(result)
+        return None
+
+    async def publish_batch(
+        self, items: list[tuple[Address, RawMessage, bool]]
+    ) -> list[BaseError | None]:
+        """Publish a batch of messages without waiting for any reply.
+
+        Args:
+            items (list[tuple[Address, RawMessage, bool]]): The (addr, msg, probe)
+                tuples to publish, in order.
+
+        Returns:
+            list[BaseError | None]: The error raised while publishing each
+                message, or None if published successfully.
+        """
+        results: list[BaseError | None] = []
+        # Publish sequentially to keep the order of the messages.
+        for addr, msg, probe in items:
+            try:
+                await self._channel.publish(addr, msg, probe=probe)
+            except BaseError as exc:
+                results.append(exc)
+            else:
+                results.append(None)
+        return results
 
     async def subscribe(
         self,
@@ -299,9 +551,154 @@ class HTTPChannelBackend:
 
         try:
             async for msg in msg_queue:
-                yield msg
+                yield self._compress(msg)
         finally:
             await sub.unsubscribe()
 
+    async def subscribe_events(
+        self,
+        addr: Address,
+        queue: str = "",
+        last_event_id: str = "",
+    ) -> AsyncIterator[tuple[str, RawMessage]]:
+        """Subscribe to the given address, and yield the messages along with
+        their event IDs (i.e. `<subscription ID>:<sequence>`).
+
+        If `last_event_id` is given and the subscription is still alive, the
+        messages after it are replayed before the new ones. Otherwise, a new
+        subscription is created.
+
+        A subscription in a queue group is removed once its client disconnects,
+        so that the group stops delivering messages to it.
+        """
+        resumable: ResumableSubscription | None = None
+        last_seq: int = 0
+        if last_event_id:
+            sub_id, _, seq = last_event_id.rpartition(":")
+            resumable = self._resumables.get(sub_id)
+            last_seq = int(seq) if seq.isdigit() else 0
+
+        if resumable is None:
+            resumable = ResumableSubscription(uuid.uuid4().hex, self._replay_size)
+            resumable.sub = await self._channel.subscribe(
+                addr, handler=resumable.receive, queue=queue
+            )
+            self._resumables[resumable.id] = resumable
+            last_seq = 0
+
+        resumable.attach()
+        try:
+            async for seq, msg in resumable.stream(last_seq):
+                yield f"{resumable.id}:{seq}", self._compress(msg)
+        finally:
+            if resumable.detach():
+                if queue:
+                    # Leave the group at once, not to receive messages in vain.
+                    await self._expire(resumable)
+                    return
+                # Wait for the client to resume for a while.
+                resumable.expiry = asyncio.get_running_loop().call_later(
+                    self._resume_timeout,
+                    lambda: asyncio.create_task(self._expire(resumable)),
+                )
+
+    async def _expire(self, resumable: ResumableSubscription) -> None:
+        if self._resumables.pop(resumable.id, None) is not None:
+            if resumable.expiry is not None:
+                resumable.expiry.cancel()
+            if resumable.sub is not None:
+                await resumable.sub.unsubscribe()
+
     async def new_reply_topic(self) -> str:
         return await self._channel.new_reply_topic()
+
+    def _compress(self, msg: RawMessage) -> RawMessage:
+        return compress_message(msg, self._compression, self._compression_threshold)
+
+    async def _compress_stream(
+        self, msgs: AsyncIterator[RawMessage]
+    ) -> AsyncIterator[RawMessage]:
+        async for msg in msgs:
+            yield self._compress(msg)
+
+
+class ResumableSubscription:
+    """A subscription that outlives its SSE connections for a while.
+
+    Each received message is tagged with a sequence number and kept in a log,
+    from which every connection streams from its own cursor. Besides the ones
+    not yet sent to all attached connections, only the messages received
+    recently (at most `replay_size`) are retained, so that a resuming
+    connection can replay the ones its client missed.
+    """
+
+    def __init__(self, id_: str, replay_size: int):
+        self.id: str = id_
+        self.sub: Subscription | None = None
+        self.expiry: asyncio.TimerHandle | None = None
+
+        self._replay_size: int = replay_size
+        self._seq: int = 0
+        self._log: collections.deque[tuple[int, RawMessage]] = collections.deque()
+        self._new_event: asyncio.Event = asyncio.Event()
+        self._connections: int = 0
+        # Mapping from the key of each streaming connection to its cursor.
+        self._cursors: dict[int, int] = {}
+        self._keys: itertools.count = itertools.count()
+
+    async def receive(self, msg: RawMessage) -> None:
+        self._seq += 1
+        self._log.append((self._seq, msg))
+        self._trim()
+        self._new_event.set()
+
+    def attach(self) -> None:
+        """Attach a connection, which cancels the pending expiry if any."""
+        self._connections += 1
+        if self.expiry is not None:
+            self.expiry.cancel()
+            self.expiry = None
+
+    def detach(self) -> bool:
+        """Detach a connection, and return whether it's the last one."""
+        self._connections -= 1
+        return self._connections == 0
+
+    async def stream(self, last_seq: int) -> AsyncIterator[tuple[int, RawMessage]]:
+        """Stream the messages after the given sequence number."""
+        if self._log and self._log[0][0] > last_seq + 1:
+            logger.warning(
+                f"Subscription {self.id}: messages after {last_seq} are no longer "
+                f"available, resuming from {self._log[0][0]}"
+            )
+
+        key = next(self._keys)
+        self._cursors[key] = cursor = last_seq
+        try:
+            while True:
+                items = self._since(cursor)
+                if not items:
+                    self._new_event.clear()
+                    await self._new_event.wait()
+                    continue
+
+                for seq, msg in items:
+                    yield seq, msg
+                    self._cursors[key] = cursor = seq
+                self._trim()
+        finally:
+            del self._cursors[key]
+            # Bound the log, since the client may never come back.
+            self._trim()
+
+    def _trim(self) -> None:
+        """Drop the messages that are neither recent nor pending to be sent."""
+        floor = min(self._cursors.values(), default=self._seq)
+        while len(self._log) > self._replay_size and self._log[0][0] <= floor:
+            self._log.popleft()
+
+    def _since(self, seq: int) -> list[tuple[int, RawMessage]]:
+        if not self._log:
+            return []
+        start = max(0, seq + 1 - self._log[0][0])
+        return list(itertools.islice(self._log, start, None))
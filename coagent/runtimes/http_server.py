@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+import contextlib
+from typing import AsyncIterator
+
+from sse_starlette.sse import EventSourceResponse
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+from coagent.core import Address, RawMessage
+from coagent.core.exceptions import BaseError
+
+from .http_runtime import HTTPChannelBackend
+
+
+def create_app(backend: HTTPChannelBackend, debug: bool = False) -> Starlette:
+    """Create a Starlette application serving the HTTP-based channel.
+
+    The backend is started and stopped along with the application.
+
+    POST /publish: Publish a message, and stream the results over SSE if needed.
+    POST /publish-batch: Publish a batch of messages without waiting for any reply.
+    POST /subscribe: Subscribe to an address, and stream the messages over SSE.
+        The subscription can be resumed with the `Last-Event-ID` header.
+    POST /reply-topics: Create a new reply topic.
+
+    Args:
+        backend (HTTPChannelBackend): The backend of the HTTP-based channel.
+        debug (bool, optional): Whether to enable the debug mode. Defaults to False.
+    """
+
+    @contextlib.asynccontextmanager
+    async def lifespan(app: Starlette) -> AsyncIterator[None]:
+        await backend.start()
+        try:
+            yield
+        finally:
+            await backend.stop()
+
+    app = Starlette(
+        debug=debug,
+        routes=[
+            Route("/publish", publish, methods=["POST"]),
+            Route("/publish-batch", publish_batch, methods=["POST"]),
+            Route("/subscribe", subscribe, methods=["POST"]),
+            Route("/reply-topics", new_reply_topic, methods=["POST"]),
+        ],
+        lifespan=lifespan,
+    )
+    app.state.backend = backend
+    return app
+
+
+async def publish(request: Request) -> Response:
+    backend: HTTPChannelBackend = request.app.state.backend
+    data: dict = await request.json()
+
+    addr: Address = Address.decode(data["addr"])
+    msg: RawMessage = RawMessage.decode(data["msg"])
+    stream: bool = data.get("stream", False)
+    probe: bool = data.get("probe", True)
+
+    # Streaming
+    if stream:
+        msgs: AsyncIterator[RawMessage] = await backend.publish(
+            addr=addr, msg=msg, stream=stream, probe=probe
+        )
+
+        async def event_stream() -> AsyncIterator[dict]:
+            try:
+                async for raw in msgs:
+                    yield dict(data=raw.encode_json())
+            except BaseError as exc:
+                yield dict(event="error", data=exc.encode_json())
+
+        return EventSourceResponse(event_stream())
+
+    # Non-streaming
+    try:
+        resp: RawMessage | None = await backend.publish(
+            addr=addr,
+            msg=msg,
+            stream=stream,
+            request=data.get("request", False),
+            reply=data.get("reply", ""),
+            timeout=data.get("timeout", 0.5),
+            probe=probe,
+        )
+    except BaseError as exc:
+        return JSONResponse(exc.encode(mode="json"), status_code=404)
+
+    if resp is None:
+        return Response(status_code=204)
+    return JSONResponse(resp.encode(mode="json"))
+
+
+async def publish_batch(request: Request) -> Response:
+    backend: HTTPChannelBackend = request.app.state.backend
+    data: dict = await request.json()
+
+    items = [
+        (
+            Address.decode(item["addr"]),
+            RawMessage.decode(item["msg"]),
+            item.get("probe", True),
+        )
+        for item in data["items"]
+    ]
+    errors = await backend.publish_batch(items)
+
+    results = [exc.encode(mode="json") if exc else None for exc in errors]
+    return JSONResponse(dict(results=results))
+
+
+async def subscribe(request: Request) -> Response:
+    backend: HTTPChannelBackend = request.app.state.backend
+    data: dict = await request.json()
+
+    # The client resumes the subscription with the ID of the last event it received.
+    msgs: AsyncIterator[tuple[str, RawMessage]] = backend.subscribe_events(
+        addr=Address.decode(data["addr"]),
+        queue=data.get("queue", ""),
+        last_event_id=request.headers.get("Last-Event-ID", ""),
+    )
+
+    async def event_stream() -> AsyncIterator[dict]:
+        async for event_id, raw in msgs:
+            yield dict(id=event_id, data=raw.encode_json())
+
+    return EventSourceResponse(event_stream())
+
+
+async def new_reply_topic(request: Request) -> Response:
+    backend: HTTPChannelBackend = request.app.state.backend
+    topic = await backend.new_reply_topic()
+    return JSONResponse(dict(reply_topic=topic))
@@ -1,11 +1,10 @@
 from __future__ import annotations
 
 import asyncio
+import itertools
 import uuid
-from typing import Any, AsyncIterator, Awaitable, Callable
+from typing import AsyncIterator, Awaitable, Callable
 
-import blinker
-import pydantic
 
 from coagent.core import (
     Address,
@@ -20,11 +19,12 @@ from coagent.core import (
 from coagent.core.exceptions import (
     AgentTypeNotFoundError,
     BaseError,
+    DeadlineExceededError,
     SessionIDEmptyError,
 )
 from coagent.core.factory import CreateAgent
-from coagent.core.messages import Empty, Error
-from coagent.core.types import coagent_reply_topic_prefix
+from coagent.core.runtime import ReplyInbox, check_reply
+from coagent.core.types import OverflowPolicy, coagent_reply_topic_prefix
 
 
 class LocalRuntime(BaseRuntime):
@@ -36,7 +36,39 @@ class LocalRuntime(BaseRuntime):
 
 
 class LocalChannel(BaseChannel):
-    """An in-process channel."""
+    """An in-process channel.
+
+    Args:
+        queue_size (int, optional): The maximum number of buffered messages
+            per subscription. Defaults to 0, which means there is no limit.
+        overflow_policy (OverflowPolicy, optional): The policy to apply when
+            the buffer of a subscription is full. Defaults to `OverflowPolicy.BLOCK`.
+        direct_dispatch (bool, optional): Whether to hand over the messages sent
+            by agents to the receivers directly, without serialization. Each receiver
+            gets a shallow copy of the message, so the nested objects of a message
+            must not be modified after being sent if this is enabled.
+            Defaults to False.
+    """
+
+    def __init__(
+        self,
+        queue_size: int = 0,
+        overflow_policy: OverflowPolicy = OverflowPolicy.BLOCK,
+        direct_dispatch: bool = False,
+    ):
+        self.direct_dispatch: bool = direct_dispatch
+        self._queue_size: int = queue_size
+        self._overflow_policy: OverflowPolicy = overflow_policy
+
+        # Each channel has its own router, so that multiple runtimes in
+        # the same process are isolated from each other.
+        self._router: LocalRouter = LocalRouter()
+
+        # All replies to the requests from this channel are dispatched
+        # directly to the waiting requesters.
+        self._inbox: ReplyInbox = ReplyInbox(
+            f"{coagent_reply_topic_prefix}{uuid.uuid4().hex}"
+        )
 
     async def connect(self) -> None:
         pass
@@ -55,13 +87,25 @@ class LocalChannel(BaseChannel):
     async def new_reply_topic(self) -> str:
         return f"{coagent_reply_topic_prefix}{uuid.uuid4().hex}"
 
+    async def subscribe_reply(
+        self, handler: Callable[[RawMessage], Awaitable[None]]
+    ) -> tuple[str, Subscription]:
+        return self._inbox.subscribe(handler)
+
     async def _subscribe(
         self,
         addr: Address,
         handler: Callable[[RawMessage], Awaitable[None]] | None = None,
         queue: str = "",
     ) -> LocalChannelSubscription:
-        sub = LocalChannelSubscription(addr, handler)
+        sub = LocalChannelSubscription(
+            self._router,
+            addr,
+            handler,
+            queue,
+            self._queue_size,
+            self._overflow_policy,
+        )
         await sub.subscribe()
         return sub
 
@@ -76,7 +120,7 @@ class LocalChannel(BaseChannel):
         probe: bool = True,
     ) -> RawMessage | None:
         if addr.is_reply or not probe or self._probe(addr):
-            return await self._blinker_send(
+            return await self._send(
                 addr, msg, request=request, stream=stream, reply=reply, timeout=timeout
             )
 
@@ -96,29 +140,53 @@ class LocalChannel(BaseChannel):
         if not addr.id:
             raise SessionIDEmptyError(f"Empty ID in addr {addr}")
 
-        # Notify the corresponding factory to create the agent and wait for its reply.
         factory_addr = Address(name=addr.name)
-        create_msg = CreateAgent(session_id=addr.id).encode()
         if not self._probe(factory_addr):
             raise AgentTypeNotFoundError(f"No factory found for agent '{addr.name}'")
 
-        await self._blinker_send(factory_addr, create_msg, request=True)
+        # Send the original message along with the CreateAgent instruction to
+        # the corresponding factory, which will create the agent and deliver
+        # the message to it directly.
+        if not (request and reply):
+            # The reply of the original message (if requested) will be sent to
+            # the reply topic of the CreateAgent message.
+            create_msg = CreateAgent(session_id=addr.id, raw=msg).encode(
+                lazy=self.direct_dispatch
+            )
+            return await self._send(
+                factory_addr,
+                create_msg,
+                request=request,
+                stream=stream,
+                reply=reply,
+                timeout=timeout,
+            )
 
-        # Then send the original message to the agent.
-        return await self._blinker_send(
-            addr, msg, request=request, stream=stream, reply=reply, timeout=timeout
+        # In request-reply mode and a reply topic is given.
+        #
+        # The reply(s) of the original message will be sent to the given reply
+        # topic, while the factory will acknowledge the creation and delivery.
+        # By waiting for the acknowledgement, we can detect the case where the
+        # factory is stuck.
+        msg.reply = Reply(address=Address(name=reply), stream=stream)
+        create_msg = CreateAgent(session_id=addr.id, raw=msg).encode(
+            lazy=self.direct_dispatch
         )
+        try:
+            # Wait at most 5 seconds for the factory to create an agent.
+            return await self._send(factory_addr, create_msg, request=True, timeout=5)
+        except DeadlineExceededError:
+            raise DeadlineExceededError(
+                f"Factory {factory_addr.name} is too slow to respond"
+            )
 
     def _probe(self, addr: Address) -> bool:
         """Probe the existence of the agent at the given address by detecting
-        whether there are any receivers for the given topic.
-
-        See https://blinker.readthedocs.io/en/stable/#blinker.Signal.receivers.
+        whether there are any subscribers for the given topic.
         """
-        sig = blinker.signal(addr.topic)
-        return bool(sig.receivers)
+        return self._router.has_subscribers(addr.topic)
 
-    async def _blinker_send(
+    async def _send(
         self,
         addr: Address,
         msg: RawMessage,
@@ -127,86 +195,155 @@ class LocalChannel(BaseChannel):
         reply: str = "",
         timeout: float = 0.5,
     ) -> RawMessage | None:
-        sig = blinker.signal(addr.topic)
-        # print(f"[LocalChannel] Sending message {msg} to {addr.topic}, signal: {sig}")
-
-        # TODO: Respect the timeout.
+        if addr.is_reply and self._inbox.owns(addr.topic):
+            # A reply to a request from this channel.
+            await self._inbox.dispatch(addr.topic, msg)
+            return None
 
-        # **IMPORTANT**:
-        # Here we assume that the first argument name of all receivers is "raw".
-        # Currently, this aligns with the signature of the `BaseAgent.receive()` method.
+        topic = addr.topic
 
         if not request:
             # Not in request-reply mode, just publish the message.
-            await sig.send_async(None, raw=msg)
+            await self._router.publish(topic, msg)
             return None
         elif reply:
             # In request-reply mode and a reply topic is given.
             # Publish the message and the response(s) will be sent to the reply topic.
             msg.reply = Reply(address=Address(name=reply), stream=stream)
-            await sig.send_async(None, raw=msg)
+            await self._router.publish(topic, msg)
             return None
         else:
             # In request-reply mode and no reply topic is given.
             # Wait for a response on a temporary topic and return it.
-            tmp_reply = await self.new_reply_topic()
-            addr = Address(name=tmp_reply)
-            sub = await self._subscribe(addr)
+            future: asyncio.Future[RawMessage] = (
+                asyncio.get_running_loop().create_future()
+            )
+
+            async def receive(raw: RawMessage) -> None:
+                # Just wait for the first message.
+                if not future.done():
+                    future.set_result(raw)
 
-            msg.reply = Reply(address=addr, stream=stream)
-            await sig.send_async(None, raw=msg)
+            async def request_and_wait() -> RawMessage:
+                await self._router.publish(topic, msg)
+                return await future
 
-            result: RawMessage | None = None
-            async for raw in sub.queue:
-                result = raw
-                break  # Just wait for the first message.
+            tmp_reply, sub = self._inbox.subscribe(receive)
 
+            msg.reply = Reply(
+                address=Address(name=tmp_reply), stream=stream, timeout=timeout
+            )
             try:
-                Empty.decode(result)
-                return None
-            except pydantic.ValidationError:
-                # Can not be converted to Empty.
-                try:
-                    err = Error.decode(result)
-                    raise BaseError.decode_message(err)
-                except pydantic.ValidationError:
-                    # Can not be converted to Error, so return the message as is.
-                    return result
+                result = await asyncio.wait_for(request_and_wait(), timeout)
+            except asyncio.TimeoutError:
+                raise DeadlineExceededError(
+                    f"No reply from {topic} within {timeout} seconds"
+                )
             finally:
                 await sub.unsubscribe()
 
+            return check_reply(result)
+
+
+class LocalRouter:
+    """An in-process router that dispatches messages to subscriptions by topic.
+
+    Like NATS, every message is delivered to all the subscriptions of its
+    topic, except that the subscriptions in the same queue group share the
+    messages in a round-robin manner (i.e. each message is delivered to only
+    one of them).
+    """
+
+    def __init__(self):
+        # Mapping from topic to the subscriptions without a queue group.
+        self._subs: dict[str, list[LocalChannelSubscription]] = {}
+        # Mapping from topic to the queue groups, each of which is a list of
+        # subscriptions along with a counter for round-robin delivery.
+        self._groups: dict[
+            str, dict[str, tuple[list[LocalChannelSubscription], itertools.count]]
+        ] = {}
+
+    def add(self, topic: str, sub: LocalChannelSubscription, queue: str = "") -> None:
+        if not queue:
+            self._subs.setdefault(topic, []).append(sub)
+            return
+
+        groups = self._groups.setdefault(topic, {})
+        members, _ = groups.setdefault(queue, ([], itertools.count()))
+        members.append(sub)
+
+    def remove(
+        self, topic: str, sub: LocalChannelSubscription, queue: str = ""
+    ) -> None:
+        if not queue:
+            subs = self._subs.get(topic)
+            if subs and sub in subs:
+                subs.remove(sub)
+                if not subs:
+                    del self._subs[topic]
+            return
+
+        groups = self._groups.get(topic)
+        if not groups or queue not in groups:
+            return
+        members, _ = groups[queue]
+        if sub in members:
+            members.remove(sub)
+        if not members:
+            del groups[queue]
+            if not groups:
+                del self._groups[topic]
+
+    def has_subscribers(self, topic: str) -> bool:
+        return topic in self._subs or topic in self._groups
+
+    async def publish(self, topic: str, raw: RawMessage) -> None:
+        # Take a snapshot of the receivers, since the subscriptions may change
+        # while delivering the message.
+        receivers = list(self._subs.get(topic, ()))
+        for members, counter in self._groups.get(topic, {}).values():
+            receivers.append(members[next(counter) % len(members)])
+
+        for sub in receivers:
+            await sub.receive(raw)
+
 
 class LocalChannelSubscription(Subscription):
     def __init__(
         self,
+        router: LocalRouter,
         addr: Address,
         handler: Callable[[RawMessage], Awaitable[None]] | None = None,
+        queue: str = "",
+        queue_size: int = 0,
+        overflow_policy: OverflowPolicy = OverflowPolicy.BLOCK,
     ):
+        self._router = router
         self._addr = addr
         self._handler = handler
+        self._group = queue
 
-        self._queue: QueueSubscriptionIterator = QueueSubscriptionIterator()
+        self._queue: QueueSubscriptionIterator = QueueSubscriptionIterator(
+            queue_size, overflow_policy
+        )
         self._task: asyncio.Task | None = None
-        self._exit_event: asyncio.Event = asyncio.Event()
 
     async def subscribe(self):
-        sig = blinker.signal(self._addr.topic)
-        sig.connect(self._receive, weak=False)
+        self._router.add(self._addr.topic, self, self._group)
 
         if self._handler:
             self._task = asyncio.create_task(self._poll())
 
-        # print(f"[LocalChannel] Connecting to {self._addr.topic}, signal: {sig}")
-
     async def unsubscribe(self, limit: int = 0) -> None:
-        sig = blinker.signal(self._addr.topic)
-        sig.disconnect(self._receive)
+        self._router.remove(self._addr.topic, self, self._group)
 
         if self._task:
             self._task.cancel()
             try:
+                # Wait for the task to exit, even if it's cancelled before running.
+                #
                 # This will raise asyncio.CancelledError if the current task was cancelled.
-                await self._exit_event.wait()
+                await asyncio.wait([self._task])
             except asyncio.CancelledError:
                 pass
 
@@ -214,7 +351,7 @@ class LocalChannelSubscription(Subscription):
     def queue(self) -> AsyncIterator[RawMessage]:
         return self._queue
 
-    async def _receive(self, sender: Any, raw: RawMessage) -> None:
+    async def receive(self, raw: RawMessage) -> None:
         await self._queue.receive(raw)
 
     async def _poll(self):
@@ -227,5 +364,3 @@ class LocalChannelSubscription(Subscription):
         except BaseError as exc:
             # Send the error as a message.
             await self._handler(exc.encode_message().encode())
-        finally:
-            self._exit_event.set()
@@ -1,14 +1,14 @@
 from __future__ import annotations
 
-import asyncio
+from collections import OrderedDict
 import json
+import time
 from typing import List, Union, Callable, Awaitable
 
 import nats
 from nats.aio.client import Msg
 from nats.aio.subscription import Subscription as NATSSubscription
 from nats.errors import ConnectionClosedError, NoRespondersError, TimeoutError
-import pydantic
 
 from coagent.core import (
     Address,
@@ -21,12 +21,18 @@ from coagent.core import (
 )
 from coagent.core.exceptions import (
     AgentTypeNotFoundError,
-    BaseError,
     DeadlineExceededError,
     SessionIDEmptyError,
 )
-from coagent.core.messages import ProbeAgent, Empty, Error
+from coagent.core.compression import compress_message, encodings
+from coagent.core.messages import ProbeAgent
 from coagent.core.factory import CreateAgent
+from coagent.core.runtime import ReplyInbox, check_reply
+from coagent.core.types import coagent_agent_topic_prefix
+
+
+# The topic for broadcasting the topics of agents that have been stopped.
+agent_stopped_topic = "coagent.broadcast.agent_stopped"
 
 
 class NATSRuntime(BaseRuntime):
@@ -42,15 +48,73 @@ class NATSRuntime(BaseRuntime):
 
 
 class NATSChannel(BaseChannel):
-    """A NATS-based channel."""
+    """A NATS-based channel.
+
+    Args:
+        servers (str | list[str], optional): The NATS server(s) to connect to.
+            Defaults to ["nats://localhost:4222"].
+        probe_cache_ttl (float, optional): How long (in seconds) an agent is
+            considered alive after it's known to exist, during which publishing
+            to it will skip the probe. Defaults to 5. Set to 0 to disable the cache.
+        probe_cache_size (int, optional): The maximum number of agents in the
+            probe cache. Defaults to 10000.
+        probe_cache_grace (float, optional): How long (in seconds) a cached
+            agent is trusted without probing it again for sends that can not
+            detect its absence (i.e. plain publishes and streaming requests).
+            This bounds the time during which messages to an agent that has
+            gone without notice (e.g. its node crashed) are silently dropped.
+            Defaults to 0.5.
+        compression (str, optional): The content encoding (i.e. "zlib" or "zstd")
+            used to compress the messages to publish. Defaults to "", which means
+            no compression. Note that "zstd" requires the `zstandard` package.
+        compression_threshold (int, optional): The minimum size (in bytes) of
+            the content to be compressed. Defaults to 1024.
+    """
+
+    def __init__(
+        self,
+        servers: Union[str, List[str], None] = None,
+        probe_cache_ttl: float = 5,
+        probe_cache_size: int = 10000,
+        probe_cache_grace: float = 0.5,
+        compression: str = "",
+        compression_threshold: int = 1024,
+    ):
+        if compression and compression not in encodings:
+            raise ValueError(f"Unsupported compression: {compression}")
 
-    def __init__(self, servers: Union[str, List[str], None] = None):
         self._servers: Union[str, List[str]] = servers or ["nats://localhost:4222"]
         self._nc: nats.NATS | None = None
+        self._inbox: ReplyInbox | None = None
+
+        self._probe_cache: ProbeCache | None = None
+        if probe_cache_ttl > 0:
+            self._probe_cache = ProbeCache(probe_cache_ttl, probe_cache_size)
+        self._probe_cache_grace: float = probe_cache_grace
+
+        self._compression: str = compression
+        self._compression_threshold: int = compression_threshold
 
     async def connect(self) -> None:
         self._nc = await nats.connect(self._servers)
 
+        # Receive all replies to the requests from this channel with one
+        # wildcard subscription.
+        inbox = ReplyInbox(self._nc.new_inbox())
+
+        async def receive_reply(msg: Msg) -> None:
+            await inbox.dispatch(msg.subject, nats_msg_to_raw(msg))
+
+        await self._nc.subscribe(f"{inbox.prefix}.*", cb=receive_reply)
+        self._inbox = inbox
+
+        if self._probe_cache:
+            # Invalidate the cache once an agent is stopped on any node.
+            async def receive(msg: Msg) -> None:
+                self._probe_cache.discard(msg.data.decode("utf-8"))
+
+            await self._nc.subscribe(agent_stopped_topic, cb=receive)
+
     async def close(self) -> None:
         try:
             await self._nc.drain()
@@ -68,11 +132,24 @@ class NATSChannel(BaseChannel):
             await handler(raw)
 
         sub = await self._nc.subscribe(addr.topic, queue=queue, cb=receive)
-        return NATSChannelSubscription(sub)
+
+        on_unsubscribe = None
+        if addr.topic.startswith(coagent_agent_topic_prefix):
+
+            async def on_unsubscribe() -> None:
+                # Notify all channels that the agent has been stopped.
+                await self._nc.publish(agent_stopped_topic, addr.topic.encode("utf-8"))
+
+        return NATSChannelSubscription(sub, on_unsubscribe)
 
     async def new_reply_topic(self) -> str:
         return self._nc.new_inbox()
 
+    async def subscribe_reply(
+        self, handler: Callable[[RawMessage], Awaitable[None]]
+    ) -> tuple[str, Subscription]:
+        return self._inbox.subscribe(handler)
+
     async def _publish(
         self,
         addr: Address,
@@ -83,28 +160,55 @@ class NATSChannel(BaseChannel):
         timeout: float = 0.5,
         probe: bool = True,
     ) -> RawMessage | None:
-        if addr.is_reply or not probe or await self._probe(addr):
+        if addr.is_reply or not probe:
             return await self._nats_publish(
                 addr, msg, request=request, stream=stream, reply=reply, timeout=timeout
             )
 
-        if request:
-            # If in request-reply (or non-blocking) mode, always wait for the reply.
-            return await self._create_and_publish(
-                addr,
-                msg,
-                request=request,
-                stream=stream,
-                reply=reply,
-                timeout=timeout,
-            )
-
-        # Run in a separate task to avoid blocking the agent handler.
-        _ = asyncio.create_task(
-            self._create_and_publish(
+        cache = self._probe_cache
+        # Only a request without a reply topic can detect that the agent has
+        # gone (by NoRespondersError). For other sends, the cached entry is
+        # only trusted within the grace period, after which the agent is
+        # probed again.
+        detectable = request and not reply
+        if (
+            cache
+            and addr.topic in cache
+            and (detectable or cache.is_fresh(addr.topic, self._probe_cache_grace))
+        ):
+            try:
+                result = await self._nats_publish(
+                    addr,
+                    msg,
+                    request=request,
+                    stream=stream,
+                    reply=reply,
+                    timeout=timeout,
+                )
+            except NoRespondersError:
+                # The agent has gone, fall back to creating it.
+                cache.discard(addr.topic)
+            else:
+                if request and not reply:
+                    # A reply is received, so the agent is still alive.
+                    cache.add(addr.topic)
+                return result
+        elif await self._probe(addr):
+            if cache:
+                cache.add(addr.topic)
+            return await self._nats_publish(
                 addr, msg, request=request, stream=stream, reply=reply, timeout=timeout
             )
+        elif cache:
+            cache.discard(addr.topic)
+
+        result = await self._create_and_publish(
+            addr, msg, request=request, stream=stream, reply=reply, timeout=timeout
         )
+        if cache and request:
+            # The factory has created the agent and delivered the message.
+            cache.add(addr.topic)
+        return result
 
     async def _create_and_publish(
         self,
@@ -118,12 +222,48 @@ class NATSChannel(BaseChannel):
         if not addr.id:
             raise SessionIDEmptyError(f"Empty ID in addr {addr}")
 
-        # Notify the corresponding factory to create the agent and wait for its reply.
+        # Send the original message along with the CreateAgent instruction to
+        # the corresponding factory, which will create the agent and deliver
+        # the message to it directly.
         factory_addr = Address(name=addr.name)
-        create_msg = CreateAgent(session_id=addr.id).encode()
+
+        if not request:
+            # Not in request-reply mode, just publish the message.
+            create_msg = CreateAgent(session_id=addr.id, raw=msg).encode()
+            return await self._nats_publish(factory_addr, create_msg)
+
+        if not reply:
+            # In request-reply mode and no reply topic is given.
+            #
+            # The reply of the original message will be sent to the reply topic
+            # of the CreateAgent message.
+            create_msg = CreateAgent(session_id=addr.id, raw=msg).encode()
+            try:
+                return await self._nats_publish(
+                    factory_addr,
+                    create_msg,
+                    request=True,
+                    stream=stream,
+                    timeout=timeout,
+                )
+            except NoRespondersError:
+                raise AgentTypeNotFoundError(
+                    f"No factory found for agent '{addr.name}'"
+                )
+
+        # In request-reply mode and a reply topic is given.
+        #
+        # The reply(s) of the original message will be sent to the given reply
+        # topic, while the factory will acknowledge the creation and delivery.
+        # By waiting for the acknowledgement, we can detect the case where no
+        # factory is found.
+        msg.reply = Reply(address=Address(name=reply), stream=stream)
+        create_msg = CreateAgent(session_id=addr.id, raw=msg).encode()
         try:
             # Wait at most 5 seconds for the factory to create an agent.
-            await self._nats_publish(factory_addr, create_msg, request=True, timeout=5)
+            return await self._nats_publish(
+                factory_addr, create_msg, request=True, timeout=5
+            )
         except NoRespondersError:
             raise AgentTypeNotFoundError(f"No factory found for agent '{addr.name}'")
         except TimeoutError:
@@ -131,11 +271,6 @@ class NATSChannel(BaseChannel):
                 f"Factory {factory_addr.name} is too slow to respond"
             )
 
-        # Then send the original message to the agent.
-        return await self._nats_publish(
-            addr, msg, request=request, stream=stream, reply=reply, timeout=timeout
-        )
-
     async def _probe(self, addr: Address) -> bool:
         """Probe the existence of the agent at the given address by leveraging
         the `No responders` mechanism of NATS to check if there are available
@@ -167,12 +302,15 @@ class NATSChannel(BaseChannel):
         timeout: float = 0.5,
     ) -> RawMessage | None:
         topic = addr.topic
+        msg = compress_message(msg, self._compression, self._compression_threshold)
         headers = {
             "Coagent-Type": msg.header.type,
             "Coagent-Content-Type": msg.header.content_type,
             "Coagent-Extensions": json.dumps(msg.header.extensions),
             "Coagent-Stream": "true" if stream else "false",
         }
+        if msg.header.content_encoding:
+            headers["Coagent-Content-Encoding"] = msg.header.content_encoding
         payload = msg.content
 
         if not request:
@@ -185,38 +323,74 @@ class NATSChannel(BaseChannel):
         else:
             # In request-reply mode and no reply topic is given.
             # Publish the message and wait for a response on a temporary topic.
+            headers["Coagent-Timeout"] = str(timeout)
             result = await self._nc.request(
                 topic, payload, timeout=timeout, headers=headers
             )
             result_msg = nats_msg_to_raw(result)
-            try:
-                Empty.decode(result_msg)
-                return None
-            except pydantic.ValidationError:
-                # Can not be converted to Empty.
-                try:
-                    err = Error.decode(result_msg)
-                    raise BaseError.decode_message(err)
-                except pydantic.ValidationError:
-                    # Can not be converted to Error, so return the message as is.
-                    return result_msg
+            return check_reply(result_msg)
 
 
 class NATSChannelSubscription(Subscription):
-    def __init__(self, sub: NATSSubscription):
+    def __init__(
+        self,
+        sub: NATSSubscription,
+        on_unsubscribe: Callable[[], Awaitable[None]] | None = None,
+    ):
         self._sub: NATSSubscription = sub
+        self._on_unsubscribe: Callable[[], Awaitable[None]] | None = on_unsubscribe
 
     async def unsubscribe(self, limit: int = 0) -> None:
         try:
             await self._sub.unsubscribe(limit)
+            if self._on_unsubscribe:
+                await self._on_unsubscribe()
         except ConnectionClosedError:
             pass
 
 
+class ProbeCache:
+    """A cache of agent topics that are recently known to be alive.
+
+    Each topic expires after `ttl` seconds, and the least recently added
+    topic is evicted if the cache is full.
+    """
+
+    def __init__(self, ttl: float, maxsize: int):
+        self._ttl: float = ttl
+        self._maxsize: int = maxsize
+        # Mapping from topic to the time when it's known to be alive.
+        self._topics: OrderedDict[str, float] = OrderedDict()
+
+    def __contains__(self, topic: str) -> bool:
+        added_at = self._topics.get(topic)
+        if added_at is None:
+            return False
+        if added_at + self._ttl <= time.monotonic():
+            del self._topics[topic]
+            return False
+        return True
+
+    def is_fresh(self, topic: str, seconds: float) -> bool:
+        """Check if the topic is known to be alive within the given seconds."""
+        added_at = self._topics.get(topic)
+        return added_at is not None and time.monotonic() - added_at < seconds
+
+    def add(self, topic: str) -> None:
+        self._topics[topic] = time.monotonic()
+        self._topics.move_to_end(topic)
+        if len(self._topics) > self._maxsize:
+            self._topics.popitem(last=False)
+
+    def discard(self, topic: str) -> None:
+        self._topics.pop(topic, None)
+
+
 def nats_msg_to_raw(msg: Msg) -> RawMessage:
     header = MessageHeader(
         type=msg.header.get("Coagent-Type"),
         content_type=msg.header.get("Coagent-Content-Type"),
+        content_encoding=msg.header.get("Coagent-Content-Encoding", ""),
         extensions=json.loads(msg.header.get("Coagent-Extensions", "{}")),
     )
     raw = RawMessage(
@@ -225,5 +399,10 @@ def nats_msg_to_raw(msg: Msg) -> RawMessage:
     )
     if msg.reply:
         stream = msg.header.get("Coagent-Stream") == "true"
-        raw.reply = Reply(address=Address(name=msg.reply), stream=stream)
+        timeout = msg.header.get("Coagent-Timeout")
+        raw.reply = Reply(
+            address=Address(name=msg.reply),
+            stream=stream,
+            timeout=float(timeout) if timeout else None,
+        )
     return raw
@@ -0,0 +1,465 @@
+from __future__ import annotations
+
+import asyncio
+import itertools
+import json
+from typing import AsyncIterator, Awaitable, Callable, Protocol
+
+import aiohttp
+
+from coagent.core import (
+    Address,
+    BaseRuntime,
+    BaseChannel,
+    Channel,
+    logger,
+    RawMessage,
+    QueueSubscriptionIterator,
+    StopIteration,
+    Subscription,
+)
+from coagent.core.exceptions import BaseError, DeadlineExceededError, InternalError
+
+
+# The operations of the frames sent by the client.
+OP_PUBLISH = "publish"
+OP_SUBSCRIBE = "subscribe"
+OP_REPLY_TOPIC = "reply-topic"
+OP_CLOSE = "close"
+
+# The operations of the frames sent by the server.
+OP_RESULT = "result"
+OP_MESSAGE = "message"
+OP_END = "end"
+OP_ERROR = "error"
+
+
+class WebSocketRuntime(BaseRuntime):
+    """A WebSocket-based runtime."""
+
+    def __init__(self, channel: WebSocketChannel):
+        super().__init__(channel)
+
+    @classmethod
+    def from_server(cls, server: str, auth: str = "") -> WebSocketRuntime:
+        """
+        Args:
+            server (str): The server address (e.g. ws://localhost:8000/ws).
+            auth (str, optional): The authentication credential. Defaults to "".
+        """
+        channel = WebSocketChannel(server, auth)
+        return WebSocketRuntime(channel)
+
+
+class WebSocketChannel(BaseChannel):
+    """A WebSocket-based channel.
+
+    Unlike `HTTPChannel`, which needs one request per publish and one stream
+    per subscription, all publishes, subscriptions and replies of the channel
+    are multiplexed over one WebSocket connection.
+
+    Each frame is a JSON object, which carries an `id` to correlate the frames
+    sent by the server (`result`, `message`, `end` or `error`) with the frame
+    sent by the client (`publish`, `subscribe`, `reply-topic` or `close`).
+    Publishes that expect no reply are not acknowledged by the server, which
+    only sends back an `error` frame if the publish fails. Such errors can not
+    be raised to the publisher, so they are logged instead.
+
+    The frames are read by one task, which never runs the handlers itself.
+    Instead, the messages of each stream are queued and consumed by their own
+    task, so that a handler can publish (and wait for the result) in turn.
+
+    See `WebSocketChannelBackend` for the server side.
+
+    Note that the channel does not reconnect. Once the connection is lost, the
+    pending requests and the open streams fail with `InternalError`.
+
+    Args:
+        server (str): The server address (e.g. ws://localhost:8000/ws).
+        auth (str, optional): The authentication credential. Defaults to "".
+        heartbeat (float, optional): The interval (in seconds) to send ping
+            frames to keep the connection alive. Defaults to 30.
+    """
+
+    def __init__(self, server: str, auth: str = "", heartbeat: float = 30):
+        self._server: str = server
+        self._auth: str = auth
+        self._heartbeat: float = heartbeat
+
+        self._session: aiohttp.ClientSession | None = None
+        self._ws: aiohttp.ClientWebSocketResponse | None = None
+        self._read_task: asyncio.Task | None = None
+
+        self._ids: itertools.count = itertools.count(1)
+        # Mapping from frame ID to the future waiting for the result.
+        self._results: dict[int, asyncio.Future[dict]] = {}
+        # Mapping from frame ID to the queue of the streaming messages.
+        self._queues: dict[int, QueueSubscriptionIterator] = {}
+
+    async def connect(self) -> None:
+        headers = {"Authorization": self._auth} if self._auth else None
+        self._session = aiohttp.ClientSession()
+        try:
+            self._ws = await self._session.ws_connect(
+                self._server, headers=headers, heartbeat=self._heartbeat
+            )
+        except BaseException:
+            await self._session.close()
+            self._session = None
+            raise
+        self._read_task = asyncio.create_task(self._read())
+
+    async def close(self) -> None:
+        if self._ws is not None:
+            await self._ws.close()
+        if self._read_task is not None:
+            await self._read_task
+        if self._session is not None:
+            await self._session.close()
+        self._ws = self._session = self._read_task = None
+
+    async def _publish(
+        self,
+        addr: Address,
+        msg: RawMessage,
+        stream: bool = False,
+        request: bool = False,
+        reply: str = "",
+        timeout: float = 5.0,
+        probe: bool = True,
+    ) -> RawMessage | None:
+        frame = dict(
+            op=OP_PUBLISH,
+            addr=addr.encode(mode="json"),
+            msg=msg.encode(mode="json"),
+            stream=stream,
+            request=request,
+            reply=reply,
+            timeout=timeout,
+            probe=probe,
+        )
+        if not request:
+            # Fire and forget, without waiting for the server to acknowledge.
+            await self._send(dict(frame, id=next(self._ids)))
+            return None
+
+        result = await self._request(frame, timeout=timeout)
+        data = result.get("msg")
+        return RawMessage.decode(data) if data else None
+
+    async def _publish_stream(
+        self,
+        addr: Address,
+        msg: RawMessage,
+        probe: bool = True,
+        idle_timeout: float | None = None,
+    ) -> AsyncIterator[RawMessage]:
+        frame = dict(
+            op=OP_PUBLISH,
+            addr=addr.encode(mode="json"),
+            msg=msg.encode(mode="json"),
+            stream=True,
+            request=True,
+            probe=probe,
+        )
+        queue: QueueSubscriptionIterator = QueueSubscriptionIterator(
+            idle_timeout=idle_timeout
+        )
+        id_ = next(self._ids)
+        self._queues[id_] = queue
+
+        try:
+            await self._send(dict(frame, id=id_))
+            async for msg in queue:
+                yield msg
+        finally:
+            await self._close(id_)
+
+    async def subscribe(
+        self,
+        addr: Address,
+        handler: Callable[[RawMessage], Awaitable[None]],
+        queue: str = "",
+    ) -> Subscription:
+        frame = dict(op=OP_SUBSCRIBE, addr=addr.encode(mode="json"), queue=queue)
+        id_ = next(self._ids)
+        msg_queue = self._queues[id_] = QueueSubscriptionIterator()
+
+        # Wait until the subscription is created on the server side.
+        try:
+            await self._request(frame, id_=id_)
+        except BaseException:
+            await self._close(id_)
+            raise
+
+        sub = WebSocketChannelSubscription(self, id_, msg_queue, handler)
+        await sub.subscribe()
+        return sub
+
+    async def new_reply_topic(self) -> str:
+        result = await self._request(dict(op=OP_REPLY_TOPIC))
+        return result["reply_topic"]
+
+    async def _send(self, frame: dict) -> None:
+        if self._ws is None:
+            raise RuntimeError("WebSocketChannel is not connected")
+        await self._ws.send_str(json.dumps(frame))
+
+    async def _request(
+        self, frame: dict, timeout: float | None = None, id_: int = 0
+    ) -> dict:
+        """Send a frame and wait for its result."""
+        id_ = id_ or next(self._ids)
+        future = self._results[id_] = asyncio.get_running_loop().create_future()
+        try:
+            await self._send(dict(frame, id=id_))
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            raise DeadlineExceededError(f"No result within {timeout} seconds")
+        finally:
+            self._results.pop(id_, None)
+
+    async def _close(self, id_: int) -> None:
+        """Close the stream of messages with the given frame ID."""
+        if self._queues.pop(id_, None) is not None and self._ws is not None:
+            try:
+                await self._send(dict(op=OP_CLOSE, id=id_))
+            except ConnectionError:
+                pass
+
+    async def _read(self) -> None:
+        async for ws_msg in self._ws:
+            if ws_msg.type != aiohttp.WSMsgType.TEXT:
+                continue
+            try:
+                await self._dispatch(json.loads(ws_msg.data))
+            except Exception as exc:
+                logger.exception(f"Failed to handle frame: {exc}")
+
+        # The connection is closed, fail all the waiters and the open streams.
+        exc = InternalError("WebSocket is closed")
+        for future in self._results.values():
+            if not future.done():
+                future.set_exception(exc)
+        self._results.clear()
+        queues, self._queues = self._queues, {}
+        for queue in queues.values():
+            await queue.receive(exc.encode_message().encode())
+
+    async def _dispatch(self, frame: dict) -> None:
+        # Note that the queues are unbounded, so the reading never blocks.
+        id_: int = frame["id"]
+        op: str = frame["op"]
+
+        future = self._results.get(id_)
+        queue = self._queues.get(id_)
+
+        match op:
+            case "result":
+                if future and not future.done():
+                    future.set_result(frame)
+            case "message":
+                if queue:
+                    await queue.receive(RawMessage.decode(frame["msg"]))
+            case "end":
+                if self._queues.pop(id_, None):
+                    # End of the stream, send an extra StopIteration message.
+                    await queue.receive(StopIteration().encode())
+            case "error":
+                exc = BaseError.decode(frame["error"])
+                if future and not future.done():
+                    future.set_exception(exc)
+                elif self._queues.pop(id_, None):
+                    # Send the error as a message.
+                    await queue.receive(exc.encode_message().encode())
+                else:
+                    # The publish is not waited for, just log it.
+                    logger.error(f"Error from the server: {exc}")
+
+
+class WebSocketChannelSubscription(Subscription):
+    """A subscription created when subscribing to a WebSocket-based channel.
+
+    The messages are queued by the channel and handled in a separate task.
+    """
+
+    def __init__(
+        self,
+        channel: WebSocketChannel,
+        id_: int,
+        queue: QueueSubscriptionIterator,
+        handler: Callable[[RawMessage], Awaitable[None]],
+    ):
+        self._channel: WebSocketChannel = channel
+        self._id: int = id_
+        self._queue: QueueSubscriptionIterator = queue
+        self._handler: Callable[[RawMessage], Awaitable[None]] = handler
+        self._task: asyncio.Task | None = None
+
+    async def subscribe(self) -> None:
+        self._task = asyncio.create_task(self._poll())
+
+    async def unsubscribe(self, limit: int = 0) -> None:
+        """Align to NATS for simplicity."""
+        await self._channel._close(self._id)
+
+        if self._task:
+            self._task.cancel()
+            try:
+                # Wait for the task to exit, even if it's cancelled before running.
+                #
+                # This will raise asyncio.CancelledError if the current task was cancelled.
+                await asyncio.wait([self._task])
+            except asyncio.CancelledError:
+                pass
+
+    async def _poll(self) -> None:
+        try:
+            async for raw in self._queue:
+                await self._handler(raw)
+
+            # End of the stream, send an extra StopIteration message.
+            await self._handler(StopIteration().encode())
+        except BaseError as exc:
+            # Send the error as a message.
+            await self._handler(exc.encode_message().encode())
+
+
+class WebSocket(Protocol):
+    """The server-side WebSocket interface (e.g. Starlette's WebSocket)."""
+
+    async def receive_text(self) -> str: ...
+
+    async def send_text(self, data: str) -> None: ...
+
+
+class WebSocketChannelBackend:
+    """A backend for the WebSocket-based channel.
+
+    This helper backend is typically used in conjunction with Starlette or
+    FastAPI on the server side. For example:
+
+    ```python
+    async def websocket_endpoint(websocket: WebSocket):
+        await websocket.accept()
+        await backend.serve(websocket)
+    ```
+    """
+
+    def __init__(self, channel: Channel):
+        self._channel: Channel = channel
+
+    async def start(self):
+        await self._channel.connect()
+
+    async def stop(self):
+        await self._channel.close()
+
+    async def serve(self, websocket: WebSocket) -> None:
+        """Serve the frames from the given WebSocket connection until it's closed.
+
+        Publishes that expect no reply are handled one by one in the order they
+        are received, to keep the order of the messages from the same client.
+        Other frames are handled concurrently.
+        """
+        # Mapping from frame ID to the task handling the frame.
+        tasks: dict[int, asyncio.Task] = {}
+        send_lock = asyncio.Lock()
+
+        async def send(frame: dict) -> None:
+            async with send_lock:
+                await websocket.send_text(json.dumps(frame))
+
+        try:
+            while True:
+                try:
+                    frame: dict = json.loads(await websocket.receive_text())
+                except Exception:
+                    # Disconnected from the client.
+                    break
+
+                id_: int = frame["id"]
+                if frame["op"] == OP_CLOSE:
+                    task = tasks.pop(id_, None)
+                    if task:
+                        task.cancel()
+                    continue
+
+                if frame["op"] == OP_PUBLISH and not frame.get("request", False):
+                    await self._handle(id_, frame, send)
+                    continue
+
+                task = asyncio.create_task(self._handle(id_, frame, send))
+                tasks[id_] = task
+                task.add_done_callback(lambda _, id_=id_: tasks.pop(id_, None))
+        finally:
+            for task in list(tasks.values()):
+                task.cancel()
+
+    async def _handle(
+        self, id_: int, frame: dict, send: Callable[[dict], Awaitable[None]]
+    ) -> None:
+        try:
+            match frame["op"]:
+                case "publish":
+                    await self._publish(id_, frame, send)
+                case "subscribe":
+                    await self._subscribe(id_, frame, send)
+                case "reply-topic":
+                    topic = await self._channel.new_reply_topic()
+                    await send(dict(id=id_, op=OP_RESULT, reply_topic=topic))
+        except BaseError as exc:
+            await send(dict(id=id_, op=OP_ERROR, error=exc.encode(mode="json")))
+        except Exception as exc:
+            # Not expected, just log it.
+            logger.exception(f"Failed to handle frame {frame['op']}: {exc}")
+
+    async def _publish(
+        self, id_: int, frame: dict, send: Callable[[dict], Awaitable[None]]
+    ) -> None:
+        addr = Address.decode(frame["addr"])
+        msg = RawMessage.decode(frame["msg"])
+
+        if frame.get("stream", False):
+            msgs: AsyncIterator[RawMessage] = await self._channel.publish(
+                addr, msg, stream=True, probe=frame.get("probe", True)
+            )
+            async for raw in msgs:
+                await send(dict(id=id_, op=OP_MESSAGE, msg=raw.encode(mode="json")))
+            await send(dict(id=id_, op=OP_END))
+            return
+
+        request: bool = frame.get("request", False)
+        resp: RawMessage | None = await self._channel.publish(
+            addr,
+            msg,
+            request=request,
+            reply=frame.get("reply", ""),
+            timeout=frame.get("timeout", 0.5),
+            probe=frame.get("probe", True),
+        )
+        if request:
+            # Other publishes are not acknowledged.
+            await send(
+                dict(
+                    id=id_,
+                    op=OP_RESULT,
+                    msg=resp.encode(mode="json") if resp else None,
+                )
+            )
+
+    async def _subscribe(
+        self, id_: int, frame: dict, send: Callable[[dict], Awaitable[None]]
+    ) -> None:
+        msg_queue: QueueSubscriptionIterator = QueueSubscriptionIterator()
+        sub = await self._channel.subscribe(
+            Address.decode(frame["addr"]),
+            handler=msg_queue.receive,
+            queue=frame.get("queue", ""),
+        )
+        try:
+            await send(dict(id=id_, op=OP_RESULT))
+            async for raw in msg_queue:
+                await send(dict(id=id_, op=OP_MESSAGE, msg=raw.encode(mode="json")))
+        finally:
+            await sub.unsubscribe()
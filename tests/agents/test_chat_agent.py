@@ -98,6 +98,14 @@ class MCPServerTestChannel(NopChannel):
 
 
 class TestChatAgent:
+    def test_agent_options(self):
+        agent = ChatAgent(
+            timeout=10, max_concurrency=4, ordered=True, coalesce_window=0.5
+        )
+        assert agent._max_concurrency == 4
+        assert agent._ordered is True
+        assert agent.replier._coalesce_window == 0.5
+
     @pytest.mark.skipif(sys.platform == "win32", reason="Does not run on Windows.")
     @pytest.mark.asyncio
     async def test_get_mcp_tools(self):
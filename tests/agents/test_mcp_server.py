@@ -1,3 +1,4 @@
+import asyncio
 import sys
 
 import pytest
@@ -53,6 +54,33 @@ class TestMCPServer:
             "[Errno 2] No such file or directory: 'pythonx'"
         )
 
+    @pytest.mark.skipif(sys.platform == "win32", reason="Does not run on Windows.")
+    @pytest.mark.asyncio
+    async def test_list_tools_while_connecting(self):
+        agent = MCPServer()
+        ctx = Context()
+
+        connect = asyncio.create_task(
+            agent.connect(
+                Connect(
+                    transport="stdio",
+                    params=MCPServerStdioParams(
+                        command="python",
+                        args=["tests/agents/example_mcp_server.py"],
+                    ),
+                ),
+                ctx,
+            )
+        )
+        await asyncio.sleep(0)
+
+        # Wait for the connection in progress, instead of failing.
+        result = await agent.list_tools(ListTools(), ctx)
+        assert len(result.tools) == 2
+        await connect
+
+        await agent.stopped()
+
     @pytest.mark.skipif(sys.platform == "win32", reason="Does not run on Windows.")
     @pytest.mark.asyncio
     async def test_list_tools(self):
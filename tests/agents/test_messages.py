@@ -117,3 +117,27 @@ class TestStructuredOutput:
         assert (
             "Input should be a valid dictionary or instance of ChatHistory" in exc_value
         )
+
+
+class TestChatMessage:
+    def test_accumulator(self):
+        first = ChatMessage(role="assistant", content="a", reasoning_content="x")
+        accumulator = first.accumulator()
+        accumulator.add(ChatMessage(role="assistant", content="b"))
+        accumulator.add(ChatMessage(role="assistant", reasoning_content="y"))
+
+        result = accumulator.result()
+        assert result.content == "ab"
+        assert result.reasoning_content == "xy"
+        # The first message is left untouched.
+        assert first.content == "a"
+
+        with pytest.raises(TypeError):
+            accumulator.add(ChatHistory(messages=[]))
+
+    def test_can_add(self):
+        accumulator = ChatMessage(role="assistant", sender="a").accumulator()
+        assert accumulator.can_add(ChatMessage(role="assistant", sender="a"))
+        assert not accumulator.can_add(ChatMessage(role="assistant", sender="b"))
+        assert not accumulator.can_add(ChatMessage(role="user", sender="a"))
+        assert not accumulator.can_add(ChatHistory(messages=[]))
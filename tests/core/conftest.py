@@ -1,6 +1,7 @@
 import asyncio
 import functools
 import inspect
+import os
 
 import pytest
 
@@ -10,6 +11,22 @@ from coagent.core.runtime import NopChannel
 from coagent.runtimes.local_runtime import LocalChannel
 
 
+def pytest_configure(config):
+    config.addinivalue_line(
+        "markers",
+        "timing: wall-clock sensitive tests, which only run if COAGENT_TIMING_TESTS=1",
+    )
+
+
+def pytest_collection_modifyitems(config, items):
+    if os.getenv("COAGENT_TIMING_TESTS") == "1":
+        return
+    skip = pytest.mark.skip(reason="set COAGENT_TIMING_TESTS=1 to run")
+    for item in items:
+        if "timing" in item.keywords:
+            item.add_marker(skip)
+
+
 @pytest.fixture
 def nop_channel() -> NopChannel:
     return NopChannel()
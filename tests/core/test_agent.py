@@ -3,10 +3,17 @@ from typing import AsyncIterator
 
 import pytest
 
-from coagent.core.types import Address, Agent, Channel, RawMessage
+from coagent.core.types import (
+    Address,
+    Agent,
+    Channel,
+    OverflowPolicy,
+    RawMessage,
+    Reply as ReplyInfo,
+)
 from coagent.core.agent import BaseAgent, Context, handler
-from coagent.core.exceptions import BaseError
-from coagent.core.messages import Message
+from coagent.core.exceptions import BaseError, OverloadedError
+from coagent.core.messages import Message, Stopped
 
 
 class Query(Message):
@@ -43,6 +50,23 @@ class StreamAgent(BaseAgent):
             yield Reply()
 
 
+class Chunk(Message):
+    content: str = ""
+
+    def __add__(self, other: "Chunk") -> "Chunk":
+        return Chunk(content=self.content + other.content)
+
+
+class ChunkAgent(BaseAgent):
+    def __init__(self, coalesce_window: float = 0) -> None:
+        super().__init__(coalesce_window=coalesce_window)
+
+    @handler
+    async def handle(self, msg: Query, ctx: Context) -> AsyncIterator[Chunk]:
+        for content in ("a", "b", "c"):
+            yield Chunk(content=content)
+
+
 class _TestFactory:
     def __init__(self, channel: Channel, address: Address):
         self.channel = channel
@@ -117,6 +141,36 @@ class TestStreamAgent:
         async for chunk in result:
             assert chunk.header.type == "Reply"
 
+    @pytest.mark.asyncio
+    async def test_accumulate(self, local_channel, run_agent_in_task, yield_control):
+        agent = ChunkAgent()
+        addr = Address(name="test", id="4")
+        agent.init(local_channel, addr)
+
+        _task = run_agent_in_task(agent)
+        await yield_control()
+
+        # The chunks are accumulated into one message in non-streaming mode.
+        result = await local_channel.publish(
+            addr, Query().encode(), request=True, probe=False
+        )
+        assert Chunk.decode(result).content == "abc"
+
+    @pytest.mark.asyncio
+    async def test_coalesce(self, local_channel, run_agent_in_task, yield_control):
+        agent = ChunkAgent(coalesce_window=1)
+        addr = Address(name="test", id="5")
+        agent.init(local_channel, addr)
+
+        _task = run_agent_in_task(agent)
+        await yield_control()
+
+        # The chunks are coalesced into one message in streaming mode.
+        result = await local_channel.publish(
+            addr, Query().encode(), stream=True, probe=False
+        )
+        assert [Chunk.decode(raw).content async for raw in result] == ["abc"]
+
     @pytest.mark.asyncio
     async def test_cancel(self, local_channel, run_agent_in_task, yield_control):
         test_factory = _TestFactory(local_channel, Address(name="test_3"))
@@ -144,3 +198,278 @@ class TestStreamAgent:
             async for _chunk in result:
                 pass
         assert str(exc.value).endswith("asyncio.exceptions.CancelledError\n")
+
+
+class DelayedQuery(Message):
+    index: int
+    wait_s: float = 0
+
+
+class ConcurrentAgent(BaseAgent):
+    def __init__(self, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.handled: list[int] = []
+        self.is_started: bool = False
+        self.is_stopped: bool = False
+        self.running: int = 0
+        self.max_running: int = 0
+
+    async def started(self) -> None:
+        self.is_started = True
+
+    async def stopped(self) -> None:
+        self.is_stopped = True
+
+    @handler
+    async def handle(self, msg: DelayedQuery, ctx: Context) -> Reply:
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        await asyncio.sleep(msg.wait_s)
+        self.running -= 1
+        self.handled.append(msg.index)
+        return Reply()
+
+
+class LimitedAgent(BaseAgent):
+    def __init__(self, wait_s: float = 0) -> None:
+        super().__init__()
+        self.wait_s = wait_s
+        self.running = 0
+        self.max_running = 0
+
+    @handler(max_concurrency=2)
+    async def handle(self, msg: Query, ctx: Context) -> Reply:
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        await asyncio.sleep(self.wait_s)
+        self.running -= 1
+        return Reply()
+
+
+class TestConcurrentAgent:
+    @pytest.mark.asyncio
+    async def test_concurrent(self, local_channel, run_agent_in_task, yield_control):
+        agent = ConcurrentAgent(max_concurrency=4)
+        addr = Address(name="test", id="4")
+        agent.init(local_channel, addr)
+
+        _task = run_agent_in_task(agent)
+        await yield_control()
+
+        results = await asyncio.gather(
+            *[
+                local_channel.publish(
+                    addr,
+                    DelayedQuery(index=i, wait_s=0.1).encode(),
+                    request=True,
+                    probe=False,
+                )
+                for i in range(4)
+            ]
+        )
+
+        assert all(r.header.type == "Reply" for r in results)
+        assert agent.max_running == 4
+
+    @pytest.mark.asyncio
+    async def test_handler_max_concurrency(
+        self, local_channel, run_agent_in_task, yield_control
+    ):
+        agent = LimitedAgent(wait_s=0.05)
+        addr = Address(name="test", id="5")
+        agent.init(local_channel, addr)
+
+        _task = run_agent_in_task(agent)
+        await yield_control()
+
+        results = await asyncio.gather(
+            *[
+                local_channel.publish(addr, Query().encode(), request=True, probe=False)
+                for _ in range(4)
+            ]
+        )
+
+        assert all(r.header.type == "Reply" for r in results)
+        assert agent.max_running == 2
+
+    @pytest.mark.parametrize("ordered,want", [(False, [2, 1, 0]), (True, [0, 1, 2])])
+    @pytest.mark.asyncio
+    async def test_ordered(
+        self, local_channel, run_agent_in_task, yield_control, ordered, want
+    ):
+        agent = ConcurrentAgent(max_concurrency=4, ordered=ordered)
+        addr = Address(name="test", id=f"6_{ordered}")
+        agent.init(local_channel, addr)
+
+        _task = run_agent_in_task(agent)
+        await yield_control()
+
+        # Send messages, with decreasing latencies, to the same reply address.
+        inbox = await local_channel.new_reply_topic()
+        sub = await local_channel.subscribe(
+            Address(name=inbox), handler=lambda raw: asyncio.sleep(0)
+        )
+        for i in range(3):
+            await local_channel.publish(
+                addr,
+                DelayedQuery(index=i, wait_s=0.03 * (3 - i)).encode(),
+                request=True,
+                reply=inbox,
+                probe=False,
+            )
+
+        await asyncio.sleep(0.3)
+        await sub.unsubscribe()
+
+        assert agent.handled == want
+
+    @pytest.mark.asyncio
+    async def test_ordered_other_keys(
+        self, local_channel, run_agent_in_task, yield_control
+    ):
+        agent = ConcurrentAgent(max_concurrency=2, ordered=True)
+        addr = Address(name="test", id="6_keys")
+        agent.init(local_channel, addr)
+
+        _task = run_agent_in_task(agent)
+        await yield_control()
+
+        inboxes = [await local_channel.new_reply_topic() for _ in range(2)]
+        subs = [
+            await local_channel.subscribe(
+                Address(name=inbox), handler=lambda raw: asyncio.sleep(0)
+            )
+            for inbox in inboxes
+        ]
+        # Two messages to the first address, then one to the second address.
+        for i, (inbox, wait_s) in enumerate(
+            [(inboxes[0], 0.1), (inboxes[0], 0.1), (inboxes[1], 0.05)]
+        ):
+            await local_channel.publish(
+                addr,
+                DelayedQuery(index=i, wait_s=wait_s).encode(),
+                request=True,
+                reply=inbox,
+                probe=False,
+            )
+
+        await asyncio.sleep(0.3)
+        for sub in subs:
+            await sub.unsubscribe()
+
+        # The message waiting for its predecessor holds no slot, so the one
+        # to the second address is handled concurrently with the first one.
+        assert agent.handled == [2, 0, 1]
+        assert agent.max_running == 2
+
+
+class TestOverloadedAgent:
+    @pytest.mark.asyncio
+    async def test_reject(self, local_channel, run_agent_in_task, yield_control):
+        agent = ConcurrentAgent(queue_size=1, overflow_policy=OverflowPolicy.REJECT)
+        addr = Address(name="test", id="7")
+        agent.init(local_channel, addr)
+
+        _task = run_agent_in_task(agent)
+        await yield_control()
+
+        async def request(i: int) -> RawMessage:
+            return await local_channel.publish(
+                addr,
+                DelayedQuery(index=i, wait_s=0.05).encode(),
+                request=True,
+                probe=False,
+            )
+
+        # The first message is being handled, the second one is pending,
+        # and the third one will be rejected.
+        tasks = [asyncio.create_task(request(0))]
+        await asyncio.sleep(0.01)
+        tasks += [asyncio.create_task(request(i)) for i in range(1, 3)]
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+
+        assert results[0].header.type == "Reply"
+        assert results[1].header.type == "Reply"
+        assert isinstance(results[2], OverloadedError)
+        assert agent.handled == [0, 1]
+
+    @pytest.mark.asyncio
+    async def test_drop_oldest_cold_start(self, local_channel):
+        agent = ConcurrentAgent(
+            queue_size=1, overflow_policy=OverflowPolicy.DROP_OLDEST
+        )
+        addr = Address(name="test", id="8")
+        agent.init(local_channel, addr)
+
+        replies: asyncio.Queue[RawMessage] = asyncio.Queue()
+        inbox = await local_channel.new_reply_topic()
+        sub = await local_channel.subscribe(Address(name=inbox), handler=replies.put)
+
+        # Deliver the first message directly right after starting, as the
+        # factory does on a cold start, before the Started message is handled.
+        await agent.start()
+        raw = DelayedQuery(index=0).encode()
+        raw.reply = ReplyInfo(address=Address(name=inbox))
+        await agent.receive(raw)
+
+        result = await asyncio.wait_for(replies.get(), 1)
+        await sub.unsubscribe()
+        await agent.stop()
+
+        # The Started message is never dropped.
+        assert result.header.type == "Reply"
+        assert agent.is_started
+        assert agent.handled == [0]
+
+    @pytest.mark.asyncio
+    async def test_block_lifecycle(self, local_channel):
+        agent = ConcurrentAgent(queue_size=1)
+        addr = Address(name="test", id="9")
+        agent.init(local_channel, addr)
+        await agent.start()
+
+        # The first message is being handled, and the second one is pending.
+        await agent.receive(DelayedQuery(index=0, wait_s=0.1).encode())
+        await asyncio.sleep(0.01)
+        await agent.receive(DelayedQuery(index=1).encode())
+
+        # Neither the third message nor the Stopped message blocks the
+        # receiving while the queue is full.
+        await asyncio.wait_for(agent.receive(DelayedQuery(index=2).encode()), 0.05)
+        await asyncio.wait_for(agent.receive(Stopped().encode()), 0.05)
+        assert agent.queue_depth == 2
+
+        await asyncio.sleep(0.2)
+        await agent.stop()
+
+        assert agent.is_stopped
+        assert agent.handled == [0, 1, 2]
+
+
+class TestHandlerTable:
+    def test_shared_by_instances(self):
+        agent1 = TrivialAgent()
+        agent2 = TrivialAgent()
+        assert agent1._handlers is agent2._handlers
+        assert agent1._message_types is agent2._message_types
+
+        assert set(agent1._handlers) == {Query}
+        assert agent1._message_types["Query"] is Query
+        assert agent1._message_types["Reply"] is Reply
+        assert agent1._message_types["Started"]
+
+        with pytest.raises(TypeError):
+            agent1._handlers[Reply] = TrivialAgent.handle
+
+    def test_not_inherited(self):
+        class SubAgent(TrivialAgent):
+            @handler
+            async def handle_reply(self, msg: Reply, ctx: Context) -> None:
+                pass
+
+        # Build the table of the superclass first.
+        _ = TrivialAgent()
+
+        agent = SubAgent()
+        assert set(agent._handlers) == {Query, Reply}
+        assert set(TrivialAgent()._handlers) == {Query}
@@ -0,0 +1,344 @@
+"""Micro-benchmarks for hot paths.
+
+These benchmarks are kept small, but they depend on the wall-clock time,
+so they only run if opted in. Run
+`COAGENT_TIMING_TESTS=1 pytest tests/core/test_benchmark.py -s` to see the numbers.
+"""
+
+import asyncio
+import json
+import time
+import timeit
+
+import blinker
+from openai.types.responses import ResponseOutputMessage, ResponseOutputText
+import pydantic
+import pytest
+
+from coagent.agents.messages import ChatHistory, ChatMessage
+from coagent.agents.react_agent.messages import OutputMessage
+from coagent.agents.react_agent.types import MessageOutputItem
+from coagent.core.agent import BaseAgent, Context, handler
+from coagent.core.exceptions import BaseError
+from coagent.core.messages import coalesce, Error, Message, StopIteration
+from coagent.core.runtime import raise_if_error
+from coagent.core.types import Address, MessageHeader, RawMessage
+from coagent.core.util import NamespaceIndex, Trie
+from coagent.runtimes.local_runtime import LocalRouter
+
+pytestmark = pytest.mark.timing
+
+
+class Query(Message):
+    pass
+
+
+class Reply(Message):
+    pass
+
+
+class ChatText(Message):
+    role: str
+    content: str
+
+
+class BenchAgent(BaseAgent):
+    @handler
+    async def handle(self, msg: Query, ctx: Context) -> Reply:
+        return Reply()
+
+
+def bench(func, number: int) -> float:
+    """Return the best average time (in microseconds) per call of `func`."""
+    timer = timeit.Timer(func)
+    return min(timer.repeat(repeat=3, number=number)) / number * 1e6
+
+
+def test_agent_construction():
+    number = 2000
+
+    # Build the handler table on every construction, as it used to be.
+    def construct_uncached():
+        table = BenchAgent._BaseAgent__build_handler_table()
+        BenchAgent._handler_table = table
+        return BenchAgent()
+
+    uncached = bench(construct_uncached, number)
+    cached = bench(BenchAgent, number)
+
+    print(f"\nAgent construction: {uncached:.2f}us (uncached), {cached:.2f}us (cached)")
+    assert cached < uncached
+
+
+@pytest.mark.parametrize("size", [10_000, 100_000])
+def test_namespace_index(size: int):
+    # Register per-tenant agent types, e.g. "tenant0.agent0".
+    tenants = size // 100
+    trie = Trie(separator=".")
+    index = NamespaceIndex(separator=".")
+    for i in range(tenants):
+        for j in range(100):
+            trie[f"tenant{i}.agent{j}"] = index[f"tenant{i}.agent{j}"] = j
+
+    prefix = f"tenant{tenants // 2}"
+    assert index.direct_values(prefix) == trie.direct_values(prefix)[1:]
+
+    full_walk = bench(lambda: trie.direct_values(prefix), 1)
+    indexed = bench(lambda: index.direct_values(prefix), 100)
+
+    print(
+        f"\nDirect children among {size} agent types: "
+        f"{full_walk:.2f}us (trie), {indexed:.2f}us (index)"
+    )
+    assert indexed < full_walk
+
+
+def test_local_router_throughput():
+    number = 20_000
+    topics = [f"coagent.agent.test.{i}" for i in range(1000)]
+    raw = Query().encode()
+
+    async def receive(sender, raw):
+        pass
+
+    class Receiver:
+        async def receive(self, raw):
+            pass
+
+    async def run_blinker():
+        # Resolve the signal from the process-global registry on each
+        # publish, as LocalChannel used to do.
+        for topic in topics:
+            blinker.signal(topic).connect(receive, weak=False)
+        start = time.perf_counter()
+        for i in range(number):
+            await blinker.signal(topics[i % len(topics)]).send_async(None, raw=raw)
+        elapsed = time.perf_counter() - start
+        for topic in topics:
+            blinker.signal(topic).disconnect(receive)
+        return elapsed
+
+    async def run_router():
+        router = LocalRouter()
+        for topic in topics:
+            router.add(topic, Receiver())
+        start = time.perf_counter()
+        for i in range(number):
+            await router.publish(topics[i % len(topics)], raw)
+        return time.perf_counter() - start
+
+    blinker_rate = number / min(asyncio.run(run_blinker()) for _ in range(3))
+    router_rate = number / min(asyncio.run(run_router()) for _ in range(3))
+
+    print(
+        f"\nLocal dispatch: {blinker_rate:.0f} msg/s (blinker), "
+        f"{router_rate:.0f} msg/s (router)"
+    )
+    assert router_rate > blinker_rate
+
+
+def test_direct_dispatch():
+    number = 2000
+    msg = ChatText(role="user", content="hello " * 100)
+
+    def serialize():
+        raw = msg.encode()
+        return ChatText.decode(raw)
+
+    def hand_over():
+        raw = msg.encode(lazy=True)
+        return ChatText.decode(raw)
+
+    serialized = bench(serialize, number)
+    direct = bench(hand_over, number)
+
+    print(
+        f"\nMessage dispatch: {serialized:.2f}us (serialized), {direct:.2f}us (direct)"
+    )
+    assert direct < serialized
+
+
+def _chat_message() -> ChatMessage:
+    return ChatMessage(role="user", content="hello " * 100)
+
+
+def _chat_history() -> ChatHistory:
+    return ChatHistory(messages=[_chat_message() for _ in range(20)])
+
+
+def _output_message() -> OutputMessage:
+    text = ResponseOutputText(type="output_text", text="hello " * 100, annotations=[])
+    item = ResponseOutputMessage(
+        id="msg_0", role="assistant", status="completed", type="message", content=[text]
+    )
+    return OutputMessage(item=MessageOutputItem(raw_item=item))
+
+
+# Encoding costs about the same as before, since the header and the raw message
+# are built either way, so the gain comes from decoding. OutputMessage gains
+# nothing, as its cost is dominated by the union validation itself.
+@pytest.mark.parametrize(
+    "factory,faster",
+    [(_chat_message, True), (_chat_history, True), (_output_message, False)],
+)
+def test_message_codec(factory, faster: bool):
+    number = 500
+    msg = factory()
+    msg_type = type(msg)
+
+    # Encode and decode via the intermediate str and dict, as it used to be.
+    def encode_old():
+        content = msg.model_dump_json(
+            exclude={"reply", "extensions"}, exclude_defaults=True, by_alias=True
+        )
+        return RawMessage(
+            header=MessageHeader(type=msg_type.__name__, extensions=msg.extensions),
+            content=content.encode("utf-8"),
+        )
+
+    def decode_old():
+        data = {"reply": raw.reply, "extensions": raw.header.extensions}
+        data.update(json.loads(raw.content.decode("utf-8")))
+        return msg_type.model_validate(data)
+
+    raw = msg.encode()
+    assert raw == encode_old()
+    assert msg_type.decode(raw) == decode_old() == msg
+
+    encode_old_us = bench(encode_old, number)
+    encode_new_us = bench(msg.encode, number)
+    decode_old_us = bench(decode_old, number)
+    decode_new_us = bench(lambda: msg_type.decode(raw), number)
+
+    print(
+        f"\n{msg_type.__name__} codec: "
+        f"encode {encode_old_us:.2f}us (old), {encode_new_us:.2f}us (new); "
+        f"decode {decode_old_us:.2f}us (old), {decode_new_us:.2f}us (new)"
+    )
+    if faster:
+        old_us = encode_old_us + decode_old_us
+        new_us = encode_new_us + decode_new_us
+        assert new_us < old_us
+
+
+def test_reply_classification():
+    number = 2000
+    raw = ChatMessage(role="assistant", content="token").encode()
+
+    # Classify a streamed chunk by trial decoding, as it used to be.
+    def classify_old():
+        try:
+            StopIteration.decode(raw)
+            return None
+        except pydantic.ValidationError:
+            try:
+                err = Error.decode(raw)
+                raise BaseError.decode_message(err)
+            except pydantic.ValidationError:
+                return raw
+
+    def classify_new():
+        if raw.header.type == "StopIteration":
+            return None
+        raise_if_error(raw)
+        return raw
+
+    assert classify_old() is classify_new() is raw
+
+    old = bench(classify_old, number)
+    new = bench(classify_new, number)
+
+    print(f"\nReply classification: {old:.2f}us (trial decoding), {new:.2f}us (header)")
+    assert new < old
+
+
+def test_chat_message_accumulation():
+    number = 5
+    tokens = [ChatMessage(role="assistant", content="token ") for _ in range(5000)]
+
+    # Concatenate the tokens one by one, as it used to be.
+    def accumulate_old():
+        accumulated = tokens[0].model_copy()
+        for token in tokens[1:]:
+            accumulated += token
+        return accumulated
+
+    def accumulate_new():
+        accumulator = tokens[0].accumulator()
+        for token in tokens[1:]:
+            accumulator.add(token)
+        return accumulator.result()
+
+    assert accumulate_old().content == accumulate_new().content
+
+    old = bench(accumulate_old, number)
+    new = bench(accumulate_new, number)
+
+    print(
+        f"\nAccumulating {len(tokens)} tokens: "
+        f"{old:.2f}us (concatenation), {new:.2f}us (accumulator)"
+    )
+    assert new < old
+
+
+class PydanticAddress(pydantic.BaseModel):
+    """The former pydantic-based Address, whose topic is rebuilt on access."""
+
+    name: str
+    id: str = ""
+
+    def __hash__(self):
+        return hash(self.topic)
+
+    def __eq__(self, other):
+        return self.topic == other.topic
+
+    @property
+    def topic(self) -> str:
+        return f"coagent.agent.{self.name}.{self.id}"
+
+
+def test_address_routing():
+    number = 20_000
+    size = 1000
+
+    old_agents = {PydanticAddress(name="test", id=str(i)): i for i in range(size)}
+    new_agents = {Address(name="test", id=str(i)): i for i in range(size)}
+    old_addrs = list(old_agents)
+    new_addrs = [Address.from_topic(addr.topic) for addr in new_agents]
+
+    # Look up agents by address, and get their topics to publish to.
+    def route_old():
+        for addr in old_addrs:
+            old_agents[addr], addr.topic
+
+    def route_new():
+        for addr in new_addrs:
+            new_agents[addr], addr.topic
+
+    old = bench(route_old, number // size)
+    new = bench(route_new, number // size)
+
+    print(f"\nRouting {size} addresses: {old:.2f}us (pydantic), {new:.2f}us (slotted)")
+    assert new < old
+
+
+def test_stream_coalescing():
+    number = 1000
+
+    async def deltas():
+        for _ in range(number):
+            # One token delta at a time, as streamed from an LLM.
+            await asyncio.sleep(0)
+            yield ChatMessage(role="assistant", content="hello ")
+
+    async def run() -> list[ChatMessage]:
+        return [msg async for msg in coalesce(deltas(), window=0.01, max_size=50)]
+
+    start = time.perf_counter()
+    msgs = asyncio.run(run())
+    elapsed = (time.perf_counter() - start) * 1e3
+
+    print(f"\nStream coalescing: {number} -> {len(msgs)} messages in {elapsed:.2f}ms")
+    assert len(msgs) <= number // 10
+    assert "".join(msg.content for msg in msgs) == "hello " * number
@@ -0,0 +1,115 @@
+import json
+from typing import Any, Type
+
+from pydantic import BaseModel, ValidationError
+import pytest
+
+from coagent.core import Address, AgentSpec, BaseAgent, Context, handler, Message, new
+from coagent.core.exceptions import MessageDecodeError
+from coagent.core.codecs import APPLICATION_MSGPACK, Codec, register_codec
+from coagent.core.factory import CreateAgent
+from coagent.core.types import RawMessage
+from coagent.runtimes.local_runtime import LocalRuntime
+
+
+class ReversedJSONCodec(Codec):
+    """A toy binary codec, which stores the reversed JSON bytes."""
+
+    content_type = "application/x-reversed-json"
+    binary = True
+
+    def encode(self, msg: BaseModel, exclude: Any, exclude_defaults: bool) -> bytes:
+        data = msg.model_dump_json(exclude=exclude, exclude_defaults=exclude_defaults)
+        return data.encode("utf-8")[::-1] + b"\xff"
+
+    def decode(self, msg_type: Type[BaseModel], content: bytes) -> BaseModel:
+        return msg_type.model_validate_json(content[:-1][::-1])
+
+
+register_codec(ReversedJSONCodec())
+
+
+class Text(Message):
+    content: str = ""
+
+
+class EchoAgent(BaseAgent):
+    @handler
+    async def handle(self, msg: Text, ctx: Context) -> Text:
+        return Text(content=msg.content)
+
+
+class TestCodecs:
+    def test_unknown_content_type(self):
+        with pytest.raises(ValidationError):
+            Text(content="hello").encode(content_type="application/unknown")
+
+        raw = Text(content="hello").encode()
+        raw.header.content_type = "application/unknown"
+        with pytest.raises(ValidationError):
+            Text.decode(raw)
+
+    def test_binary_content(self):
+        msg = Text(content="hello", extensions={"k": "v"})
+        raw = msg.encode(content_type=ReversedJSONCodec.content_type)
+        assert raw.content.endswith(b"\xff")
+        assert Text.decode(raw) == msg
+
+        # Binary content is encoded in base64 within JSON.
+        data = json.loads(raw.encode_json())
+        assert RawMessage.decode_json(raw.encode_json()) == raw
+        assert RawMessage.decode(data) == raw
+
+        # Also for nested raw messages.
+        create_msg = CreateAgent(session_id="0", raw=raw).encode()
+        assert CreateAgent.decode(create_msg).raw == raw
+
+    def test_msgpack(self):
+        pytest.importorskip("msgpack")
+
+        msg = Text(content="hello")
+        raw = msg.encode(content_type=APPLICATION_MSGPACK)
+        assert Text.decode(raw) == msg
+        assert RawMessage.decode_json(raw.encode_json()) == raw
+
+    def test_undecodable_content(self):
+        # Either msgpack is missing, or the content is malformed.
+        raw = Text(content="hello").encode()
+        raw.header.content_type = APPLICATION_MSGPACK
+        raw.content = b"\xc1"
+        with pytest.raises(ValidationError):
+            Text.decode(raw)
+
+    @pytest.mark.asyncio
+    async def test_receive_after_undecodable(self):
+        async with LocalRuntime() as runtime:
+            await runtime.register(AgentSpec("echo", new(EchoAgent)))
+            addr = Address(name="echo", id="0")
+
+            raw = Text(content="hello").encode()
+            result = await runtime.channel.publish(addr, raw, request=True, timeout=1)
+            assert Text.decode(result).content == "hello"
+
+            # The undecodable message is rejected.
+            raw.header.content_type = APPLICATION_MSGPACK
+            raw.content = b"\xc1"
+            with pytest.raises(MessageDecodeError):
+                await runtime.channel.publish(addr, raw, request=True, timeout=1)
+
+            # The agent keeps receiving messages.
+            raw = Text(content="world").encode()
+            result = await runtime.channel.publish(addr, raw, request=True, timeout=1)
+            assert Text.decode(result).content == "world"
+
+    @pytest.mark.asyncio
+    async def test_reply_in_request_format(self):
+        async with LocalRuntime() as runtime:
+            await runtime.register(AgentSpec("echo", new(EchoAgent)))
+            addr = Address(name="echo", id="0")
+
+            raw = Text(content="hello").encode(
+                content_type=ReversedJSONCodec.content_type
+            )
+            result = await runtime.channel.publish(addr, raw, request=True, timeout=1)
+            assert result.header.content_type == ReversedJSONCodec.content_type
+            assert Text.decode(result).content == "hello"
@@ -0,0 +1,53 @@
+from pydantic import ValidationError
+import pytest
+
+from coagent.core.compression import compress_message, decompress_content
+from coagent.core.messages import GenericMessage, Message
+from coagent.core.types import RawMessage
+
+
+class Text(Message):
+    content: str = ""
+
+
+class TestCompression:
+    def test_compress_message(self):
+        raw = Text(content="hello " * 1000).encode()
+
+        # Below the threshold.
+        assert compress_message(raw, "zlib", len(raw.content) + 1) is raw
+        # No compression.
+        assert compress_message(raw, "", 0) is raw
+
+        compressed = compress_message(raw, "zlib", 1024)
+        assert compressed.header.content_encoding == "zlib"
+        assert len(compressed.content) < len(raw.content)
+        assert decompress_content(compressed) == raw.content
+        # The original message is left untouched.
+        assert raw.header.content_encoding == ""
+
+        # Already compressed.
+        assert compress_message(compressed, "zlib", 0) is compressed
+
+    def test_decode(self):
+        msg = Text(content="hello " * 1000)
+        raw = compress_message(msg.encode(), "zlib", 1024)
+
+        # Compressed content is encoded in base64 within JSON.
+        assert RawMessage.decode_json(raw.encode_json()) == raw
+        assert RawMessage.decode(raw.encode(mode="json")) == raw
+
+        # Decompressed only when decoded.
+        assert Text.decode(raw) == msg
+        assert GenericMessage.decode(raw).encode() is raw
+
+    def test_decode_invalid(self):
+        raw = Text(content="hello").encode()
+        raw.header.content_encoding = "zlib"
+        with pytest.raises(ValidationError):
+            Text.decode(raw)
+
+    def test_unsupported(self):
+        raw = Text(content="hello " * 1000).encode()
+        with pytest.raises(ValueError):
+            compress_message(raw, "unknown", 0)
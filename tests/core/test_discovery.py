@@ -1,6 +1,18 @@
-from coagent.core.discovery import DiscoveryBatchQuery, DiscoveryQuery, DiscoveryServer
+import asyncio
+import time
+
+from coagent.core.discovery import (
+    DiscoveryBatchQuery,
+    DiscoveryBatchReply,
+    DiscoveryCache,
+    DiscoveryQuery,
+    DiscoveryReply,
+    DiscoveryServer,
+    _SubscriptionIndex,
+)
 from coagent.core.types import AgentSpec, Address, new
 from coagent.core.agent import BaseAgent, Context
+from coagent.runtimes.local_runtime import LocalRuntime
 
 import pytest
 
@@ -28,6 +40,61 @@ class TestDiscoveryQuery:
         query = DiscoveryQuery(namespace="test", recursive=True)
         assert query.matches("test.a.b") is True
 
+        # Names sharing the same prefix are not under the namespace.
+        assert query.matches("testing") is False
+        assert query.matches("testing.a") is False
+
+    def test_covers(self):
+        query = DiscoveryQuery(namespace="", recursive=True, inclusive=True)
+        assert query.covers(DiscoveryQuery(namespace="")) is True
+        assert query.covers(DiscoveryQuery(namespace="a", recursive=True)) is True
+
+        query = DiscoveryQuery(namespace="a")
+        assert query.covers(DiscoveryQuery(namespace="a")) is True
+        assert query.covers(DiscoveryQuery(namespace="a", inclusive=True)) is False
+        assert query.covers(DiscoveryQuery(namespace="a", recursive=True)) is False
+        assert query.covers(DiscoveryQuery(namespace="a.x")) is False
+
+        query = DiscoveryQuery(namespace="a", recursive=True)
+        assert query.covers(DiscoveryQuery(namespace="a.x", inclusive=True)) is True
+        assert query.covers(DiscoveryQuery(namespace="ab")) is False
+        assert query.covers(DiscoveryQuery(namespace="")) is False
+
+
+class TestSubscriptionIndex:
+    def test_match(self):
+        queries = {
+            Address(name="s", id="0"): [DiscoveryQuery(namespace="")],
+            Address(name="s", id="1"): [DiscoveryQuery(namespace="", recursive=True)],
+            Address(name="s", id="2"): [
+                DiscoveryQuery(namespace="a", inclusive=True),
+                DiscoveryQuery(namespace="b", recursive=True),
+            ],
+            Address(name="s", id="3"): [DiscoveryQuery(namespace="a.x")],
+        }
+        index = _SubscriptionIndex()
+        for addr, qs in queries.items():
+            index.add(addr, qs)
+
+        # The index agrees with matching each query one by one.
+        for name in ["a", "a.x", "a.x.0", "ab", "b", "b.x", "b.x.0", "c.x"]:
+            expected = [
+                addr for addr, qs in queries.items() if any(q.matches(name) for q in qs)
+            ]
+            assert index.match(name) == expected, name
+
+        index.remove(Address(name="s", id="2"))
+        assert len(index) == 3
+        assert index.match("b.x.0") == [Address(name="s", id="1")]
+
+        # Re-subscribing replaces the previous queries.
+        index.add(Address(name="s", id="3"), [DiscoveryQuery(namespace="c")])
+        assert index.match("a.x.0") == [Address(name="s", id="1")]
+        assert index.match("c.x") == [
+            Address(name="s", id="1"),
+            Address(name="s", id="3"),
+        ]
+
 
 class MockAgent(BaseAgent):
     pass
@@ -140,3 +207,164 @@ class TestDiscoveryServer:
             ["a.x", "a.y"],
             ["b.x", "b.y"],
         ]
+
+
+class TestDiscovery:
+    @pytest.mark.timing
+    @pytest.mark.asyncio
+    async def test_batch_discover(self):
+        async with LocalRuntime() as runtime:
+            await runtime.register(AgentSpec(name="a.x", constructor=new(MockAgent)))
+            await runtime.register(AgentSpec(name="a.y", constructor=new(MockAgent)))
+
+            query = DiscoveryBatchQuery(queries=[DiscoveryQuery(namespace="a")])
+            start = time.perf_counter()
+            result = await runtime.channel.publish(
+                Address(name="discovery"), query.encode(), request=True, probe=False
+            )
+            elapsed = time.perf_counter() - start
+
+            batch_reply = DiscoveryBatchReply.decode(result)
+            assert [[a.name for a in r.agents] for r in batch_reply.replies] == [
+                ["a.x", "a.y"],
+            ]
+            # Return as soon as all discovery servers have replied.
+            assert elapsed < 0.1
+
+    @pytest.mark.asyncio
+    async def test_discover_unresponsive_server(self):
+        async with LocalRuntime() as runtime:
+            discovery = runtime._discovery
+            discovery._server.add_member("unresponsive")
+
+            query = DiscoveryQuery(namespace="")
+            start = time.perf_counter()
+            result = await runtime.channel.publish(
+                Address(name="discovery"),
+                query.encode(),
+                request=True,
+                timeout=0.2,
+                probe=False,
+            )
+            elapsed = time.perf_counter() - start
+
+            assert DiscoveryReply.decode(result).agents == []
+            # Wait until the deadline derived from the request timeout, which
+            # is before the request times out (or it would have failed).
+            assert elapsed > 0.15
+            # The unresponsive server is considered gone.
+            assert "unresponsive" not in discovery._server.members
+
+
+class TestDiscoveryCache:
+    @pytest.mark.asyncio
+    async def test_discover(self):
+        async with LocalRuntime() as runtime:
+            await runtime.register(AgentSpec(name="a.x", constructor=new(MockAgent)))
+
+            cache = DiscoveryCache(runtime.channel)
+            reply = await cache.discover(DiscoveryQuery(namespace="a"))
+            assert [a.name for a in reply.agents] == ["a.x"]
+
+            # The cache is kept up-to-date.
+            await runtime.register(AgentSpec(name="a.y", constructor=new(MockAgent)))
+            await runtime.register(AgentSpec(name="b", constructor=new(MockAgent)))
+            await runtime.deregister("a.x")
+
+            await asyncio.sleep(0.01)
+
+            # No network round-trip is needed any more.
+            cache._request = None
+            reply = await cache.discover(DiscoveryQuery(namespace="a"))
+            assert [a.name for a in reply.agents] == ["a.y"]
+            reply = await cache.discover(DiscoveryQuery(namespace=""))
+            assert [a.name for a in reply.agents] == ["b"]
+
+            await cache.stop()
+
+    @pytest.mark.asyncio
+    async def test_discover_miss(self):
+        async with LocalRuntime() as runtime:
+            await runtime.register(AgentSpec(name="a.x", constructor=new(MockAgent)))
+            await runtime.register(AgentSpec(name="b.x", constructor=new(MockAgent)))
+
+            cache = DiscoveryCache(runtime.channel, [DiscoveryQuery(namespace="a")])
+            batch_reply = await cache.batch_discover(
+                DiscoveryBatchQuery(
+                    queries=[
+                        DiscoveryQuery(namespace="a"),  # hit
+                        DiscoveryQuery(namespace="b"),  # miss
+                        DiscoveryQuery(namespace="a", detailed=True),  # miss
+                    ]
+                )
+            )
+            assert [[a.name for a in r.agents] for r in batch_reply.replies] == [
+                ["a.x"],
+                ["b.x"],
+                ["a.x"],
+            ]
+
+            await cache.stop()
+
+    @pytest.mark.asyncio
+    async def test_update_during_loading(self):
+        async with LocalRuntime() as runtime:
+            await runtime.register(AgentSpec(name="a.x", constructor=new(MockAgent)))
+
+            cache = DiscoveryCache(runtime.channel)
+            request = cache._request
+
+            async def load(msg, timeout=0.5):
+                reply = await request(msg, timeout)
+                # The agent is deregistered after the snapshot is taken.
+                await runtime.deregister("a.x")
+                await asyncio.sleep(0.01)
+                return reply
+
+            cache._request = load
+            reply = await cache.discover(DiscoveryQuery(namespace="a"))
+            assert reply.agents == []
+
+            await cache.stop()
+
+    @pytest.mark.asyncio
+    async def test_shared(self):
+        runtime = LocalRuntime()
+        await runtime.start()
+
+        cache = runtime.channel.discovery_cache
+        assert cache is runtime.channel.discovery_cache
+        await cache.start()
+        assert cache.started
+
+        # The shared cache is stopped along with the runtime.
+        await runtime.stop()
+        assert not cache.started
+
+    @pytest.mark.asyncio
+    async def test_expire_unresponsive_server(self):
+        async with LocalRuntime() as runtime:
+            await runtime.register(AgentSpec(name="a.x", constructor=new(MockAgent)))
+
+            # Another discovery server, as if on another node.
+            server = DiscoveryServer()
+            server.init(runtime.channel, Address(name="discovery.server"))
+            await server.start()
+            await server.register(AgentSpec(name="b.x", constructor=new(MockAgent)))
+
+            cache = DiscoveryCache(runtime.channel, ttl=0.2)
+            query = DiscoveryQuery(namespace="", recursive=True)
+            reply = await cache.discover(query)
+            assert [a.name for a in reply.agents] == ["a.x", "b.x"]
+
+            # The other server crashes, without deregistering its agents.
+            await server._sub.unsubscribe()
+            server._handle_data_task.cancel()
+
+            await asyncio.sleep(1)
+
+            # Only the agents of the alive server are kept.
+            reply = await cache.discover(query)
+            assert [a.name for a in reply.agents] == ["a.x"]
+
+            await cache.stop()
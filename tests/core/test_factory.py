@@ -0,0 +1,143 @@
+import asyncio
+from typing import AsyncIterator
+
+import pytest
+
+from coagent.core.agent import BaseAgent, Context, handler
+from coagent.core.exceptions import AgentTypeNotFoundError
+from coagent.core.factory import CreateAgent, DeleteAgent, Factory
+from coagent.core.messages import Message
+from coagent.core.types import Address, AgentSpec, new
+from coagent.runtimes import LocalRuntime
+
+
+class Ping(Message):
+    pass
+
+
+class ShortLivedAgent(BaseAgent):
+    def __init__(self, timeout: float) -> None:
+        super().__init__(timeout=timeout)
+
+    @handler
+    async def handle(self, msg: Ping, ctx: Context) -> None:
+        pass
+
+
+class TestFactory:
+    @pytest.mark.asyncio
+    async def test_recycle(self, local_channel):
+        spec = AgentSpec(
+            "test_recycle", new(ShortLivedAgent, timeout=0.1), recycle_interval=1
+        )
+        factory = Factory(spec)
+        factory.init(local_channel, Address(name=spec.name))
+        await factory.start()
+
+        try:
+            for session_id in ("0", "1"):
+                await factory.create_agent(
+                    CreateAgent(session_id=session_id), Context()
+                )
+            assert len(factory._agents) == 2
+
+            # Keep the agent 0 active.
+            active_addr = Address(name=spec.name, id="0")
+            for _ in range(4):
+                await asyncio.sleep(0.05)
+                await local_channel.publish(active_addr, Ping().encode(), probe=False)
+
+            # The agent 1 has been deleted soon after it expired, although
+            # the recycle interval is much longer.
+            assert list(factory._agents) == [active_addr]
+
+            await asyncio.sleep(0.2)
+            assert not factory._agents
+            assert not factory._expiry_heap
+        finally:
+            await factory.stop()
+
+    @pytest.mark.asyncio
+    async def test_recycle_deleted(self, local_channel, yield_control):
+        spec = AgentSpec(
+            "test_recycle_deleted",
+            new(ShortLivedAgent, timeout=0.05),
+            recycle_interval=1,
+        )
+        factory = Factory(spec)
+        factory.init(local_channel, Address(name=spec.name))
+        await factory.start()
+
+        try:
+            await factory.create_agent(CreateAgent(session_id="0"), Context())
+            await yield_control()
+            await factory.delete_agent(DeleteAgent(session_id="0"), Context())
+
+            # Re-create the agent with the same session ID.
+            await factory.create_agent(CreateAgent(session_id="0"), Context())
+            assert len(factory._expiry_heap) == 2
+
+            await asyncio.sleep(0.1)
+            assert not factory._agents
+            assert not factory._expiry_heap
+        finally:
+            await factory.stop()
+
+
+class Echo(Message):
+    content: str = ""
+
+
+class EchoAgent(BaseAgent):
+    def __init__(self) -> None:
+        super().__init__()
+        self.started_ = False
+
+    async def started(self) -> None:
+        self.started_ = True
+
+    @handler
+    async def handle(self, msg: Echo, ctx: Context) -> Echo:
+        # The `Started` message must be handled before the first message.
+        return Echo(content=f"{msg.content}, started={self.started_}")
+
+    @handler
+    async def handle_stream(self, msg: Ping, ctx: Context) -> AsyncIterator[Echo]:
+        for i in range(3):
+            yield Echo(content=str(i))
+
+
+class TestCreateAndDeliver:
+    @pytest.mark.asyncio
+    async def test_request(self):
+        async with LocalRuntime() as runtime:
+            await runtime.register(AgentSpec("echo", new(EchoAgent)))
+
+            addr = Address(name="echo", id="0")
+            result = await runtime.channel.publish(
+                addr, Echo(content="hi").encode(), request=True
+            )
+            assert Echo.decode(result).content == "hi, started=True"
+
+            # The agent has been created, send the message to it directly.
+            result = await runtime.channel.publish(
+                addr, Echo(content="hello").encode(), request=True
+            )
+            assert Echo.decode(result).content == "hello, started=True"
+
+    @pytest.mark.asyncio
+    async def test_stream(self):
+        async with LocalRuntime() as runtime:
+            await runtime.register(AgentSpec("echo", new(EchoAgent)))
+
+            addr = Address(name="echo", id="1")
+            result = await runtime.channel.publish(addr, Ping().encode(), stream=True)
+            chunks = [Echo.decode(chunk).content async for chunk in result]
+            assert chunks == ["0", "1", "2"]
+
+    @pytest.mark.asyncio
+    async def test_factory_not_found(self):
+        async with LocalRuntime() as runtime:
+            addr = Address(name="echo", id="2")
+            with pytest.raises(AgentTypeNotFoundError):
+                await runtime.channel.publish(addr, Echo().encode(), request=True)
@@ -0,0 +1,114 @@
+import asyncio
+import sys
+from typing import AsyncIterator
+
+import pytest
+
+from coagent.core.messages import coalesce, Message
+
+
+class Chunk(Message):
+    content: str = ""
+
+    def __add__(self, other: "Chunk") -> "Chunk":
+        return Chunk(content=self.content + other.content)
+
+
+class Done(Message):
+    pass
+
+
+async def stream(*items: Message | float) -> AsyncIterator[Message]:
+    for item in items:
+        if isinstance(item, float):
+            await asyncio.sleep(item)
+        else:
+            yield item
+
+
+def contents(msgs: list[Message]) -> list[str]:
+    return [msg.content if isinstance(msg, Chunk) else "<done>" for msg in msgs]
+
+
+class TestCoalesce:
+    @pytest.mark.asyncio
+    async def test_merge(self):
+        msgs = stream(
+            Chunk(content="a"), Chunk(content="b"), Done(), Chunk(content="c")
+        )
+        result = [msg async for msg in coalesce(msgs, window=1)]
+        # Messages of different types are not merged.
+        assert contents(result) == ["ab", "<done>", "c"]
+
+    @pytest.mark.asyncio
+    async def test_not_mergeable(self):
+        msgs = stream(Done(), 0.2, Done())
+        it = coalesce(msgs, window=1)
+
+        # Messages that do not support concatenation are not held back.
+        assert contents([await asyncio.wait_for(anext(it), 0.1)]) == ["<done>"]
+        assert contents([msg async for msg in it]) == ["<done>"]
+
+    @pytest.mark.asyncio
+    async def test_max_size(self):
+        msgs = stream(*(Chunk(content=str(i)) for i in range(5)))
+        result = [msg async for msg in coalesce(msgs, window=1, max_size=2)]
+        assert contents(result) == ["01", "23", "4"]
+
+    @pytest.mark.asyncio
+    async def test_window(self):
+        msgs = stream(Chunk(content="a"), Chunk(content="b"), 0.2, Chunk(content="c"))
+        it = coalesce(msgs, window=0.05)
+
+        # The pending message is sent once the window is closed, without
+        # waiting for the next message.
+        assert contents([await asyncio.wait_for(anext(it), 0.15)]) == ["ab"]
+        assert contents([msg async for msg in it]) == ["c"]
+
+    @pytest.mark.asyncio
+    async def test_error(self):
+        async def failing() -> AsyncIterator[Message]:
+            yield Chunk(content="a")
+            raise ValueError("oops")
+
+        result = []
+        with pytest.raises(ValueError):
+            async for msg in coalesce(failing(), window=1):
+                result.append(msg)
+        # The pending message is sent before the error.
+        assert contents(result) == ["a"]
+
+    @pytest.mark.skipif(sys.version_info < (3, 11), reason="requires asyncio.timeout")
+    @pytest.mark.asyncio
+    async def test_timeout_in_source(self):
+        async def timed() -> AsyncIterator[Message]:
+            # The timeout cancels the task where it was entered, so the source
+            # must be driven by one task.
+            try:
+                async with asyncio.timeout(0.05):
+                    yield Chunk(content="a")
+                    await asyncio.sleep(1)
+                    yield Chunk(content="b")
+            except TimeoutError:
+                yield Done()
+
+        result = [msg async for msg in coalesce(timed(), window=1)]
+        assert contents(result) == ["a", "<done>"]
+
+    @pytest.mark.asyncio
+    async def test_close(self):
+        closed = asyncio.Event()
+
+        async def endless() -> AsyncIterator[Message]:
+            try:
+                while True:
+                    await asyncio.sleep(0)
+                    yield Chunk(content="a")
+            finally:
+                closed.set()
+
+        it = coalesce(endless(), window=1, max_size=2)
+        assert contents([await anext(it)]) == ["aa"]
+        await it.aclose()
+        # The source is closed along with the coalesced stream.
+        assert closed.is_set()
@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+from typing import AsyncIterator
+
+import pytest
+
+from coagent.core import Address, AgentSpec, BaseAgent, Context, handler, Message, new
+from coagent.core.exceptions import AgentTypeNotFoundError
+from coagent.core.messages import Empty, StopIteration
+from coagent.core.runtime import QueueSubscriptionIterator, ReplyInbox, check_reply
+from coagent.runtimes.local_runtime import LocalRuntime
+
+
+class Query(Message):
+    pass
+
+
+class Reply(Message):
+    def __add__(self, other: Reply) -> Reply:
+        return self
+
+
+class StreamAgent(BaseAgent):
+    @handler
+    async def handle(self, msg: Query, ctx: Context) -> AsyncIterator[Reply]:
+        yield Reply()
+        yield Reply()
+
+
+class TestReplyInbox:
+    @pytest.mark.asyncio
+    async def test_dispatch(self):
+        inbox = ReplyInbox("_INBOX.test")
+        received: dict[str, list] = {"a": [], "b": []}
+
+        async def receive_a(raw):
+            received["a"].append(raw)
+
+        async def receive_b(raw):
+            received["b"].append(raw)
+
+        topic_a, sub_a = inbox.subscribe(receive_a)
+        topic_b, sub_b = inbox.subscribe(receive_b)
+        assert inbox.owns(topic_a) and inbox.owns(topic_b)
+        assert not inbox.owns("_INBOX.testing")
+
+        await inbox.dispatch(topic_a, Reply().encode())
+        await inbox.dispatch(topic_b, Reply().encode())
+        await inbox.dispatch(topic_b, Reply().encode())
+        assert len(received["a"]) == 1
+        assert len(received["b"]) == 2
+
+        await sub_a.unsubscribe()
+        assert len(inbox) == 1
+
+        # Replies to an unsubscribed topic are dropped.
+        await inbox.dispatch(topic_a, Reply().encode())
+        assert len(received["a"]) == 1
+
+
+class TestCheckReply:
+    def test_check_reply(self):
+        assert check_reply(Empty().encode()) is None
+
+        raw = Reply().encode()
+        assert check_reply(raw) is raw
+
+        err = AgentTypeNotFoundError("not found").encode_message().encode()
+        with pytest.raises(AgentTypeNotFoundError):
+            check_reply(err)
+
+    @pytest.mark.asyncio
+    async def test_queue(self):
+        queue = QueueSubscriptionIterator()
+        await queue.receive(Reply().encode())
+        await queue.receive(StopIteration().encode())
+        assert [msg.header.type async for msg in queue] == ["Reply"]
+
+        await queue.receive(AgentTypeNotFoundError("").encode_message().encode())
+        with pytest.raises(AgentTypeNotFoundError):
+            await anext(queue)
+
+
+class TestLocalChannel:
+    @pytest.mark.asyncio
+    async def test_request_reply(self):
+        async with LocalRuntime() as runtime:
+            await runtime.register(AgentSpec("stream", new(StreamAgent)))
+            channel = runtime.channel
+            addr = Address(name="stream", id="0")
+
+            result = await channel.publish(addr, Query().encode(), request=True)
+            assert result.header.type == Reply.__name__
+
+            msgs = await channel.publish(addr, Query().encode(), stream=True)
+            assert [msg.header.type async for msg in msgs] == [Reply.__name__] * 2
+
+            # No reply subscription is left behind.
+            assert len(channel._inbox) == 0
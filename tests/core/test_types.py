@@ -0,0 +1,62 @@
+import copy
+import pickle
+
+from pydantic import ValidationError
+import pytest
+
+from coagent.core.types import Address, Reply
+
+
+class TestAddress:
+    def test_topic(self):
+        assert Address(name="discovery").topic == "coagent.discovery"
+        assert Address(name="_INBOX.x").topic == "_INBOX.x"
+        assert Address(name="_INBOX.x").is_reply
+        assert Address(name="test").topic == "coagent.factory.test"
+        assert Address(name="test", id="1").topic == "coagent.agent.test.1"
+
+    def test_immutable(self):
+        addr = Address(name="test", id="1")
+        with pytest.raises(AttributeError):
+            addr.id = "2"
+
+    def test_eq_and_hash(self):
+        addr = Address(name="test", id="1")
+        assert addr == Address(name="test", id="1")
+        assert addr != Address(name="test", id="2")
+        assert addr is not None
+        assert addr != "coagent.agent.test.1"
+        assert {addr: 1}[Address(name="test", id="1")] == 1
+
+        assert copy.deepcopy(addr) == addr
+        assert pickle.loads(pickle.dumps(addr)) == addr
+
+    def test_from_topic(self):
+        for addr in (
+            Address(name="discovery"),
+            Address(name="_INBOX.x"),
+            Address(name="test"),
+            Address(name="test", id="1"),
+        ):
+            assert Address.from_topic(addr.topic) == addr
+
+        # Interned.
+        addr = Address.from_topic("coagent.agent.test.1")
+        assert Address.from_topic("coagent.agent.test.1") is addr
+
+        with pytest.raises(ValueError):
+            Address.from_topic("invalid")
+
+    def test_pydantic(self):
+        addr = Address(name="test", id="1")
+        assert addr.encode() == {"name": "test", "id": "1"}
+        assert Address.decode({"name": "test", "id": "1"}) == addr
+        assert Address.decode({"name": "test"}) == Address(name="test")
+        with pytest.raises(ValidationError):
+            Address.decode({"id": "1"})
+
+        # As a field of pydantic models.
+        reply = Reply(address=addr)
+        assert Reply.model_validate_json(reply.model_dump_json()) == reply
+        assert Reply.model_validate(reply.model_dump()) == reply
+        assert Reply(address={"name": "test", "id": "1"}).address == addr
@@ -1,4 +1,10 @@
-from coagent.core.util import Trie, get_func_args
+import asyncio
+
+import pytest
+
+from coagent.core.exceptions import OverloadedError
+from coagent.core.types import OverflowPolicy
+from coagent.core.util import BoundedQueue, NamespaceIndex, Trie, get_func_args
 
 
 class TestTrie:
@@ -16,8 +22,132 @@ class TestTrie:
         assert trie.direct_items("test.a.b.c") == [("test.a.b.c", 5)]
 
 
+class TestNamespaceIndex:
+    def new_index(self) -> NamespaceIndex:
+        index = NamespaceIndex(separator=".")
+        index["test"] = 1
+        index["test.a"] = 2
+        index["test.b"] = 3
+        index["test.a.b"] = 4
+        index["test.a.b.c"] = 5
+        index["testing"] = 6
+        return index
+
+    def test_direct_items(self):
+        index = self.new_index()
+        assert index.direct_items("") == [("test", 1), ("testing", 6)]
+        assert index.direct_items("test") == [("test", 1), ("test.a", 2), ("test.b", 3)]
+        assert index.direct_items("test.a") == [("test.a", 2), ("test.a.b", 4)]
+        assert index.direct_items("test.a.b") == [("test.a.b", 4), ("test.a.b.c", 5)]
+        assert index.direct_items("test.a.b.c") == [("test.a.b.c", 5)]
+        assert index.direct_items("test.x") == []
+
+    def test_items(self):
+        index = self.new_index()
+        assert index.keys() == [
+            "test",
+            "test.a",
+            "test.a.b",
+            "test.a.b.c",
+            "test.b",
+            "testing",
+        ]
+        assert index.values("test.a") == [2, 4, 5]
+        assert index.values("test.x") == []
+
+    def test_pop(self):
+        index = self.new_index()
+        assert index.pop("test.a") == 2
+        assert "test.a" not in index
+        assert index.direct_keys("test") == ["test", "test.b"]
+        assert index.keys("test.a") == ["test.a.b", "test.a.b.c"]
+
+        # Empty nodes are pruned.
+        assert index.pop("test.a.b.c") == 5
+        assert index.pop("test.a.b") == 4
+        assert index._root.children["test"].children.keys() == {"b"}
+
+        assert index.pop("test.a", None) is None
+        with pytest.raises(KeyError):
+            index.pop("test.a")
+        assert len(index) == 3
+
+        index.clear()
+        assert len(index) == 0
+        assert index.keys() == []
+
+
 def test_get_func_args():
     def func(a: int, b: str, c: float) -> None:
         pass
 
     assert get_func_args(func) == {"a", "b", "c"}
+
+
+class TestBoundedQueue:
+    @pytest.mark.asyncio
+    async def test_block(self):
+        queue = BoundedQueue(1, OverflowPolicy.BLOCK)
+        await queue.put(1)
+
+        task = asyncio.create_task(queue.put(2))
+        await asyncio.sleep(0.01)
+        assert not task.done()
+
+        assert await queue.get() == 1
+        await task
+        assert await queue.get() == 2
+
+    @pytest.mark.asyncio
+    async def test_reject(self):
+        queue = BoundedQueue(1, OverflowPolicy.REJECT)
+        await queue.put(1)
+
+        with pytest.raises(OverloadedError):
+            await queue.put(2)
+        assert queue.rejected_count == 1
+        assert queue.qsize() == 1
+
+    @pytest.mark.asyncio
+    async def test_drop_oldest(self):
+        queue = BoundedQueue(2, OverflowPolicy.DROP_OLDEST)
+        assert await queue.put(1) is None
+        assert await queue.put(2) is None
+        assert await queue.put(3) == 1
+        assert queue.dropped_count == 1
+
+        assert [queue.get_nowait(), queue.get_nowait()] == [2, 3]
+
+    @pytest.mark.asyncio
+    async def test_policy_override(self):
+        queue = BoundedQueue(1, OverflowPolicy.REJECT)
+        await queue.put(1)
+
+        task = asyncio.create_task(queue.put(2, policy=OverflowPolicy.BLOCK))
+        await asyncio.sleep(0.01)
+        assert not task.done()
+
+        await queue.get()
+        await task
+        assert queue.qsize() == 1
+
+        # Non-blocking overrides on a blocking queue.
+        queue = BoundedQueue(1, OverflowPolicy.BLOCK)
+        await queue.put(1)
+        with pytest.raises(OverloadedError):
+            await queue.put(2, policy=OverflowPolicy.REJECT)
+        assert await queue.put(3, policy=OverflowPolicy.DROP_OLDEST) == 1
+        assert queue.get_nowait() == 3
+
+    @pytest.mark.asyncio
+    async def test_pinned(self):
+        queue = BoundedQueue(1, OverflowPolicy.DROP_OLDEST)
+        queue.put_pinned("a")
+        # Pinned items do not count towards the size.
+        assert await queue.put(1) is None
+        queue.put_pinned("b")
+        # Pinned items are never dropped.
+        assert await queue.put(2) == 1
+
+        assert [queue.get_nowait() for _ in range(3)] == ["a", "b", 2]
+        assert queue.empty()
@@ -0,0 +1,137 @@
+import asyncio
+
+import httpx
+import pytest
+
+from coagent.core import Address, Message
+from coagent.runtimes.http_runtime import HTTPChannel, HTTPChannelBackend
+from coagent.runtimes.local_runtime import LocalChannel
+
+
+class Text(Message):
+    content: str = ""
+
+
+class TestHTTPChannel:
+    @pytest.mark.asyncio
+    async def test_client(self):
+        limits = httpx.Limits(max_connections=10, max_keepalive_connections=5)
+        channel = HTTPChannel("http://localhost:8000", limits=limits)
+        with pytest.raises(RuntimeError):
+            _ = channel.client
+
+        await channel.connect()
+        client = channel.client
+        stream_client = channel.stream_client
+        assert not client.is_closed
+        # SSE streams do not share the limited pool.
+        assert stream_client is not client
+        # The clients are created only once.
+        await channel.connect()
+        assert channel.client is client
+        assert channel.stream_client is stream_client
+
+        await channel.close()
+        assert client.is_closed
+        assert stream_client.is_closed
+        with pytest.raises(RuntimeError):
+            _ = channel.client
+
+
+class TestHTTPChannelBackend:
+    @pytest.mark.asyncio
+    async def test_subscribe_events(self):
+        channel = LocalChannel()
+        backend = HTTPChannelBackend(channel, replay_size=2, resume_timeout=0.1)
+        await backend.start()
+        addr = Address(name="test", id="0")
+
+        events = backend.subscribe_events(addr)
+        # Start the subscription before publishing.
+        pending = asyncio.create_task(anext(events))
+        await asyncio.sleep(0)
+        await channel.publish(addr, Text(content="0").encode())
+        event_id, raw = await pending
+        assert Text.decode(raw).content == "0"
+        sub_id = event_id.split(":")[0]
+
+        # Disconnect, while messages keep arriving.
+        await events.aclose()
+        for i in range(1, 4):
+            await channel.publish(addr, Text(content=str(i)).encode())
+        # Only the recent messages are kept while detached.
+        await asyncio.sleep(0.01)
+        assert len(backend._resumables[sub_id]._log) == 2
+
+        # Resume from the last event, with the recent missed messages replayed.
+        events = backend.subscribe_events(addr, last_event_id=event_id)
+        received = []
+        for _ in range(2):
+            event_id, raw = await anext(events)
+            received.append(Text.decode(raw).content)
+        assert received == ["2", "3"]
+        assert event_id == f"{sub_id}:4"
+        await events.aclose()
+
+        # Expired after the resume timeout.
+        await asyncio.sleep(0.2)
+        assert not backend._resumables
+        assert not channel._probe(addr)
+
+        # Start over with a new subscription.
+        events = backend.subscribe_events(addr, last_event_id=event_id)
+        pending = asyncio.create_task(anext(events))
+        await asyncio.sleep(0)
+        await channel.publish(addr, Text(content="4").encode())
+        event_id, raw = await pending
+        assert Text.decode(raw).content == "4"
+        assert not event_id.startswith(sub_id)
+        await events.aclose()
+
+        await backend.stop()
+
+    @pytest.mark.asyncio
+    async def test_subscribe_events_slow_client(self):
+        channel = LocalChannel()
+        backend = HTTPChannelBackend(channel, replay_size=2)
+        await backend.start()
+        addr = Address(name="test", id="0")
+
+        events = backend.subscribe_events(addr)
+        pending = asyncio.create_task(anext(events))
+        await asyncio.sleep(0)
+
+        # More messages than the replay size arrive before the client reads.
+        for i in range(5):
+            await channel.publish(addr, Text(content=str(i)).encode())
+        await asyncio.sleep(0.01)
+
+        # None of them is lost for the attached client.
+        received = [Text.decode((await pending)[1]).content]
+        for _ in range(4):
+            _, raw = await asyncio.wait_for(anext(events), 1)
+            received.append(Text.decode(raw).content)
+        assert received == ["0", "1", "2", "3", "4"]
+        await events.aclose()
+
+        await backend.stop()
+
+    @pytest.mark.asyncio
+    async def test_subscribe_events_queue(self):
+        channel = LocalChannel()
+        backend = HTTPChannelBackend(channel)
+        await backend.start()
+        addr = Address(name="test", id="0")
+
+        events = backend.subscribe_events(addr, queue="group")
+        pending = asyncio.create_task(anext(events))
+        await asyncio.sleep(0)
+        await channel.publish(addr, Text(content="0").encode())
+        await pending
+
+        # The member leaves the queue group as soon as its client disconnects.
+        await events.aclose()
+        assert not backend._resumables
+        assert not channel._probe(addr)
+
+        await backend.stop()
@@ -0,0 +1,163 @@
+import asyncio
+import socket
+from typing import AsyncIterator
+
+import httpx
+import pytest
+import pytest_asyncio
+
+uvicorn = pytest.importorskip("uvicorn")
+pytest.importorskip("sse_starlette")
+
+from coagent.core import (  # noqa: E402
+    Address,
+    AgentSpec,
+    BaseAgent,
+    Context,
+    handler,
+    Message,
+    new,
+)
+from coagent.core.exceptions import BaseError  # noqa: E402
+from coagent.runtimes import HTTPChannelBackend, LocalChannel  # noqa: E402
+from coagent.runtimes.http_runtime import HTTPChannel  # noqa: E402
+from coagent.runtimes.http_server import create_app  # noqa: E402
+from coagent.runtimes.local_runtime import LocalRuntime  # noqa: E402
+
+
+class Text(Message):
+    content: str = ""
+
+
+class EchoAgent(BaseAgent):
+    @handler
+    async def handle(self, msg: Text, ctx: Context) -> Text:
+        return msg
+
+
+class SplitAgent(BaseAgent):
+    @handler
+    async def handle(self, msg: Text, ctx: Context) -> AsyncIterator[Text]:
+        for word in msg.content.split():
+            yield Text(content=word)
+
+
+class RecordingBackend(HTTPChannelBackend):
+    def __init__(self, channel: LocalChannel):
+        super().__init__(channel)
+        self.batches: list[int] = []
+
+    async def publish_batch(self, items):
+        self.batches.append(len(items))
+        return await super().publish_batch(items)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest_asyncio.fixture
+async def server():
+    runtime = LocalRuntime()
+    await runtime.start()
+    await runtime.register(AgentSpec("echo", new(EchoAgent)))
+    await runtime.register(AgentSpec("split", new(SplitAgent)))
+    backend = RecordingBackend(runtime.channel)
+
+    port = free_port()
+    config = uvicorn.Config(create_app(backend), port=port, log_level="warning")
+    srv = uvicorn.Server(config)
+    task = asyncio.create_task(srv.serve())
+    while not srv.started:
+        await asyncio.sleep(0.01)
+
+    yield f"http://127.0.0.1:{port}", backend
+
+    srv.should_exit = True
+    await task
+    await runtime.stop()
+
+
+class TestHTTPServer:
+    @pytest.mark.asyncio
+    async def test_publish(self, server):
+        url, _ = server
+        channel = HTTPChannel(url)
+        await channel.connect()
+        try:
+            result = await channel.publish(
+                Address(name="echo", id="0"),
+                Text(content="hello").encode(),
+                request=True,
+                timeout=1,
+            )
+            assert Text.decode(result).content == "hello"
+
+            msgs = await channel.publish(
+                Address(name="split", id="0"),
+                Text(content="a b c").encode(),
+                stream=True,
+            )
+            assert [Text.decode(m).content async for m in msgs] == ["a", "b", "c"]
+        finally:
+            await channel.close()
+
+    @pytest.mark.asyncio
+    async def test_publish_batch(self, server):
+        url, backend = server
+        channel = HTTPChannel(url, batch_window=0.05, batch_size=8)
+        await channel.connect()
+        try:
+            received = asyncio.Queue()
+
+            async def receive(raw):
+                await received.put(raw)
+
+            addr = Address(name="test", id="0")
+            sub = await channel.subscribe(addr, handler=receive)
+
+            await asyncio.gather(
+                *(
+                    channel.publish(addr, Text(content=str(i)).encode())
+                    for i in range(10)
+                )
+            )
+            # Coalesced into two batches, limited by the batch size.
+            assert backend.batches == [8, 2]
+
+            contents = [Text.decode(await received.get()).content for _ in range(10)]
+            assert contents == [str(i) for i in range(10)]
+
+            # The error of each message is propagated to its publisher.
+            with pytest.raises(BaseError):
+                await channel.publish(Address(name="unknown", id="0"), Text().encode())
+
+            await sub.unsubscribe()
+        finally:
+            await channel.close()
+
+    @pytest.mark.asyncio
+    async def test_subscriptions_beyond_limits(self, server):
+        url, _ = server
+        # Subscriptions are not limited by the connection pool for requests.
+        channel = HTTPChannel(url, limits=httpx.Limits(max_connections=1))
+        await channel.connect()
+        try:
+            received = asyncio.Queue()
+            addrs = [Address(name="test", id=str(i)) for i in range(3)]
+            subs = [
+                await asyncio.wait_for(channel.subscribe(addr, received.put), 5)
+                for addr in addrs
+            ]
+
+            for addr in addrs:
+                await channel.publish(addr, Text(content=addr.id).encode())
+            contents = {Text.decode(await received.get()).content for _ in addrs}
+            assert contents == {"0", "1", "2"}
+
+            for sub in subs:
+                await sub.unsubscribe()
+        finally:
+            await channel.close()
@@ -0,0 +1,203 @@
+import asyncio
+from typing import AsyncIterator
+
+import pytest
+
+from coagent.core import Address, AgentSpec, BaseAgent, Context, handler, Message, new
+from coagent.core.exceptions import DeadlineExceededError
+from coagent.core.factory import CreateAgent
+from coagent.core.types import LazyRawMessage
+from coagent.runtimes.local_runtime import LocalChannel, LocalRouter, LocalRuntime
+
+
+class Ping(Message):
+    pass
+
+
+class Pong(Message):
+    pass
+
+
+class Text(Message):
+    content: str = ""
+
+
+class SlowAgent(BaseAgent):
+    @handler
+    async def handle(self, msg: Ping, ctx: Context) -> AsyncIterator[Pong]:
+        yield Pong()
+        await asyncio.sleep(1)
+        yield Pong()
+
+
+class MutatingAgent(BaseAgent):
+    received: asyncio.Queue[Text] = asyncio.Queue()
+
+    @handler
+    async def handle(self, msg: Text, ctx: Context) -> None:
+        msg.content = "bye"
+        await self.received.put(msg)
+
+
+class EchoAgent(BaseAgent):
+    def __init__(self):
+        super().__init__()
+        self.received: list[Text] = []
+
+    @handler
+    async def handle(self, msg: Text, ctx: Context) -> Text:
+        self.received.append(msg)
+        return msg
+
+
+class Receiver:
+    def __init__(self):
+        self.received = []
+
+    async def receive(self, raw):
+        self.received.append(raw)
+
+
+class TestLocalRouter:
+    @pytest.mark.asyncio
+    async def test_publish(self):
+        router = LocalRouter()
+        subs = [Receiver() for _ in range(2)]
+        workers = [Receiver() for _ in range(3)]
+        for sub in subs:
+            router.add("test", sub)
+        for worker in workers:
+            router.add("test", worker, queue="workers")
+
+        for _ in range(6):
+            await router.publish("test", Ping().encode())
+
+        # Each subscription receives all messages.
+        assert [len(sub.received) for sub in subs] == [6, 6]
+        # The queue group shares the messages in a round-robin manner.
+        assert [len(worker.received) for worker in workers] == [2, 2, 2]
+
+    def test_remove(self):
+        router = LocalRouter()
+        sub, worker = Receiver(), Receiver()
+        router.add("test", sub)
+        router.add("test", worker, queue="workers")
+        assert router.has_subscribers("test")
+
+        router.remove("test", sub)
+        assert router.has_subscribers("test")
+
+        router.remove("test", worker, queue="workers")
+        assert not router.has_subscribers("test")
+        assert not router._subs and not router._groups
+
+
+class TestLocalChannel:
+    @pytest.mark.asyncio
+    async def test_isolation(self):
+        received = []
+
+        async def handler(raw):
+            received.append(raw)
+
+        channel1, channel2 = LocalChannel(), LocalChannel()
+        addr = Address(name="test", id="0")
+        sub = await channel1.subscribe(addr, handler=handler)
+
+        assert channel1._probe(addr)
+        assert not channel2._probe(addr)
+
+        await sub.unsubscribe()
+        assert not channel1._probe(addr)
+
+    @pytest.mark.asyncio
+    async def test_request_timeout(self):
+        async with LocalRuntime() as runtime:
+            await runtime.register(AgentSpec("slow", new(SlowAgent)))
+            channel = runtime.channel
+            addr = Address(name="slow", id="0")
+
+            with pytest.raises(DeadlineExceededError):
+                await channel.publish(addr, Ping().encode(), request=True, timeout=0.1)
+            # The waiter has been cleaned up.
+            assert len(channel._inbox) == 0
+
+    @pytest.mark.asyncio
+    async def test_stream_idle_timeout(self):
+        async with LocalRuntime() as runtime:
+            await runtime.register(AgentSpec("slow", new(SlowAgent)))
+            channel = runtime.channel
+            addr = Address(name="slow", id="0")
+
+            msgs = await channel.publish(
+                addr, Ping().encode(), stream=True, idle_timeout=0.1
+            )
+            received = []
+            with pytest.raises(DeadlineExceededError):
+                async for msg in msgs:
+                    received.append(msg)
+            assert len(received) == 1
+            assert len(channel._inbox) == 0
+
+
+class TestDirectDispatch:
+    def test_lazy_encode(self):
+        msg = Text(content="hello")
+        raw = msg.encode(lazy=True)
+        assert isinstance(raw, LazyRawMessage)
+        assert raw.message is msg
+        assert "content" not in raw.__dict__
+
+        # The content is encoded on demand.
+        assert raw.content == msg.encode().content
+
+        # The receiver gets a copy of the message.
+        decoded = Text.decode(raw)
+        assert decoded is not msg
+        assert decoded == msg
+
+    def test_lazy_serialize(self):
+        msg = Text(content="hello")
+
+        raw = msg.encode(lazy=True)
+        assert raw.encode() == msg.encode().encode()
+
+        # The content is also encoded if the raw message is nested.
+        raw = msg.encode(lazy=True)
+        create_msg = CreateAgent(session_id="0", raw=raw).encode()
+        decoded = CreateAgent.decode(create_msg)
+        assert Text.decode(decoded.raw) == msg
+
+    @pytest.mark.asyncio
+    async def test_direct_dispatch(self):
+        async with LocalRuntime(LocalChannel(direct_dispatch=True)) as runtime:
+            await runtime.register(AgentSpec("echo", new(EchoAgent)))
+            channel = runtime.channel
+            addr = Address(name="echo", id="0")
+
+            msg = Text(content="hello")
+            raw = msg.encode(lazy=True)
+            result = await channel.publish(addr, raw, request=True, timeout=1)
+
+            # The messages are handed over without serialization.
+            assert "content" not in raw.__dict__
+            assert isinstance(result, LazyRawMessage)
+            assert "content" not in result.__dict__
+            assert isinstance(result.message, Text)
+            assert Text.decode(result).content == "hello"
+
+    @pytest.mark.asyncio
+    async def test_direct_dispatch_copy(self):
+        async with LocalRuntime(LocalChannel(direct_dispatch=True)) as runtime:
+            await runtime.register(AgentSpec("mutate", new(MutatingAgent)))
+            channel = runtime.channel
+            addr = Address(name="mutate", id="0")
+
+            # Neither reply nor extensions are changed on the way.
+            msg = Text(content="hello")
+            await channel.publish(addr, msg.encode(lazy=True))
+            received = await asyncio.wait_for(MutatingAgent.received.get(), 1)
+
+            # The receiver's changes do not affect the sender's message.
+            assert received.content == "bye"
+            assert msg.content == "hello"
@@ -0,0 +1,95 @@
+import asyncio
+import time
+
+from nats.errors import NoRespondersError, TimeoutError
+import pytest
+
+from coagent.core import Address, Message
+from coagent.runtimes.nats_runtime import NATSChannel, ProbeCache
+
+
+class Ping(Message):
+    pass
+
+
+class TestProbeCache:
+    def test_add_and_discard(self):
+        cache = ProbeCache(ttl=10, maxsize=10)
+        assert "a" not in cache
+
+        cache.add("a")
+        assert "a" in cache
+
+        cache.discard("a")
+        assert "a" not in cache
+
+    def test_expire(self):
+        cache = ProbeCache(ttl=0.01, maxsize=10)
+        cache.add("a")
+        time.sleep(0.02)
+        assert "a" not in cache
+
+    def test_evict(self):
+        cache = ProbeCache(ttl=10, maxsize=2)
+        cache.add("a")
+        cache.add("b")
+        cache.add("a")  # Refresh "a"
+        cache.add("c")
+        assert "a" in cache
+        assert "b" not in cache
+        assert "c" in cache
+
+    def test_is_fresh(self):
+        cache = ProbeCache(ttl=10, maxsize=10)
+        assert not cache.is_fresh("a", 10)
+
+        cache.add("a")
+        assert cache.is_fresh("a", 10)
+        time.sleep(0.02)
+        assert not cache.is_fresh("a", 0.01)
+        assert "a" in cache
+
+
+class FakeNATS:
+    """An in-memory stand-in for the NATS client, which only tracks the
+    subscribed topics and the published messages."""
+
+    def __init__(self):
+        self.topics: set[str] = set()
+        self.published: list[str] = []
+
+    async def publish(self, subject, payload=b"", reply="", headers=None):
+        self.published.append(subject)
+
+    async def request(self, subject, payload=b"", timeout=0.5, headers=None):
+        if subject not in self.topics:
+            raise NoRespondersError
+        # Agents do not reply to probes.
+        raise TimeoutError
+
+
+class TestNATSChannel:
+    @pytest.mark.asyncio
+    async def test_agent_gone_without_notice(self):
+        channel = NATSChannel(probe_cache_grace=0.05)
+        channel._nc = nc = FakeNATS()
+        addr = Address(name="test", id="0")
+        nc.topics.add(addr.topic)
+
+        # Probed and cached.
+        await channel.publish(addr, Ping().encode())
+        assert nc.published == [addr.topic]
+
+        # The agent's node crashes without broadcasting agent_stopped.
+        nc.topics.clear()
+
+        # Within the grace period, the cached agent is trusted.
+        await channel.publish(addr, Ping().encode())
+        assert nc.published[-1] == addr.topic
+
+        # After the grace period, the agent is probed again and found gone,
+        # so the message goes to the factory to re-create it.
+        await asyncio.sleep(0.06)
+        await channel.publish(addr, Ping().encode())
+        assert nc.published[-1] == Address(name="test").topic
+        assert addr.topic not in channel._probe_cache
@@ -0,0 +1,241 @@
+import asyncio
+import json
+from typing import AsyncIterator
+
+import pytest
+import pytest_asyncio
+
+aiohttp = pytest.importorskip("aiohttp")
+
+from aiohttp import web  # noqa: E402
+
+from coagent.core import (  # noqa: E402
+    Address,
+    AgentSpec,
+    BaseAgent,
+    Context,
+    handler,
+    Message,
+    new,
+)
+from coagent.core.exceptions import (  # noqa: E402
+    AgentTypeNotFoundError,
+    DeadlineExceededError,
+)
+from coagent.runtimes.local_runtime import LocalChannel, LocalRuntime  # noqa: E402
+from coagent.runtimes.websocket_runtime import (  # noqa: E402
+    WebSocketChannel,
+    WebSocketChannelBackend,
+)
+
+
+class Text(Message):
+    content: str = ""
+
+
+class EchoAgent(BaseAgent):
+    @handler
+    async def handle(self, msg: Text, ctx: Context) -> Text:
+        return msg
+
+
+class SplitAgent(BaseAgent):
+    @handler
+    async def handle(self, msg: Text, ctx: Context) -> AsyncIterator[Text]:
+        for word in msg.content.split():
+            yield Text(content=word)
+
+
+class AiohttpWebSocket:
+    """Adapt aiohttp's server-side WebSocket to the Starlette-like interface."""
+
+    def __init__(self, ws: web.WebSocketResponse):
+        self.ws = ws
+
+    async def receive_text(self) -> str:
+        return await self.ws.receive_str()
+
+    async def send_text(self, data: str) -> None:
+        await self.ws.send_str(data)
+
+
+@pytest_asyncio.fixture
+async def server():
+    runtime = LocalRuntime()
+    await runtime.start()
+    await runtime.register(AgentSpec("echo", new(EchoAgent)))
+    await runtime.register(AgentSpec("split", new(SplitAgent)))
+    backend = WebSocketChannelBackend(runtime.channel)
+
+    async def serve(request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        await backend.serve(AiohttpWebSocket(ws))
+        return ws
+
+    app = web.Application()
+    app.router.add_get("/ws", serve)
+    app_runner = web.AppRunner(app)
+    await app_runner.setup()
+    site = web.TCPSite(app_runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+
+    yield f"ws://127.0.0.1:{port}/ws"
+
+    await app_runner.cleanup()
+    await runtime.stop()
+
+
+class TestWebSocketChannel:
+    @pytest.mark.asyncio
+    async def test_publish(self, server):
+        channel = WebSocketChannel(server)
+        await channel.connect()
+        try:
+            addr = Address(name="echo", id="0")
+
+            # Concurrent requests are multiplexed over one connection.
+            results = await asyncio.gather(
+                *(
+                    channel.publish(
+                        addr, Text(content=str(i)).encode(), request=True, timeout=1
+                    )
+                    for i in range(10)
+                )
+            )
+            assert [Text.decode(r).content for r in results] == [
+                str(i) for i in range(10)
+            ]
+
+            msgs = await channel.publish(
+                Address(name="split", id="0"),
+                Text(content="a b c").encode(),
+                stream=True,
+            )
+            assert [Text.decode(m).content async for m in msgs] == ["a", "b", "c"]
+
+            # The error raised on the server side is propagated.
+            with pytest.raises(DeadlineExceededError):
+                await channel.publish(
+                    Address(name="unknown", id="0"),
+                    Text().encode(),
+                    request=True,
+                    timeout=0.2,
+                    probe=False,
+                )
+
+            # The error of a stream is raised from the iteration.
+            msgs = await channel.publish(
+                Address(name="unknown", id="0"), Text().encode(), stream=True
+            )
+            with pytest.raises(AgentTypeNotFoundError):
+                await asyncio.wait_for(anext(msgs), 1)
+            assert not channel._queues and not channel._results
+        finally:
+            await channel.close()
+
+    @pytest.mark.asyncio
+    async def test_subscribe(self, server):
+        channel = WebSocketChannel(server)
+        await channel.connect()
+        try:
+            received = asyncio.Queue()
+
+            async def receive(raw):
+                await received.put(raw)
+
+            addr = Address(name="test", id="0")
+            sub = await channel.subscribe(addr, handler=receive)
+            await channel.publish(addr, Text(content="hello").encode())
+            raw = await asyncio.wait_for(received.get(), 1)
+            assert Text.decode(raw).content == "hello"
+
+            await sub.unsubscribe()
+            assert not channel._queues
+
+            topic = await channel.new_reply_topic()
+            assert topic.startswith("_INBOX.")
+        finally:
+            await channel.close()
+
+    @pytest.mark.asyncio
+    async def test_publish_in_handler(self, server):
+        channel = WebSocketChannel(server)
+        await channel.connect()
+        try:
+            received = asyncio.Queue()
+
+            async def receive(raw):
+                # Wait for a result, which is read while the handler is running.
+                result = await channel.publish(
+                    Address(name="echo", id="0"), raw, request=True, timeout=1
+                )
+                await received.put(result)
+
+            addr = Address(name="test", id="0")
+            sub = await channel.subscribe(addr, handler=receive)
+            await channel.publish(addr, Text(content="hello").encode())
+            result = await asyncio.wait_for(received.get(), 2)
+            assert Text.decode(result).content == "hello"
+
+            await sub.unsubscribe()
+        finally:
+            await channel.close()
+
+
+class SlowChannel(LocalChannel):
+    """A channel whose first publish is slow."""
+
+    def __init__(self):
+        super().__init__()
+        self.published: list[str] = []
+
+    async def publish(self, addr, msg, **kwargs):
+        content = Text.decode(msg).content
+        if not self.published and content == "0":
+            await asyncio.sleep(0.05)
+        self.published.append(content)
+
+
+class QueueWebSocket:
+    """An in-memory WebSocket, which is disconnected on receiving None."""
+
+    def __init__(self):
+        self.incoming: asyncio.Queue[str | None] = asyncio.Queue()
+        self.outgoing: list[dict] = []
+
+    async def receive_text(self) -> str:
+        data = await self.incoming.get()
+        if data is None:
+            raise ConnectionError("Disconnected")
+        return data
+
+    async def send_text(self, data: str) -> None:
+        self.outgoing.append(json.loads(data))
+
+
+class TestWebSocketChannelBackend:
+    @pytest.mark.asyncio
+    async def test_publish_in_order(self):
+        channel = SlowChannel()
+        backend = WebSocketChannelBackend(channel)
+        websocket = QueueWebSocket()
+        serving = asyncio.create_task(backend.serve(websocket))
+
+        addr = Address(name="test", id="0")
+        for i in range(3):
+            frame = dict(
+                id=i + 1,
+                op="publish",
+                addr=addr.encode(mode="json"),
+                msg=Text(content=str(i)).encode().encode(mode="json"),
+            )
+            await websocket.incoming.put(json.dumps(frame))
+        await asyncio.sleep(0.1)
+        await websocket.incoming.put(None)
+        await serving
+
+        # Publishes without replies are handled in order, and not acknowledged.
+        assert channel.published == ["0", "1", "2"]
+        assert websocket.outgoing == []